@@ -46,6 +46,45 @@ let json_parameter =
 
 let bytes_parameter = parameter (fun _ hex -> return (Hex.to_bytes (`Hex hex)))
 
+(* Answers of the [batch] command *)
+
+let batch_error fmt =
+  Format.kasprintf (fun message -> `O [("error", `String message)]) fmt
+
+let batch_ok result = `O [("ok", result)]
+
+let with_encoding id f =
+  match Data_encoding.Registration.find id with
+  | Some record -> f record
+  | None -> batch_error "Unknown encoding id: %s" id
+
+let batch_request line =
+  match Json.from_string line with
+  | Error err -> batch_error "%s" err
+  | Ok (`O [("encode", `String id); ("json", json)]) -> (
+      with_encoding id @@ fun registered_encoding ->
+      match
+        Data_encoding.Registration.bytes_of_json registered_encoding json
+      with
+      | exception exn ->
+          batch_error "%a" (fun ppf exn -> Json.print_error ppf exn) exn
+      | None -> batch_error "Impossible to convert the JSON to binary."
+      | Some bytes ->
+          let (`Hex hex) = Hex.of_bytes bytes in
+          batch_ok (`String hex))
+  | Ok (`O [("decode", `String id); ("hex", `String hex)]) -> (
+      with_encoding id @@ fun registered_encoding ->
+      match Hex.to_bytes (`Hex hex) with
+      | exception Invalid_argument _ -> batch_error "Invalid hex: %s" hex
+      | bytes -> (
+          match
+            Data_encoding.Registration.json_of_bytes registered_encoding bytes
+          with
+          | None ->
+              batch_error "Cannot parse the binary with the given encoding"
+          | Some json -> batch_ok json))
+  | Ok _ -> batch_error "Invalid request: %s" line
+
 let commands () =
   [
     command
@@ -126,7 +165,7 @@ let commands () =
             cctxt#error "%a" (fun ppf exn -> Json.print_error ppf exn) exn
         | None ->
             cctxt#error
-              "Impossible to the JSON convert to binary.@,\
+              "Impossible to convert the JSON to binary.@,\
                This error should not happen."
         | Some bytes ->
             cctxt#message "%a" Hex.pp (Hex.of_bytes bytes) >>= fun () ->
@@ -150,6 +189,28 @@ let commands () =
         | None -> cctxt#error "Cannot parse the binary with the given encoding"
         | Some bytes ->
             cctxt#message "%a" Json.pp bytes >>= fun () -> return_unit);
+    (* JSON <-> Binary, many values *)
+    command
+      ~group
+      ~desc:
+        "Encode and decode values read from the standard input, one request \
+         per line, either {\"encode\": <id>, \"json\": <data>} or \
+         {\"decode\": <id>, \"hex\": <binary encoded data>}. Each request \
+         is answered in order on a line of the standard output, with \
+         {\"ok\": <hex or JSON>} or {\"error\": <message>}."
+      no_options
+      (fixed ["batch"])
+      (fun () (_cctxt : #Client_context.printer) ->
+        let rec loop () =
+          Lwt_io.read_line_opt Lwt_io.stdin >>= function
+          | None -> return_unit
+          | Some line ->
+              Lwt_io.write_line
+                Lwt_io.stdout
+                (Json.to_string ~minify:true (batch_request line))
+              >>= fun () -> Lwt_io.flush Lwt_io.stdout >>= loop
+        in
+        loop ());
     command
       ~group
       ~desc:
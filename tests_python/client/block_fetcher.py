@@ -0,0 +1,238 @@
+"""Concurrent fetching of ranges of blocks, with a cache of blocks.
+
+Walking a chain with `Client.rpc` forks a tezos-client process per block.
+A `BlockFetcher` resolves a range of levels to block hashes with a single
+call to the `blocks` RPC, then fetches the blocks concurrently through a
+keep-alive `RpcSession`, and streams them in order:
+
+    fetcher = BlockFetcher(client.rpc_session)
+    for block in fetcher.levels(0, head_level):
+        ...
+
+A block is immutable once its hash is known, so the immutable parts of
+blocks fetched by hash (`CACHED_PATHS`, e.g. headers) are memoized in a
+bounded LRU cache, by default `BLOCK_CACHE`, shared by all fetchers. The
+cache is keyed by the endpoint of the node too, so that a node doesn't
+get the blocks of another node. An endpoint can be reused by a later
+node though (e.g. `Sandbox.rm_node` then `add_node`), and the metadata
+of a block depend on the node (history mode, snapshots, pruning): they
+are never cached, nor are availability checks, which go through
+`responses`.
+"""
+import collections
+import concurrent.futures
+import threading
+from typing import Any, Deque, Iterable, Iterator, List, Optional, Tuple
+
+import requests
+
+from .rpc_session import RpcSession
+
+# Max number of RPC results kept by `BLOCK_CACHE`
+BLOCK_CACHE_SIZE = 4096
+
+# RPC sub-paths of blocks whose answers are cached: those that don't
+# depend on the metadata of the block
+CACHED_PATHS = frozenset(
+    ['/hash', '/header', '/header/shell', '/operation_hashes']
+)
+
+# Number of concurrent requests of a fetcher
+WORKERS = 8
+
+# Length of a b58check block hash
+_BLOCK_HASH_LENGTH = 51
+
+
+class BlockUnavailable(Exception):
+    """The node failed to answer an RPC of a block."""
+
+    def __init__(self, block: str, path: str, status: int, body: str):
+        super().__init__(f'{block}{path}: HTTP {status} {body}')
+        self.block = block
+        self.path = path
+        self.status = status
+        self.body = body
+
+
+class BlockCache:
+    """Bounded LRU cache of RPC results of blocks, by node endpoint,
+    block hash and RPC sub-path. It can be shared by concurrent
+    fetchers."""
+
+    def __init__(self, max_size: int = BLOCK_CACHE_SIZE):
+        assert max_size > 0
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._values = (
+            collections.OrderedDict()
+        )  # type: collections.OrderedDict
+
+    def get(self, endpoint: str, block_hash: str, path: str) -> Optional[Any]:
+        key = (endpoint, block_hash, path)
+        with self._lock:
+            value = self._values.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._values.move_to_end(key)
+            return value
+
+    def put(
+        self, endpoint: str, block_hash: str, path: str, value: Any
+    ) -> None:
+        key = (endpoint, block_hash, path)
+        with self._lock:
+            self._values[key] = value
+            self._values.move_to_end(key)
+            while len(self._values) > self.max_size:
+                self._values.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._values)
+
+
+BLOCK_CACHE = BlockCache()
+
+
+def is_block_hash(block: str) -> bool:
+    return len(block) == _BLOCK_HASH_LENGTH and block.startswith('B')
+
+
+class BlockFetcher:
+    """Fetches blocks of a chain of a node, concurrently."""
+
+    def __init__(
+        self,
+        session: RpcSession,
+        workers: int = WORKERS,
+        cache: Optional[BlockCache] = BLOCK_CACHE,
+        chain: str = 'main',
+    ):
+        """
+        Args:
+            session (RpcSession): session to the node
+            workers (int): max number of concurrent requests
+            cache (BlockCache): cache of the blocks fetched by hash, no
+                                cache if None
+            chain (str): the chain of the blocks
+        """
+        assert workers >= 1
+        self.session = session
+        self.workers = workers
+        self.cache = cache
+        self.chain = chain
+
+    def _path(self, block: str, path: str) -> str:
+        return f'/chains/{self.chain}/blocks/{block}{path}'
+
+    def response(self, block: str, path: str = '') -> requests.Response:
+        """Uncached answer to RPC `path` of `block`, e.g. `/header`."""
+        return self.session.call('get', self._path(block, path))
+
+    def get(self, block: str, path: str = '') -> Any:
+        """Answer to RPC `path` of `block` (a hash, a level, `head`...).
+
+        Answers for block hashes and `CACHED_PATHS` are cached, by node.
+        Raises `BlockUnavailable` if the node fails to answer.
+        """
+        cached = (
+            self.cache is not None
+            and path in CACHED_PATHS
+            and is_block_hash(block)
+        )
+        if cached:
+            value = self.cache.get(self.session.endpoint, block, path)
+            if value is not None:
+                return value
+        response = self.response(block, path)
+        if response.status_code != 200:
+            raise BlockUnavailable(
+                block, path, response.status_code, response.text
+            )
+        value = response.json()
+        if cached:
+            self.cache.put(self.session.endpoint, block, path, value)
+        return value
+
+    def hashes(self, first: int, last: int, head: str = 'head') -> List[str]:
+        """Hashes of the blocks of levels `first` to `last` (included) of
+        the chain of `head`, in increasing level order.
+
+        Raises `BlockUnavailable` if the node doesn't have the blocks down
+        to level `first`, e.g. a rolling node below its caboose.
+        """
+        assert 0 <= first <= last
+        header = self.get(head, '/header')
+        head_level = header['level']
+        assert last <= head_level, f'level {last} is above head {head_level}'
+        length = head_level - first + 1
+        path = (
+            f'/chains/{self.chain}/blocks'
+            f'?head={header["hash"]}&length={length}'
+        )
+        response = self.session.call('get', path)
+        response.raise_for_status()
+        # from `head` down to `first`, or down to the oldest block known
+        # by the node
+        hashes = response.json()[0]
+        if len(hashes) != length:
+            raise BlockUnavailable(
+                str(first),
+                '',
+                response.status_code,
+                f'{len(hashes)} blocks known from level {head_level} '
+                f'down, instead of {length}',
+            )
+        return list(reversed(hashes))[: last - first + 1]
+
+    def _map(self, fetch, blocks: Iterable[str]) -> Iterator[Tuple[str, Any]]:
+        # `fetch` of `blocks`, concurrently but yielded in order; at most
+        # `2 * workers` results are buffered
+        pending = collections.deque()  # type: Deque
+        with concurrent.futures.ThreadPoolExecutor(self.workers) as pool:
+            try:
+                for block in blocks:
+                    pending.append((block, pool.submit(fetch, block)))
+                    if len(pending) >= 2 * self.workers:
+                        block, future = pending.popleft()
+                        yield block, future.result()
+                while pending:
+                    block, future = pending.popleft()
+                    yield block, future.result()
+            finally:
+                for _block, future in pending:
+                    future.cancel()
+
+    def blocks(self, blocks: Iterable[str], path: str = '') -> Iterator[Any]:
+        """Answers to RPC `path` of `blocks`, in order.
+
+        Raises `BlockUnavailable` at the first block the node fails to
+        answer for.
+        """
+        for _block, value in self._map(lambda b: self.get(b, path), blocks):
+            yield value
+
+    def levels(
+        self, first: int, last: int, path: str = '', head: str = 'head'
+    ) -> Iterator[Any]:
+        """Answers to RPC `path` of the blocks of levels `first` to `last`
+        (included) of the chain of `head`, in increasing level order."""
+        return self.blocks(self.hashes(first, last, head), path)
+
+    def responses(
+        self, blocks: Iterable[str], path: str = ''
+    ) -> Iterator[Tuple[str, requests.Response]]:
+        """Uncached responses of the node to RPC `path` of `blocks`, in
+        order, e.g. to check which blocks are available."""
+        return self._map(lambda b: self.response(b, path), blocks)
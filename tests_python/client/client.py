@@ -7,10 +7,40 @@ import subprocess
 import sys
 import tempfile
 import time
-from typing import Any, List, Optional, Tuple
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import requests
+import urllib3
 
 from process.process_utils import format_command
-from . import client_output
+from . import client_output, script_batch
+from .block_fetcher import BlockFetcher, BlockUnavailable
+from .head_monitor import HeadMonitor
+from .rpc_session import RpcSession
+from .script_batch import RunScriptCase
+
+# Default of option `--check-previous` of `get receipt`
+RECEIPT_CHECK_PREVIOUS = 10
+
+
+def _maybe_sent(exc: requests.RequestException) -> bool:
+    """Whether the request failing with `exc` may have reached the node,
+    i.e. unless the connection couldn't be established."""
+    if isinstance(exc, requests.ConnectTimeout):
+        return False
+    if isinstance(exc, requests.ConnectionError) and exc.args:
+        reason = getattr(exc.args[0], 'reason', exc.args[0])
+        return not isinstance(reason, urllib3.exceptions.NewConnectionError)
+    return True
 
 
 class Client:
@@ -45,6 +75,7 @@ class Client:
         endpoint: Optional[str] = 'http://127.0.0.1:8732',
         disable_disclaimer: bool = True,
         mode: str = None,
+        native_rpc: bool = False,
     ):
         """
         Args:
@@ -60,6 +91,10 @@ class Client:
             disable_disclaimer (bool): disable disclaimer
             mode (str): the mode to use, one of "client", "mockup", or
                         "proxy", default=None (equivalent to "client").
+            native_rpc (bool): send `rpc` calls directly to the endpoint
+                               over a keep-alive HTTP session instead of
+                               forking tezos-client, default=False. Only
+                               applies in "client" mode.
         Returns:
             A Client instance.
         """
@@ -111,6 +146,12 @@ class Client:
         self._client = client
         self._admin_client = admin_client
         self.rpc_port = rpc_port
+        self.endpoint = endpoint
+        # RPCs can be sent to the endpoint without going through the client
+        self._endpoint_rpc = endpoint is not None and mode in {None, "client"}
+        self._native_rpc = native_rpc and self._endpoint_rpc
+        self._rpc_session = None  # type: Optional[RpcSession]
+        self._head_monitors = {}  # type: Dict[str, HeadMonitor]
 
     def run_generic(
         self,
@@ -198,9 +239,20 @@ class Client:
             dict representing the json output, raise exception
             if output isn't json.
 
-        See `run` for more details.
+        Failed calls raise `subprocess.CalledProcessError`, with native
+        RPCs too (see `_native_rpc_call`). See `run` for more details.
         """
         assert verb in {'put', 'get', 'post', 'delete', 'patch'}
+        # Additional client parameters and interactive input of RPC data
+        # require tezos-client
+        if (
+            self._native_rpc
+            and not params
+            and (verb == 'get' or data is not None)
+        ):
+            answer = self._native_rpc_call(verb, path, data)
+            if answer is not None:
+                return client_output.extract_rpc_answer(answer)
         params = [] if params is None else params
         params = params + ['rpc', verb, path]
         if data is not None:
@@ -208,6 +260,62 @@ class Client:
         compl_pr = self.run(params)
         return client_output.extract_rpc_answer(compl_pr)
 
+    @property
+    def rpc_session(self) -> RpcSession:
+        """Keep-alive HTTP session to the endpoint of this client.
+
+        Created on first use, closed by `cleanup`."""
+        assert self.endpoint is not None, "client has no endpoint"
+        if self._rpc_session is None:
+            self._rpc_session = RpcSession(self.endpoint)
+        return self._rpc_session
+
+    def head_monitor(self, chain: str = 'main') -> Optional[HeadMonitor]:
+        """Monitor of the heads of `chain` of the node of this client.
+
+        Started on first use, closed by `cleanup`. None if the client
+        doesn't talk to a node (e.g. in mockup mode)."""
+        if not self._endpoint_rpc:
+            return None
+        if chain not in self._head_monitors:
+            assert self.endpoint is not None
+            self._head_monitors[chain] = HeadMonitor(self.endpoint, chain)
+        return self._head_monitors[chain]
+
+    def _native_rpc_call(
+        self, verb: str, path: str, data: Any = None
+    ) -> Optional[str]:
+        """Body of the answer to RPC `path`, sent over `rpc_session`.
+
+        Returns None if the call should be run by tezos-client instead, so
+        that failures are reported exactly as the client reports them:
+        for `get` calls that fail, and for other calls that couldn't be
+        sent. Other calls that fail once sent (e.g. an injection that
+        times out) aren't run twice. As with tezos-client, they raise a
+        `subprocess.CalledProcessError`, whose stderr is the body of the
+        answer of the node (its errors), or the failure of the request."""
+        url = self.rpc_session.url(path)
+        cmd = ['rpc', verb, url]
+        print(format_command(cmd))
+        try:
+            response = self.rpc_session.call(verb, path, data)
+        except requests.RequestException as exc:
+            print(f'# native rpc failed: {exc}', file=sys.stderr)
+            if verb == 'get' or not _maybe_sent(exc):
+                return None
+            raise subprocess.CalledProcessError(
+                1, cmd, output='', stderr=str(exc)
+            ) from exc
+        if not response.ok:
+            if verb == 'get':
+                return None
+            print(response.text, file=sys.stderr)
+            raise subprocess.CalledProcessError(
+                1, cmd, output='', stderr=response.text
+            )
+        print(response.text)
+        return response.text
+
     def remember_contract(
         self, alias: str, contract_address: str, force: bool = False
     ):
@@ -271,6 +379,50 @@ class Client:
             cmd += ['--gas', '%d' % gas]
         return client_output.RunScriptResult(self.run(cmd))
 
+    def run_scripts_batch(
+        self,
+        cases: Iterable[RunScriptCase],
+        workers: int = script_batch.WORKERS,
+    ) -> Iterator[client_output.RunScriptResult]:
+        """Run many scripts, as `run_script` would, without forking a
+        client process per case.
+
+        Each distinct contract is converted once, then the `run_code` (or
+        `trace_code`) RPCs of all cases are sent concurrently over
+        `rpc_session`. Cases the node rejects, or whose output can't be
+        rendered exactly like the client does, are run with `run_script`.
+
+        Args:
+            cases (iterable): the `RunScriptCase`s to run
+            workers (int): max number of concurrent RPC requests
+        Returns:
+            A generator of `RunScriptResult`s, in the order of `cases`.
+            Failures of cases run with `run_script` are raised when the
+            corresponding result is reached.
+        """
+        if not self._endpoint_rpc:
+            return (case.run(self) for case in cases)
+        return script_batch.run_scripts_batch(
+            self,
+            cases,
+            convert=self._convert_to_json,
+            report=self._report_output,
+            workers=workers,
+        )
+
+    def _convert_to_json(self, kind: str, source: str) -> Any:
+        """JSON of Michelson `source`, either a `script` or `data`."""
+        params = ['convert', kind, source, 'from', 'michelson', 'to', 'json']
+        # Not `self.run`: the conversion isn't part of the output of the
+        # batch, subclasses recording outputs shouldn't see it.
+        stdout, _, _ = Client.run_generic(self, params)
+        return json.loads(stdout)
+
+    def _report_output(self, output: str) -> None:
+        """Called with the output of commands emulated without running the
+        client, e.g. by `run_scripts_batch`."""
+        print(output)
+
     def hash_script(
         self,
         contracts: List[str],
@@ -665,13 +817,48 @@ class Client:
 
     def get_receipt(
         self, operation: str, args: List[str] = None
-    ) -> client_output.GetReceiptResult:
-        cmd = ['get', 'receipt', 'for', operation]
+    ) -> Union[client_output.GetReceiptResult, client_output.OperationReceipt]:
+        """Receipt of `operation`, in the head or its `--check-previous`
+        predecessors (10 by default).
+
+        With `native_rpc`, the receipt is read from the JSON answers of
+        the block RPCs instead of parsing the output of the client."""
         if args is None:
             args = []
+        if self._native_rpc and (
+            not args or (len(args) == 2 and args[0] == '--check-previous')
+        ):
+            check_previous = int(args[1]) if args else RECEIPT_CHECK_PREVIOUS
+            try:
+                return self._rpc_receipt(operation, check_previous)
+            except BlockUnavailable:
+                # e.g. blocks below the caboose of a rolling node, the
+                # client reports it
+                pass
+        cmd = ['get', 'receipt', 'for', operation]
         cmd += args
         return client_output.GetReceiptResult(self.run(cmd))
 
+    def _rpc_receipt(
+        self, operation: str, check_previous: int
+    ) -> client_output.OperationReceipt:
+        fetcher = BlockFetcher(self.rpc_session)
+        head = fetcher.get('head', '/header')
+        first = max(0, head['level'] - check_previous)
+        blocks = list(reversed(fetcher.hashes(first, head['level'])))
+        operation_hashes = fetcher.blocks(blocks, '/operation_hashes')
+        for block, passes in zip(blocks, operation_hashes):
+            for validation_pass, hashes in enumerate(passes):
+                if operation in hashes:
+                    index = hashes.index(operation)
+                    return client_output.OperationReceipt(
+                        block,
+                        fetcher.get(
+                            block, f'/operations/{validation_pass}/{index}'
+                        ),
+                    )
+        return client_output.OperationReceipt(None, None)
+
     def get_storage(self, contract: str) -> str:
         cmd = ['get', 'contract', 'storage', 'for', contract]
         res = self.run(cmd)
@@ -849,6 +1036,12 @@ class Client:
 
     def cleanup(self) -> None:
         """Remove base dir, only if not provided by user."""
+        for monitor in self._head_monitors.values():
+            monitor.close()
+        self._head_monitors = {}
+        if self._rpc_session is not None:
+            self._rpc_session.close()
+            self._rpc_session = None
         if self._is_tmp_dir:
             shutil.rmtree(self.base_dir)
 
@@ -2,11 +2,71 @@
 import json
 import re
 from enum import auto, Enum, unique
-from typing import List, Dict
+from functools import cached_property
+from typing import List, Dict, Optional
 
 # TODO This is incomplete. Add additional attributes and result classes as
 #      they are needed
 
+# Patterns are compiled once. Fields that aren't needed to check that the
+# command succeeded are parsed on first access, so that e.g. callers only
+# interested in `operation_hash` don't parse the rest of the output.
+OPERATION_HASH = re.compile(r"Operation hash is '?(\w*)")
+BRANCH_HASH = re.compile(r"--branch ?(\w*)")
+FEES = re.compile(r"Fee to the baker: ꜩ(.*)")
+OPERATION_FOUND = re.compile(r"Operation found in block: ?(\w*) ")
+ADDRESS = re.compile(r"^(\w+):\s*(\w+).*$", re.MULTILINE)
+STORAGE = re.compile(r"(?s)storage\n\s*(.*)\nemitted operations\n")
+EMITTED_OPERATIONS = re.compile(
+    r"(?s)emitted operations\n\s*(.*)\n  big_map diff"
+)
+BIG_MAP_DIFF = re.compile(r"big_map diff\n")
+BIG_MAP_DIFF_ITEM = re.compile(r"  ((New|Set|Del|Unset).*?)\n")
+NEW_CONTRACT = re.compile(r"New contract ?(\w*) originated")
+INJECTED_BLOCK = re.compile(r"Injected block ?(\w*)")
+HASH = re.compile(r"Hash: ?(\w+)")
+PUBLIC_KEY = re.compile(r"Public Key: ?(\w+)")
+SECRET_KEY = re.compile(r"Secret Key: ?(\w+:\w+)")
+INJECTED = re.compile(r"Injected ?(\w*)")
+HASH_DATA = re.compile(
+    r'''Raw packed data: ?(0x[0-9a-f]*)
+Script-expression-ID-Hash: ?(\w*)
+Raw Script-expression-ID-Hash: ?(\w*)
+.*
+Raw Sha256 hash: ?(\w*)
+Raw Sha512 hash: ?(\w*)'''
+)
+SIGNATURE = re.compile(r'Signature: ?(\w*)\n')
+DELEGATE = re.compile(r"(\w+)( \(known as (\w+)\))*")
+MNEMONIC = re.compile(
+    r'It is important to save this mnemonic in a secure '
+    r'place:\n\n([\w\s]+)\n\nThe mnemonic'
+)
+SAPLING_ADDRESS = re.compile(r"Generated address:\n(\w+)\n")
+SAPLING_INDEX = re.compile(r"at index (\d+)")
+SAPLING_PATH = re.compile(r"with path (\S+)")
+SAPLING_BALANCE = re.compile(r"Total Sapling funds ([\d\.]+)")
+BALANCE = re.compile(r"([\w.]*) ꜩ")
+ENVIRONMENT = re.compile(r"Protocol \S* uses environment (V\d)")
+POINT = re.compile(r"(⚏|⚌)  (\S*)\s?((?:id\w*)|\(last seen: id\w* \S*)? (★)?")
+ENTRYPOINT_TYPE = re.compile(r"Entrypoint .*?: (.*)\n")
+MOCKUP_PROTOCOL = re.compile(r"^(\w+)$", re.MULTILINE)
+CHAIN_ID = re.compile(r"Chain id is (.*)")
+MOCKUP_DIR_NOT_EMPTY = re.compile(
+    r"^  \S+ is not empty, please specify a fresh base directory$",
+    re.MULTILINE,
+)
+MOCKUP_ALREADY_INITIALIZED = re.compile(
+    r"^  \S+ is already initialized as a mockup directory$", re.MULTILINE
+)
+MOCKUP_CREATED = re.compile(
+    r"^Created mockup client base dir in \S+$", re.MULTILINE
+)
+SIGNATURE_CHECK = re.compile(r'Signature check successful *\n')
+FA12_INTERFACE = re.compile(r"has an FA1.2 interface.")
+FA12_UNSUPPORTED = re.compile(r"Not a supported FA1.2 contract.")
+FA12_AMOUNT = re.compile(r"([\w.]*)")
+
 
 class InvalidClientOutput(Exception):
     """Raised when client output couldn't be parsed."""
@@ -24,31 +84,37 @@ class InvalidExitCode(Exception):
         self.exit_code = exit_code
 
 
+def _operation_hash(client_output: str) -> str:
+    match = OPERATION_HASH.search(client_output)
+    if match is None:
+        raise InvalidClientOutput(client_output)
+    return match.group(1)
+
+
+def _fees(client_output: str) -> float:
+    match = FEES.search(client_output)
+    if match is None:
+        raise InvalidClientOutput(client_output)
+    return float(match.group(1))
+
+
 class EndorseResult:
     """Result of a 'endorse for' operation."""
 
     def __init__(self, client_output: str):
-        pattern = r"Operation hash is '?(\w*)"
-        match = re.search(pattern, client_output)
-        if match is None:
-            raise InvalidClientOutput(client_output)
-        self.operation_hash = match.groups()[0]
+        self.operation_hash = _operation_hash(client_output)
 
 
 class RevealResult:
     """Result of a 'reveal key for' operation."""
 
     def __init__(self, client_output: str):
-        pattern = r"Operation hash is '?(\w*)"
-        match = re.search(pattern, client_output)
-        if match is None:
-            raise InvalidClientOutput(client_output)
-        self.operation_hash = match.groups()[0]
-        pattern = r"Fee to the baker: ꜩ(.*)"
-        match = re.search(pattern, client_output)
-        if match is None:
-            raise InvalidClientOutput(client_output)
-        self.fees = float(match.groups()[0])
+        self.client_output = client_output
+        self.operation_hash = _operation_hash(client_output)
+
+    @cached_property
+    def fees(self) -> float:
+        return _fees(self.client_output)
 
 
 class TransferResult:
@@ -56,22 +122,16 @@ class TransferResult:
 
     def __init__(self, client_output: str):
         self.client_output = client_output
-        pattern = r"Operation hash is '?(\w*)"
-        match = re.search(pattern, client_output)
-        if match is None:
-            raise InvalidClientOutput(client_output)
-        self.operation_hash = match.groups()[0]
-        pattern = r"--branch ?(\w*)"
-        match = re.search(pattern, client_output)
-        if match is None:
-            self.branch_hash = None
-        else:
-            self.branch_hash = match.groups()[0]
-        pattern = r"Fee to the baker: ꜩ(.*)"
-        match = re.search(pattern, client_output)
-        if match is None:
-            raise InvalidClientOutput(client_output)
-        self.fees = float(match.groups()[0])
+        self.operation_hash = _operation_hash(client_output)
+
+    @cached_property
+    def branch_hash(self) -> Optional[str]:
+        match = BRANCH_HASH.search(self.client_output)
+        return None if match is None else match.group(1)
+
+    @cached_property
+    def fees(self) -> float:
+        return _fees(self.client_output)
 
 
 class GetReceiptResult:
@@ -84,20 +144,53 @@ class GetReceiptResult:
         if client_output == "Couldn't find operation\n":
             self.block_hash = None
             return
-        pattern = r"Operation found in block: ?(\w*) "
-        match = re.search(pattern, client_output)
+        match = OPERATION_FOUND.search(client_output)
         if match is None:
             raise InvalidClientOutput(client_output)
         self.block_hash = match.groups()[0]
 
 
+class OperationReceipt:
+    """Receipt of an operation, as answered by the RPCs of the block that
+    includes it, rather than parsed from 'get receipt' output.
+
+    If operation wasn't found, 'block_hash' and 'operation' are None.
+    """
+
+    def __init__(self, block_hash: Optional[str], operation: Optional[dict]):
+        self.block_hash = block_hash
+        self.operation = operation
+
+    @cached_property
+    def operation_hash(self) -> Optional[str]:
+        return None if self.operation is None else self.operation['hash']
+
+    @cached_property
+    def contents(self) -> List[dict]:
+        return [] if self.operation is None else self.operation['contents']
+
+    @cached_property
+    def fees(self) -> float:
+        """Fees of the operation, in tez."""
+        mutez = sum(int(content.get('fee', 0)) for content in self.contents)
+        return mutez / 1000000
+
+    @cached_property
+    def statuses(self) -> List[str]:
+        """Status of the application of each content."""
+        return [
+            content['metadata']['operation_result']['status']
+            for content in self.contents
+            if 'operation_result' in content.get('metadata', {})
+        ]
+
+
 class GetAddressesResult:
     """Result of 'list known addresses' operation."""
 
     def __init__(self, client_output: str):
 
-        pattern = re.compile(r"^(\w+):\s*(\w+).*$", re.MULTILINE)
-        self.wallet = dict(re.findall(pattern, client_output))
+        self.wallet = dict(ADDRESS.findall(client_output))
 
 
 class RunScriptResult:
@@ -105,66 +198,54 @@ class RunScriptResult:
 
     def __init__(self, client_output: str):
         # read storage output
-        pattern_str = r"(?s)storage\n\s*(.*)\nemitted operations\n"
-        match = re.search(pattern_str, client_output)
+        match = STORAGE.search(client_output)
         if match is None:
             raise InvalidClientOutput(client_output)
         self.storage = match.groups()[0]
+        self.client_output = client_output
 
+    @cached_property
+    def internal_operations(self) -> Optional[str]:
         # read operation output
-        self.internal_operations = None
-        pattern = r"(?s)emitted operations\n\s*(.*)\n  big_map diff"
-        match = re.search(pattern, client_output)
-        if match is not None:
-            self.internal_operations = match.group(1)
+        match = EMITTED_OPERATIONS.search(self.client_output)
+        return None if match is None else match.group(1)
 
+    @cached_property
+    def big_map_diff(self) -> List:
         # read map diff output
-        self.big_map_diff = []  # type: List
-        pattern_str = r"big_map diff\n"
-        match = re.search(pattern_str, client_output)
+        big_map_diff = []  # type: List
+        match = BIG_MAP_DIFF.search(self.client_output)
         if match is not None:
-            compiled_pattern = re.compile(r"  ((New|Set|Del|Unset).*?)\n")
-            for match_diff in compiled_pattern.finditer(
-                client_output, match.end(0)
+            for match_diff in BIG_MAP_DIFF_ITEM.finditer(
+                self.client_output, match.end(0)
             ):
-                self.big_map_diff.append([match_diff.group(1)])
-
-        self.client_output = client_output
+                big_map_diff.append([match_diff.group(1)])
+        return big_map_diff
 
 
 class OriginationResult:
     """Result of an 'originate contract' operation."""
 
     def __init__(self, client_output: str):
-        pattern = r"New contract ?(\w*) originated"
-        match = re.search(pattern, client_output)
+        match = NEW_CONTRACT.search(client_output)
         if match is None:
             raise InvalidClientOutput(client_output)
         self.contract = match.groups()[0]
-        pattern = r"Operation hash is '?(\w*)"
-        match = re.search(pattern, client_output)
-        if match is None:
-            raise InvalidClientOutput
-        self.operation_hash = match.groups()[0]
+        self.operation_hash = _operation_hash(client_output)
 
 
 class SubmitProposalsResult:
     """Result of an 'submit proposals' operation."""
 
     def __init__(self, client_output: str):
-        pattern = r"Operation hash is '?(\w*)"
-        match = re.search(pattern, client_output)
-        if match is None:
-            raise InvalidClientOutput(client_output)
-        self.operation_hash = match.groups()[0]
+        self.operation_hash = _operation_hash(client_output)
 
 
 class BakeForResult:
     """Result of a 'baker for' operation."""
 
     def __init__(self, client_output: str):
-        pattern = r"Injected block ?(\w*)"
-        match = re.search(pattern, client_output)
+        match = INJECTED_BLOCK.search(client_output)
         if match is None:
             raise InvalidClientOutput(client_output)
         self.block_hash = match.groups()[0]
@@ -174,19 +255,16 @@ class ShowAddressResult:
     """Result of a 'show address' command."""
 
     def __init__(self, client_output: str):
-        pattern = r"Hash: ?(\w+)"
-        match = re.search(pattern, client_output)
+        match = HASH.search(client_output)
         if match is None:
             raise InvalidClientOutput(client_output)
         self.hash = match.groups()[0]
-        pattern = r"Public Key: ?(\w+)"
-        match = re.search(pattern, client_output)
+        match = PUBLIC_KEY.search(client_output)
         if match is None:
             self.public_key = None
         else:
             self.public_key = match.groups()[0]
-        pattern = r"Secret Key: ?(\w+:\w+)"
-        match = re.search(pattern, client_output)
+        match = SECRET_KEY.search(client_output)
         if match is None:
             self.secret_key = None
         else:
@@ -197,8 +275,7 @@ class ActivationResult:
     """Result of 'activate protocol' command"""
 
     def __init__(self, client_output: str):
-        pattern = r"Injected ?(\w*)"
-        match = re.search(pattern, client_output)
+        match = INJECTED.search(client_output)
         if match is None:
             raise InvalidClientOutput(client_output)
         self.block_hash = match.groups()[0]
@@ -208,8 +285,7 @@ class WaitForResult:
     """Result of a 'wait for' command."""
 
     def __init__(self, client_output: str):
-        pattern = r"Operation found in block: ?(\w*) "
-        match = re.search(pattern, client_output)
+        match = OPERATION_FOUND.search(client_output)
         if match is None:
             raise InvalidClientOutput(client_output)
         self.block_hash = match.groups()[0]
@@ -219,14 +295,7 @@ class HashResult:
     """Result of a 'hash data' command."""
 
     def __init__(self, client_output: str):
-
-        pattern = r'''Raw packed data: ?(0x[0-9a-f]*)
-Script-expression-ID-Hash: ?(\w*)
-Raw Script-expression-ID-Hash: ?(\w*)
-.*
-Raw Sha256 hash: ?(\w*)
-Raw Sha512 hash: ?(\w*)'''
-        match = re.search(pattern, client_output)
+        match = HASH_DATA.search(client_output)
         if match is None:
             raise InvalidClientOutput(client_output)
         self.packed = match.groups()[0]
@@ -240,9 +309,7 @@ class SignBytesResult:
     """Result of a 'sign bytes ...' command."""
 
     def __init__(self, client_output: str):
-
-        pattern = r'Signature: ?(\w*)\n'
-        match = re.search(pattern, client_output)
+        match = SIGNATURE.search(client_output)
         if match is None:
             raise InvalidClientOutput(client_output)
         self.signature = match.groups()[0]
@@ -252,9 +319,7 @@ class SignMessageResult:
     """Result of a 'sign message ...' command."""
 
     def __init__(self, client_output: str):
-
-        pattern = r'Signature: ?(\w*)\n'
-        match = re.search(pattern, client_output)
+        match = SIGNATURE.search(client_output)
         if match is None:
             raise InvalidClientOutput(client_output)
         self.signature = match.groups()[0]
@@ -264,14 +329,13 @@ class SetDelegateResult:
     """Result of a 'set delegate' operation."""
 
     def __init__(self, client_output: str):
-        pattern = r"Operation hash is '?(\w*)"
-        match = re.search(pattern, client_output)
-        if match is None:
-            raise InvalidClientOutput(client_output)
-        self.operation_hash = match.groups()[0]
-        pattern = r"--branch ?(\w*)"
-        match = re.search(pattern, client_output)
-        self.branch_hash = None if match is None else match.groups()[0]
+        self.client_output = client_output
+        self.operation_hash = _operation_hash(client_output)
+
+    @cached_property
+    def branch_hash(self) -> Optional[str]:
+        match = BRANCH_HASH.search(self.client_output)
+        return None if match is None else match.group(1)
 
 
 class GetDelegateResult:
@@ -281,8 +345,7 @@ class GetDelegateResult:
         if client_output == 'none\n':
             self.delegate = None
         else:
-            pattern = r"(\w+)( \(known as (\w+)\))*"
-            match = re.search(pattern, client_output)
+            match = DELEGATE.search(client_output)
             if match is None:
                 raise InvalidClientOutput(client_output)
             self.address = match.groups()[0]
@@ -294,11 +357,7 @@ class SaplingGenKeyResult:
     """Result of a 'sapling gen key' operation."""
 
     def __init__(self, client_output: str):
-        pattern = (
-            r'It is important to save this mnemonic in a secure '
-            r'place:\n\n([\w\s]+)\n\nThe mnemonic'
-        )
-        match = re.search(pattern, client_output)
+        match = MNEMONIC.search(client_output)
         if match is None:
             raise InvalidClientOutput(client_output)
         self.mnemonic = match.groups()[0].split()
@@ -308,11 +367,11 @@ class SaplingGenAddressResult:
     """Result of a 'sapling gen address' operation."""
 
     def __init__(self, client_output: str):
-        address_match = re.search(r"Generated address:\n(\w+)\n", client_output)
+        address_match = SAPLING_ADDRESS.search(client_output)
         if address_match is None:
             raise InvalidClientOutput(client_output)
         self.address = address_match.groups()[0]
-        index_match = re.search(r"at index (\d+)", client_output)
+        index_match = SAPLING_INDEX.search(client_output)
         if index_match is None:
             raise InvalidClientOutput(client_output)
         self.index = int(index_match.groups()[0])
@@ -322,7 +381,7 @@ class SaplingDeriveKeyResult:
     """Result of a 'sapling derive key' operation."""
 
     def __init__(self, client_output: str):
-        path_match = re.search(r"with path (\S+)", client_output)
+        path_match = SAPLING_PATH.search(client_output)
         if path_match is None:
             raise InvalidClientOutput(client_output)
         self.path = path_match.groups()[0]
@@ -332,9 +391,7 @@ class SaplingGetBalanceResult:
     """Result of a 'sapling get balance' query."""
 
     def __init__(self, client_output: str):
-        balance_match = re.search(
-            r"Total Sapling funds ([\d\.]+)", client_output
-        )
+        balance_match = SAPLING_BALANCE.search(client_output)
         if balance_match is None:
             raise InvalidClientOutput(client_output)
         self.balance = float(balance_match.groups()[0])
@@ -354,8 +411,7 @@ def extract_rpc_answer(client_output: str) -> dict:
 def extract_balance(client_output: str) -> float:
     """Extract float balance from the output of 'get_balance' operation."""
     try:
-        pattern = r"([\w.]*) ꜩ"
-        match = re.search(pattern, client_output)
+        match = BALANCE.search(client_output)
         if match is None:
             raise InvalidClientOutput(client_output)
         return float(match.groups()[0])
@@ -372,8 +428,7 @@ def extract_environment_protocol(client_output: str) -> str:
     """Extract environment protocol version from the output of
     'protocol_environment' operation."""
     try:
-        pattern = r"Protocol \S* uses environment (V\d)"
-        match = re.search(pattern, client_output)
+        match = ENVIRONMENT.search(client_output)
         if match is None:
             raise InvalidClientOutput(client_output)
         return match.groups()[0]
@@ -403,9 +458,7 @@ def parse_point(line):
     #  ⚏  127.0.0.1:19764 ★
     #  ⚏  127.0.0.1:19730
     #  (last seen: idtbwXjfV38usn36SoL5sMcdYRk5sL 2019-08-07T12:13:13-00:00) ★
-    last_seen_or_id = r"(?:id\w*)|\(last seen: id\w* \S*"
-    pattern = r"(⚏|⚌)  (\S*)\s?(" + last_seen_or_id + ")? (★)?"
-    match = re.search(pattern, line)
+    match = POINT.search(line)
     assert match is not None
     groups = match.groups()
     assert len(groups) == 4
@@ -438,8 +491,7 @@ class GetContractEntrypointTypeResult:
     """Result of a 'get contract entrypoint type of' command."""
 
     def __init__(self, client_output: str):
-        pattern = r"Entrypoint .*?: (.*)\n"
-        match = re.search(pattern, client_output)
+        match = ENTRYPOINT_TYPE.search(client_output)
         if match is None:
             raise InvalidClientOutput(client_output)
         self.entrypoint_type = match.groups()[0]
@@ -449,8 +501,7 @@ class ListMockupProtocols:
     """Result of 'list mockup protocols' query."""
 
     def __init__(self, client_output: str):
-        pattern = re.compile(r"^(\w+)$", re.MULTILINE)
-        self.mockup_protocols = re.findall(pattern, client_output)
+        self.mockup_protocols = MOCKUP_PROTOCOL.findall(client_output)
 
 
 @unique
@@ -478,7 +529,7 @@ class CreateMockup:
         self.exit_code = exit_code
         self.create_mockup_result = None
         self.chain_id = None
-        match = re.search(r"Chain id is (.*)", self.client_stdout)
+        match = CHAIN_ID.search(self.client_stdout)
         if match is not None:
             self.chain_id = match.group(1)
 
@@ -489,28 +540,28 @@ class CreateMockup:
         # - the result to set in self.create_mockup_result
         outputs = [
             (
-                r"^  \S+ is not empty, please specify a fresh base directory$",
+                MOCKUP_DIR_NOT_EMPTY,
                 client_stderr,
                 CreateMockupResult.DIR_NOT_EMPTY,
             ),
             (
-                r"^  \S+ is already initialized as a mockup directory$",
+                MOCKUP_ALREADY_INITIALIZED,
                 client_stderr,
                 CreateMockupResult.ALREADY_INITIALIZED,
             ),
             (
-                r"^Created mockup client base dir in \S+$",
+                MOCKUP_CREATED,
                 client_stdout,
                 CreateMockupResult.OK,
             ),
         ]
 
         for outp in outputs:
-            pattern = re.compile(outp[0], re.MULTILINE)
+            pattern = outp[0]
             out_channel = outp[1]
             result = outp[2]
             expected_exit_code = result.to_return_code()
-            if re.search(pattern, out_channel) is not None:
+            if pattern.search(out_channel) is not None:
                 self.create_mockup_result = result
                 if exit_code != expected_exit_code:
                     raise InvalidExitCode(exit_code)
@@ -521,9 +572,7 @@ class CheckSignMessageResult:
     """Result of a 'check that message...' command."""
 
     def __init__(self, client_output: str):
-
-        pattern = r'Signature check successful *\n'
-        match = re.search(pattern, client_output)
+        match = SIGNATURE_CHECK.search(client_output)
         if match is None:
             raise InvalidClientOutput(client_output)
         self.check = True
@@ -540,11 +589,9 @@ class FA12CheckResult:
     """Result of a 'check contract .. has fa1.2 interface` command."""
 
     def __init__(self, client_output: str):
-        pattern = r"has an FA1.2 interface."
-        match = re.search(pattern, client_output)
+        match = FA12_INTERFACE.search(client_output)
         if match is None:
-            pattern = r"Not a supported FA1.2 contract."
-            match = re.search(pattern, client_output)
+            match = FA12_UNSUPPORTED.search(client_output)
             if match is None:
                 raise InvalidClientOutput(client_output)
             self.check = False
@@ -557,8 +604,7 @@ class FA12ViewResult:
 
     def __init__(self, client_output: str):
         try:
-            pattern = r"([\w.]*)"
-            match = re.search(pattern, client_output)
+            match = FA12_AMOUNT.search(client_output)
             if match is None:
                 raise InvalidClientOutput(client_output)
             self.amount = int(match.groups()[0])
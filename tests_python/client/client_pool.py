@@ -0,0 +1,105 @@
+"""Concurrent execution of tezos-client commands."""
+import concurrent.futures
+import os
+import subprocess
+import sys
+from typing import Any, Iterable, List, Optional, Sequence
+
+from .client import Client
+
+
+class ClientPool:
+    """Bounded pool of workers running commands of a `Client` concurrently.
+
+    tezos-client doesn't provide a server mode, each command still forks
+    its own process. The pool amortizes process startup (binary loading,
+    protocol plugins, base dir parsing) by overlapping independent
+    commands on up to `workers` processes at a time.
+
+    Commands are dispatched by name to the wrapped client, e.g.
+
+    with ClientPool(client, workers=8) as pool:
+        results = pool.map('run_script', [(contract, storage, inp), ...])
+
+    Only commands which don't write to the client base dir (`run_script`,
+    `typecheck`, `hash`, `normalize`...) should be run concurrently. The
+    exception is commands whose writes are done under the lock of the
+    base dir, such as `endorse`, which updates the high watermarks of the
+    endorser: they are serialized by tezos-client itself, but they only
+    overlap the rest of their work (RPCs, signing, injection). A
+    `ClientRegression` shouldn't be used either, its regression output
+    would be interleaved.
+
+    A command whose process is killed by a signal (e.g. OOM) is retried
+    up to `retries` times. Commands failing with a non-zero exit code
+    aren't retried, and the `CalledProcessError` is raised as usual when
+    the result is retrieved.
+    """
+
+    def __init__(
+        self, client: Client, workers: Optional[int] = None, retries: int = 1
+    ):
+        """
+        Args:
+            client (Client): the client whose commands are run
+            workers (int): max number of concurrent client processes,
+                           defaults to the number of CPUs
+            retries (int): how many times a crashed command is restarted
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+        assert workers >= 1
+        assert retries >= 0
+        self.client = client
+        self.workers = workers
+        self.retries = retries
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='tezos-client'
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _call(self, method: str, args: Sequence, kwargs: dict) -> Any:
+        attempts = self.retries
+        while True:
+            try:
+                return getattr(self.client, method)(*args, **kwargs)
+            except subprocess.CalledProcessError as exc:
+                # negative return code: the process was killed by a signal
+                if exc.returncode >= 0 or attempts == 0:
+                    raise
+                print(
+                    f'# {method} killed by signal {-exc.returncode}, retrying',
+                    file=sys.stderr,
+                )
+                attempts -= 1
+
+    def submit(
+        self, method: str, *args, **kwargs
+    ) -> 'concurrent.futures.Future[Any]':
+        """Schedule `client.method(*args, **kwargs)`.
+
+        Returns:
+            A future holding the result of the command.
+        """
+        assert callable(getattr(self.client, method, None)), method
+        return self._executor.submit(self._call, method, args, kwargs)
+
+    def map(self, method: str, args_list: Iterable[Sequence]) -> List[Any]:
+        """Run `client.method(*args)` for each `args` in `args_list`.
+
+        Returns:
+            The list of results, in the order of `args_list`. The first
+            failure is raised once all commands have completed.
+        """
+        futures = [self.submit(method, *args) for args in args_list]
+        concurrent.futures.wait(futures)
+        return [future.result() for future in futures]
+
+    def close(self) -> None:
+        """Wait for pending commands and release the workers."""
+        self._executor.shutdown(wait=True)
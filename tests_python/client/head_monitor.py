@@ -0,0 +1,110 @@
+"""Notification of the new heads of nodes, as streamed by `monitor/heads`.
+
+Tests waiting for a node to reach some state (a level, a protocol...) used
+to poll the node, sleeping a few seconds between attempts. A `HeadMonitor`
+follows the heads of a node in a background thread instead, so that a
+waiter can check its condition again as soon as any monitored node
+switches to a new head:
+
+    seen = head_monitor.heads_seen()
+    while not condition():
+        head_monitor.wait_new_head(seen, timeout)
+        seen = head_monitor.heads_seen()
+"""
+import sys
+import threading
+from typing import Optional
+
+import requests
+
+from .rpc_session import RpcSession
+
+# Max time (sec) the stream stays silent before it is opened again. Also
+# bounds the time `close` waits for the monitor thread.
+READ_TIMEOUT = 1.0
+
+# Time (sec) to wait before reconnecting to a node that can't be reached
+# (e.g. while it is restarted)
+RECONNECT_DELAY = 0.5
+
+# Notified whenever any monitor sees a new head
+_NEW_HEAD = threading.Condition()
+_heads_seen = 0
+
+
+def heads_seen() -> int:
+    """Number of new heads seen so far, by all monitors."""
+    with _NEW_HEAD:
+        return _heads_seen
+
+
+def wait_new_head(seen: int, timeout: float) -> bool:
+    """Wait until some monitor sees a new head.
+
+    Args:
+        seen (int): the value of `heads_seen()` when the waiter last
+                    checked its condition
+        timeout (float): max time to wait (sec)
+    Returns:
+        True if a new head was seen since `seen`, False on timeout.
+    """
+    with _NEW_HEAD:
+        return _NEW_HEAD.wait_for(lambda: _heads_seen > seen, timeout)
+
+
+class HeadMonitor:
+    """Follows the heads of a chain of a node, in a background thread.
+
+    The stream is opened again whenever it breaks, so that a monitor
+    survives restarts of its node.
+    """
+
+    def __init__(self, endpoint: str, chain: str = 'main'):
+        """
+        Args:
+            endpoint (str): the RPC endpoint of the node
+            chain (str): the monitored chain, `main` or `test`
+        """
+        self.chain = chain
+        self.head = None  # type: Optional[dict]
+        self._session = RpcSession(endpoint, pool_size=1)
+        self._closed = threading.Event()
+        self._thread = threading.Thread(
+            target=self._follow, name=f'head-monitor-{chain}', daemon=True
+        )
+        self._thread.start()
+
+    def _follow(self) -> None:
+        path = f'/monitor/heads/{self.chain}'
+        while not self._closed.is_set():
+            try:
+                for head in self._session.stream(path, timeout=READ_TIMEOUT):
+                    self._set_head(head)
+                    if self._closed.is_set():
+                        return
+                continue
+            except (
+                requests.ConnectionError,
+                requests.Timeout,
+                requests.exceptions.ChunkedEncodingError,
+            ):
+                # no new head for a while, or the node is down
+                pass
+            except requests.RequestException as exc:
+                print(f'# {path}: {exc}', file=sys.stderr)
+            self._closed.wait(RECONNECT_DELAY)
+
+    def _set_head(self, head: dict) -> None:
+        global _heads_seen  # pylint: disable=global-statement
+        with _NEW_HEAD:
+            if self.head is not None and self.head['hash'] == head['hash']:
+                return
+            self.head = head
+            _heads_seen += 1
+            _NEW_HEAD.notify_all()
+
+    def close(self) -> None:
+        """Stop following the node."""
+        self._closed.set()
+        self._thread.join(READ_TIMEOUT + RECONNECT_DELAY)
+        self._session.close()
@@ -0,0 +1,256 @@
+"""Conversion between Michelson concrete syntax and JSON Micheline.
+
+`parse` reads data expressions (storages, parameters...) into the JSON
+representation used by the node RPCs, and `print_expr` renders JSON
+Micheline exactly like the client prints expressions (see
+`Micheline_printer` in src/lib_micheline).
+
+Macros aren't supported: only the client knows how to expand them.
+"""
+import re
+from typing import Any, List, Tuple
+
+# Primitives of the Michelson language (Michelson_v1_primitives)
+PRIMITIVES = frozenset(
+    '''
+    ABS ADD ADDRESS AMOUNT AND APPLY BALANCE BLAKE2B CAR CAST CDR CHAIN_ID
+    CHECK_SIGNATURE COMPARE CONCAT CONS CONTRACT CREATE_ACCOUNT
+    CREATE_CONTRACT DIG DIP DROP DUG DUP EDIV EMPTY_BIG_MAP EMPTY_MAP
+    EMPTY_SET EQ EXEC Elt FAILWITH False GE GET GET_AND_UPDATE GT HASH_KEY
+    IF IF_CONS IF_LEFT IF_NONE IMPLICIT_ACCOUNT INT ISNAT ITER JOIN_TICKETS
+    KECCAK LAMBDA LE LEFT LEVEL LOOP LOOP_LEFT LSL LSR LT Left MAP MEM MUL
+    NEG NEQ NEVER NIL NONE NOT NOW None OPEN_CHEST OR PACK PAIR
+    PAIRING_CHECK PUSH Pair READ_TICKET RENAME RIGHT Right
+    SAPLING_EMPTY_STATE SAPLING_VERIFY_UPDATE SELF SELF_ADDRESS SENDER
+    SET_DELEGATE SHA256 SHA3 SHA512 SIZE SLICE SOME SOURCE SPLIT_TICKET
+    STEPS_TO_QUOTA SUB SWAP Some TICKET TOTAL_VOTING_POWER TRANSFER_TOKENS
+    True UNIT UNPACK UNPAIR UPDATE Unit VIEW VOTING_POWER XOR address
+    big_map bls12_381_fr bls12_381_g1 bls12_381_g2 bool bytes chain_id chest
+    chest_key code constant contract int key key_hash lambda list map mutez
+    nat never operation option or pair parameter sapling_state
+    sapling_transaction set signature storage string ticket timestamp unit
+    view
+    '''.split()
+)
+
+_TOKEN = re.compile(
+    r'''
+    (?P<space>\s+|\#[^\n]*|/\*.*?\*/)
+    | (?P<bytes>0x[0-9a-fA-F]*)
+    | (?P<int>-?[0-9]+)
+    | (?P<string>"(?:[^"\\\n]|\\.)*")
+    | (?P<annot>[@:%][_0-9a-zA-Z.%@]*)
+    | (?P<prim>[A-Za-z_][A-Za-z_0-9]*)
+    | (?P<punct>[(){};])
+    ''',
+    re.VERBOSE | re.DOTALL,
+)
+
+_UNESCAPE = {'n': '\n', 't': '\t', 'b': '\b', 'r': '\r', '"': '"', '\\': '\\'}
+
+# Longest expression printed on a single line
+_MAX_LINE = 80
+
+
+class MichelineParseError(Exception):
+    """Raised when an expression can't be parsed without the client."""
+
+    def __init__(self, text: str, reason: str):
+        super().__init__(f'{reason} in: {text}')
+        self.text = text
+        self.reason = reason
+
+
+def _tokenize(text: str) -> List[Tuple[str, str]]:
+    tokens = []
+    pos = 0
+    while pos < len(text):
+        match = _TOKEN.match(text, pos)
+        if match is None:
+            raise MichelineParseError(text, f'unexpected character {pos}')
+        kind = match.lastgroup
+        assert kind is not None
+        if kind != 'space':
+            tokens.append((kind, match.group()))
+        pos = match.end()
+    return tokens
+
+
+class _Parser:
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = _tokenize(text)
+        self.pos = 0
+
+    def peek(self) -> Tuple[str, str]:
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos]
+        return ('eof', '')
+
+    def next(self) -> Tuple[str, str]:
+        token = self.peek()
+        if token[0] == 'eof':
+            raise MichelineParseError(self.text, 'unexpected end')
+        self.pos += 1
+        return token
+
+    def expect(self, value: str) -> None:
+        _, token = self.next()
+        if token != value:
+            raise MichelineParseError(self.text, f'expected {value}')
+
+    def _at_argument(self) -> bool:
+        kind, token = self.peek()
+        return kind not in {'eof', 'punct'} or token in {'(', '{'}
+
+    def literal(self, kind: str, token: str) -> Any:
+        if kind == 'int':
+            return {'int': str(int(token))}
+        if kind == 'bytes':
+            return {'bytes': token[2:].lower()}
+        if kind == 'string':
+            return {
+                'string': re.sub(
+                    r'\\(.)', lambda m: _UNESCAPE[m.group(1)], token[1:-1]
+                )
+            }
+        raise MichelineParseError(self.text, f'unexpected {token}')
+
+    def prim(self, name: str, with_args: bool) -> Any:
+        if name not in PRIMITIVES:
+            raise MichelineParseError(self.text, f'unknown primitive {name}')
+        annots = []
+        while self.peek()[0] == 'annot':
+            annots.append(self.next()[1])
+        args = []
+        while with_args and self._at_argument():
+            args.append(self.argument())
+        res = {'prim': name}  # type: Any
+        if args:
+            res['args'] = args
+        if annots:
+            res['annots'] = annots
+        return res
+
+    def sequence(self) -> Any:
+        items = []
+        while self.peek()[1] != '}':
+            items.append(self.expression())
+            if self.peek()[1] == ';':
+                self.next()
+            elif self.peek()[1] != '}':
+                raise MichelineParseError(self.text, 'expected ; or }')
+        self.next()
+        return items
+
+    def argument(self) -> Any:
+        """An argument of a primitive application: no unparenthesized
+        applications."""
+        kind, token = self.next()
+        if token == '(':
+            res = self.expression()
+            self.expect(')')
+            return res
+        if token == '{':
+            return self.sequence()
+        if kind == 'prim':
+            return self.prim(token, with_args=False)
+        return self.literal(kind, token)
+
+    def expression(self) -> Any:
+        kind, token = self.peek()
+        if kind == 'prim':
+            self.next()
+            return self.prim(token, with_args=True)
+        return self.argument()
+
+
+def parse(text: str) -> Any:
+    """JSON Micheline of the Michelson expression `text`.
+
+    Raises `MichelineParseError` if `text` isn't a valid expression or if
+    it uses a macro."""
+    parser = _Parser(text)
+    res = parser.expression()
+    if parser.peek()[0] != 'eof':
+        raise MichelineParseError(text, 'trailing tokens')
+    return res
+
+
+def _quote(value: str) -> str:
+    escaped = (
+        value.replace('\\', '\\\\')
+        .replace('"', '\\"')
+        .replace('\n', '\\n')
+        .replace('\r', '\\r')
+        .replace('\b', '\\b')
+        .replace('\t', '\\t')
+    )
+    return f'"{escaped}"'
+
+
+def _size(expr: Any) -> int:
+    """Size of expr printed on one line, as computed by `preformat`."""
+    if isinstance(expr, list):
+        return 4 + sum(3 + _size(item) for item in expr)
+    if 'int' in expr:
+        return len(expr['int'])
+    if 'string' in expr:
+        return len(expr['string'].encode())
+    if 'bytes' in expr:
+        return len(expr['bytes']) + 2
+    annots = expr.get('annots', [])
+    size = len(expr['prim']) + (len(' '.join(annots)) + 2 if annots else 0)
+    return size + sum(1 + _size(arg) for arg in expr.get('args', []))
+
+
+def _newline(col: int) -> str:
+    return '\n' + ' ' * col
+
+
+def _print_wrapped(expr: Any, col: int) -> str:
+    if isinstance(expr, dict) and (expr.get('args') or expr.get('annots')):
+        return '(' + _print_unwrapped(expr, col + 1) + ')'
+    return _print_unwrapped(expr, col)
+
+
+def _print_unwrapped(expr: Any, col: int) -> str:
+    if isinstance(expr, list):
+        if not expr:
+            return '{}'
+        if _size(expr) < _MAX_LINE:
+            items = (_print_unwrapped(item, 0) for item in expr)
+            return '{ ' + ' ; '.join(items) + ' }'
+        col += 2
+        items = (_print_unwrapped(item, col) for item in expr)
+        return '{ ' + (' ;' + _newline(col)).join(items) + ' }'
+    if 'int' in expr:
+        return expr['int']
+    if 'string' in expr:
+        return _quote(expr['string'])
+    if 'bytes' in expr:
+        return '0x' + expr['bytes']
+    name = ' '.join([expr['prim']] + expr.get('annots', []))
+    args = expr.get('args', [])
+    if not args:
+        return name
+    if _size(expr) < _MAX_LINE:
+        return ' '.join([name] + [_print_wrapped(arg, 0) for arg in args])
+    if len(name) <= 4:
+        col += len(name) + 1
+        printed = (_print_wrapped(arg, col) for arg in args)
+        return name + ' ' + _newline(col).join(printed)
+    col += 2
+    printed = (_print_wrapped(arg, col) for arg in args)
+    return name + _newline(col) + _newline(col).join(printed)
+
+
+def print_expr(expr: Any) -> str:
+    """Michelson concrete syntax of JSON Micheline `expr`, applications
+    are parenthesized."""
+    return _print_wrapped(expr, 0)
+
+
+def print_expr_unwrapped(expr: Any) -> str:
+    """Same as `print_expr`, without parentheses around applications."""
+    return _print_unwrapped(expr, 0)
@@ -0,0 +1,110 @@
+"""Persistent HTTP(S) connection to the RPC server of a Tezos node."""
+import codecs
+import json
+from typing import Any, Iterator, Optional
+from urllib.parse import urlsplit
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+# Number of keep-alive connections kept open towards the node
+POOL_SIZE = 16
+
+
+class RpcSession:
+    """Keep-alive HTTP(S) session to a node RPC endpoint.
+
+    Unlike `Client.rpc`, which forks a tezos-client process for every
+    call, requests issued through a `RpcSession` reuse a pool of open
+    connections to the node. This is meant for tests that issue many
+    light-weight RPCs (e.g. polling the head level).
+
+    Typical use.
+
+    session = RpcSession('http://localhost:18730')
+    head = session.call('get', '/chains/main/blocks/head').json()
+    session.close()
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        pool_size: int = POOL_SIZE,
+        timeout: Optional[float] = None,
+    ):
+        """
+        Args:
+            endpoint (str): the RPC endpoint, e.g. http://127.0.0.1:8732
+            pool_size (int): max number of connections kept alive
+            timeout (float): timeout (sec) of a single request, no timeout
+                             if None
+        """
+        scheme = urlsplit(endpoint).scheme
+        assert scheme in {'http', 'https'}, f'unexpected endpoint {endpoint}'
+        self.endpoint = endpoint.rstrip('/')
+        self.timeout = timeout
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session = requests.Session()
+        session.mount(f'{scheme}://', adapter)
+        if scheme == 'https':
+            # Sandboxed nodes use self-signed certificates
+            session.verify = False
+            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        self._session = session
+
+    def url(self, path: str) -> str:
+        """Full URL of RPC `path`, with or without leading '/'."""
+        return f'{self.endpoint}/{path.lstrip("/")}'
+
+    def call(self, verb: str, path: str, data: Any = None) -> requests.Response:
+        """Call RPC `path` with HTTP method `verb`.
+
+        Args:
+            verb (str): either `get`, `post`, `put`, `patch` or `delete`
+            path (str): rpc path
+            data (dict): json data for post/put/patch
+        Returns:
+            A `Response` object. Raises `requests.RequestException` if the
+            node can't be reached.
+        """
+        assert verb in {'put', 'get', 'post', 'delete', 'patch'}
+        return self._session.request(
+            verb, self.url(path), json=data, timeout=self.timeout
+        )
+
+    def stream(
+        self, path: str, timeout: Optional[float] = None
+    ) -> Iterator[Any]:
+        """JSON values sent by streamed RPC `path`, e.g. `/monitor/heads/main`.
+
+        Args:
+            path (str): rpc path
+            timeout (float): max time (sec) to wait for the next value, no
+                             timeout if None
+        Returns:
+            A generator of the values, as they are received. It raises
+            `requests.RequestException` if the node can't be reached, the
+            call fails or the timeout expires.
+        """
+        decoder = json.JSONDecoder()
+        utf8 = codecs.getincrementaldecoder('utf-8')()
+        with self._session.get(
+            self.url(path), stream=True, timeout=timeout
+        ) as response:
+            response.raise_for_status()
+            buffer = ''
+            for chunk in response.iter_content(chunk_size=None):
+                buffer = (buffer + utf8.decode(chunk)).lstrip()
+                while buffer:
+                    try:
+                        value, end = decoder.raw_decode(buffer)
+                    except ValueError:
+                        # incomplete value, wait for the next chunk
+                        break
+                    yield value
+                    buffer = buffer[end:].lstrip()
+
+    def close(self) -> None:
+        """Close all pooled connections."""
+        self._session.close()
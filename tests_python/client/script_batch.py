@@ -0,0 +1,326 @@
+"""Batched execution of `run script` through the scripts RPCs.
+
+`run_scripts_batch` runs many (contract, storage, input) cases without
+forking a tezos-client process per case. Scripts are converted to JSON
+once per distinct contract, all `run_code`/`trace_code` requests are sent
+concurrently over the keep-alive `RpcSession` of the client, and each
+answer is rendered exactly like `tezos-client run script` prints it.
+
+Cases the RPC rejects (ill-typed data, `FAILWITH`...), or whose result
+can't be rendered here (e.g. emitted originations), are run again through
+`Client.run_script`, so that errors and outputs are the ones of the client.
+"""
+import concurrent.futures
+import os
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import requests
+
+from . import client_output, micheline
+
+# Default amount and balance of `run script`, in mutez
+DEFAULT_AMOUNT = 50_000
+DEFAULT_BALANCE = 4_000_000_000_000
+
+# Max number of concurrent RPC requests
+WORKERS = 16
+
+TEZ_SYMBOL = 'ꜩ'
+
+
+class RunScriptCase:
+    """Arguments of a single `Client.run_script` call."""
+
+    def __init__(
+        self,
+        contract: str,
+        storage: str,
+        inp: str,
+        amount: float = None,
+        balance: float = None,
+        trace_stack: bool = False,
+        gas: int = None,
+        file: bool = True,
+    ):
+        self.contract = contract
+        self.storage = storage
+        self.inp = inp
+        self.amount = amount
+        self.balance = balance
+        self.trace_stack = trace_stack
+        self.gas = gas
+        self.file = file
+
+    def run(self, client) -> client_output.RunScriptResult:
+        """Run this case with `client.run_script`."""
+        return client.run_script(
+            self.contract,
+            self.storage,
+            self.inp,
+            amount=self.amount,
+            balance=self.balance,
+            trace_stack=self.trace_stack,
+            gas=self.gas,
+            file=self.file,
+        )
+
+
+class UnsupportedOutput(Exception):
+    """Raised when a result can't be rendered like the client does."""
+
+
+def _mutez(tez: float) -> int:
+    # same rounding as the '%.6f' formatting of `Client.run_script`
+    return int(round(float('%.6f' % tez) * 1_000_000))
+
+
+def _indent(text: str, col: int) -> str:
+    return text.replace('\n', '\n' + ' ' * col)
+
+
+def _pp_tez(mutez: int) -> str:
+    """Tez amount as printed by `Tez.pp`."""
+    ints, decs = divmod(mutez, 1_000_000)
+    res = str(ints)
+    if decs:
+        res += '.' + f'{decs:06d}'.rstrip('0')
+    return res
+
+
+def _pp_gas(gas: Any) -> str:
+    """Remaining gas as printed by `Gas.pp`, `gas` is in milligas."""
+    if gas == 'unaccounted':
+        return gas
+    units, milli = divmod(int(gas), 1000)
+    if milli == 0:
+        return f'{units} units remaining'
+    return f'{units}.{milli:03d} units remaining'
+
+
+def _pp_map_id(big_map: str) -> str:
+    if int(big_map) < 0:
+        return f'temp({-int(big_map)})'
+    return f'map({big_map})'
+
+
+def _print_internal_operation(operation: dict) -> str:
+    kind = operation['kind']
+    if kind == 'transaction':
+        lines = [
+            'Internal transaction:',
+            f'Amount: {TEZ_SYMBOL}{_pp_tez(int(operation["amount"]))}',
+            f'From: {operation["source"]}',
+            f'To: {operation["destination"]}',
+        ]
+        parameters = operation.get('parameters')
+        if parameters is not None:
+            if parameters['entrypoint'] != 'default':
+                lines.append(f'Entrypoint: {parameters["entrypoint"]}')
+            if parameters['value'] != {'prim': 'Unit'}:
+                expr = micheline.print_expr(parameters['value'])
+                lines.append('Parameter: ' + _indent(expr, 13))
+        return '\n  '.join(lines)
+    if kind == 'delegation':
+        delegate = operation.get('delegate', 'nobody')
+        return (
+            f'Internal Delegation:\n  Contract: {operation["source"]}\n'
+            f'  To: {delegate}'
+        )
+    # originations print the unexpanded script, which needs the client
+    raise UnsupportedOutput(kind)
+
+
+def _print_big_map_diff_item(item: dict) -> str:
+    action = item['action']
+    if action == 'update':
+        res = (
+            f'{"Set" if "value" in item else "Unset"} '
+            f'{_pp_map_id(item["big_map"])}'
+            f'[{micheline.print_expr(item["key"])}]'
+        )
+        if 'value' in item:
+            res += ' to ' + micheline.print_expr(item['value'])
+        return res
+    if action == 'remove':
+        return f'Clear {_pp_map_id(item["big_map"])}'
+    if action == 'copy':
+        return (
+            f'Copy {_pp_map_id(item["source_big_map"])} to '
+            f'{_pp_map_id(item["destination_big_map"])}'
+        )
+    if action == 'alloc':
+        return (
+            f'New {_pp_map_id(item["big_map"])} of type (big_map '
+            f'{micheline.print_expr(item["key_type"])} '
+            f'{micheline.print_expr(item["value_type"])})'
+        )
+    raise UnsupportedOutput(action)
+
+
+def _print_trace_step(step: dict) -> str:
+    items = [
+        _indent(micheline.print_expr(elt['item']), 4)
+        + '  \t'
+        + elt.get('annot', '')
+        for elt in step['stack']
+    ]
+    return (
+        f'- location: {step["location"]} '
+        f'(remaining gas: {_pp_gas(step["gas"])})\n'
+        '  [ ' + '\n    '.join(items) + ' ]'
+    )
+
+
+def render_run_script(answer: dict) -> str:
+    """Output of `run script` for the answer of `run_code`/`trace_code`.
+
+    Raises `UnsupportedOutput` if the answer can't be rendered without
+    the client."""
+    operations = (
+        _indent(_print_internal_operation(operation), 2)
+        for operation in answer['operations']
+    )
+    sections = [
+        'storage\n  ' + _indent(micheline.print_expr(answer['storage']), 2),
+        'emitted operations\n  ' + '\n  '.join(operations),
+        'big_map diff\n  '
+        + '\n  '.join(
+            _indent(_print_big_map_diff_item(item), 2)
+            for item in answer.get('big_map_diff', [])
+        ),
+    ]
+    if 'trace' in answer:
+        sections.append(
+            'trace\n  '
+            + '\n  '.join(
+                _indent(_print_trace_step(step), 2) for step in answer['trace']
+            )
+        )
+    return '\n'.join(sections) + '\n\n'
+
+
+class _Batch:
+    """State shared by the cases of a `run_scripts_batch` call."""
+
+    def __init__(
+        self,
+        client,
+        cases: List[RunScriptCase],
+        convert: Callable[[str, str], Any],
+        report: Callable[[str], None],
+        workers: int,
+    ):
+        self.client = client
+        self.cases = cases
+        self.convert = convert
+        self.report = report
+        # conversions fork client processes, RPCs are mostly waiting
+        self.converter = concurrent.futures.ThreadPoolExecutor(
+            max_workers=os.cpu_count(), thread_name_prefix='convert'
+        )
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='run-script'
+        )
+        self.scripts = {}  # type: Dict[str, concurrent.futures.Future]
+        self.data = {}  # type: Dict[str, concurrent.futures.Future]
+        self.chain_id = None  # type: Optional[str]
+
+    def _parse_data(self, source: str) -> Any:
+        try:
+            return micheline.parse(source)
+        except micheline.MichelineParseError:
+            return self.convert('data', source)
+
+    def _memo(
+        self,
+        table: Dict[str, concurrent.futures.Future],
+        key: str,
+        fun: Callable[[str], Any],
+    ) -> concurrent.futures.Future:
+        if key not in table:
+            table[key] = self.converter.submit(fun, key)
+        return table[key]
+
+    def _run(self, case: RunScriptCase) -> Optional[str]:
+        """Rendered output of `case`, None if the client must run it."""
+        try:
+            script = self.scripts[case.contract].result()
+            storage = self.data[case.storage].result()
+            inp = self.data[case.inp].result()
+        except Exception:  # pylint: disable=broad-except
+            # e.g. parse error, reported by the client
+            return None
+        body = {
+            'script': script,
+            'storage': storage,
+            'input': inp,
+            'amount': str(
+                DEFAULT_AMOUNT if case.amount is None else _mutez(case.amount)
+            ),
+            'balance': str(
+                DEFAULT_BALANCE
+                if case.balance is None
+                else _mutez(case.balance)
+            ),
+            'chain_id': self.chain_id,
+            'unparsing_mode': 'Readable',
+        }
+        if case.gas is not None:
+            body['gas'] = str(case.gas)
+        service = 'trace_code' if case.trace_stack else 'run_code'
+        path = f'/chains/main/blocks/head/helpers/scripts/{service}'
+        try:
+            response = self.client.rpc_session.call('post', path, body)
+        except requests.RequestException:
+            return None
+        if not response.ok:
+            return None
+        try:
+            return render_run_script(response.json())
+        except UnsupportedOutput:
+            return None
+
+    def run(self) -> Iterator[client_output.RunScriptResult]:
+        session = self.client.rpc_session
+        self.chain_id = session.call('get', '/chains/main/chain_id').json()
+        for case in self.cases:
+            if case.file:
+                assert os.path.isfile(
+                    case.contract
+                ), f'{case.contract} is not a file'
+            self._memo(
+                self.scripts,
+                case.contract,
+                lambda source: self.convert('script', source),
+            )
+            self._memo(self.data, case.storage, self._parse_data)
+            self._memo(self.data, case.inp, self._parse_data)
+        results = [self.executor.submit(self._run, case) for case in self.cases]
+        try:
+            for case, result in zip(self.cases, results):
+                output = result.result()
+                if output is None:
+                    yield case.run(self.client)
+                else:
+                    self.report(output)
+                    yield client_output.RunScriptResult(output)
+        finally:
+            for result in results:
+                result.cancel()
+            self.executor.shutdown(wait=True)
+            self.converter.shutdown(wait=True)
+
+
+def run_scripts_batch(
+    client,
+    cases: Iterable[RunScriptCase],
+    convert: Callable[[str, str], Any],
+    report: Callable[[str], None],
+    workers: int = WORKERS,
+) -> Iterator[client_output.RunScriptResult]:
+    """See `Client.run_scripts_batch`.
+
+    `convert(kind, source)` converts a Michelson `script` or `data` to
+    JSON, `report(output)` is called with the output of each case which
+    isn't run by the client."""
+    return _Batch(client, list(cases), convert, report, workers).run()
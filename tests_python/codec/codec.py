@@ -1,11 +1,26 @@
 import os
+import queue
 import subprocess
 import json
 import sys
+import threading
 
-from typing import List
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
 from process.process_utils import format_command
 
+# A request of `Codec.batch`: `('encode', encoding, data_json)` or
+# `('decode', encoding, data)`
+Request = Tuple[str, str, Any]
+
+
+class CodecError(Exception):
+    """Raised when `tezos-codec batch` fails to answer a request."""
+
+    def __init__(self, request: Request, message: str):
+        super().__init__(f'{request[0]} {request[1]}: {message}')
+        self.request = request
+        self.message = message
+
 
 class Codec:
     """Codec for datatypes used in Tezos.
@@ -15,6 +30,10 @@ class Codec:
 
     This class offers two commands `encode` and `decode`. The encoding
     name can be obtained using `tezos-codec list encodings`.
+
+    Each call of `encode` and `decode` runs a `tezos-codec` process. To
+    convert many values, `batch`, `encode_many` and `decode_many` stream
+    them through a single `tezos-codec batch` process, kept until `close`.
     """
 
     def __init__(self, codec_path: str):
@@ -25,6 +44,8 @@ class Codec:
         assert os.path.isfile(codec_path), f'{codec_path} is not a file'
 
         self._codec = codec_path
+        self._batch = None  # type: Optional[subprocess.Popen]
+        self._batch_lock = threading.Lock()
 
     def run(self, params: List[str], check: bool = True) -> str:
         """
@@ -70,3 +91,96 @@ class Codec:
         """
         cmd = ['decode', encoding, 'from', data]
         return json.loads(self.run(cmd))
+
+    def _batch_process(self) -> subprocess.Popen:
+        if self._batch is None or self._batch.poll() is not None:
+            cmd = [self._codec, 'batch']
+            print(format_command(cmd))
+            self._batch = subprocess.Popen(
+                cmd,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                text=True,
+                bufsize=1,
+            )
+        return self._batch
+
+    def batch(self, requests: Iterable[Request]) -> Iterator[Any]:
+        """Encode and decode many values with one `tezos-codec` process.
+
+        Requests are written to the process by a thread while answers are
+        read, so that neither side waits for the other.
+
+        Args:
+            requests (iterable): `('encode', encoding, data_json)` or
+                                 `('decode', encoding, data)` triples
+        Returns:
+            A generator of the results of `requests`, in order: data in
+            hex for encodings, dicts for decodings. `CodecError` is raised
+            when the answer to a failed request is reached.
+        """
+        with self._batch_lock:
+            process = self._batch_process()
+            # requests written, in order, then None
+            written = queue.Queue()  # type: queue.Queue
+
+            def write():
+                try:
+                    for request in requests:
+                        verb, encoding, data = request
+                        assert verb in {'encode', 'decode'}, verb
+                        key = 'json' if verb == 'encode' else 'hex'
+                        line = json.dumps({verb: encoding, key: data})
+                        process.stdin.write(line + '\n')
+                        written.put(request)
+                    process.stdin.flush()
+                except BaseException as exc:  # pylint: disable=broad-except
+                    written.put(exc)
+                written.put(None)
+
+            writer = threading.Thread(target=write, daemon=True)
+            writer.start()
+            done = False
+            try:
+                while True:
+                    request = written.get()
+                    if request is None:
+                        break
+                    if isinstance(request, BaseException):
+                        raise request
+                    line = process.stdout.readline()
+                    if not line:
+                        raise CodecError(request, 'tezos-codec exited')
+                    answer = json.loads(line)
+                    if 'error' in answer:
+                        raise CodecError(request, answer['error'])
+                    yield answer['ok']
+                done = True
+            finally:
+                if not done:
+                    # answers left unread would be taken for the answers
+                    # of the next batch
+                    process.kill()
+                writer.join()
+                if not done:
+                    self.close()
+
+    def encode_many(self, encoding: str, values: Iterable[Any]) -> List[str]:
+        """`encode` of each of `values`, see `batch`."""
+        return list(self.batch(('encode', encoding, data) for data in values))
+
+    def decode_many(self, encoding: str, values: Iterable[str]) -> List[Any]:
+        """`decode` of each of `values`, see `batch`."""
+        return list(self.batch(('decode', encoding, data) for data in values))
+
+    def close(self) -> None:
+        """Stop the `tezos-codec batch` process, if any."""
+        if self._batch is not None:
+            try:
+                # the process exits at the end of its input
+                self._batch.stdin.close()
+            except BrokenPipeError:
+                pass
+            self._batch.wait()
+            self._batch.stdout.close()
+            self._batch = None
@@ -5,7 +5,6 @@ E.g. start and stop a server. The fixture is simply specified as a parameter
 in the test function, and the yielded values is then accessible with this
 parameter.
 """
-import subprocess
 import shutil
 import os
 import tempfile
@@ -16,8 +15,11 @@ from pytest_regtest import (
     deregister_converter_pre,
     _std_conversion,
 )
+from launchers.chain_templates import ChainTemplates
 from launchers.sandbox import Sandbox
-from tools import constants, paths, utils
+from tools import constants, durations, paths, utils
+from tools.bench import BenchResults
+from tools.legacy_stores import generate as generate_legacy_stores
 from tools.client_regression import ClientRegression
 from tools.utils import bake
 from client.client import Client
@@ -43,6 +45,15 @@ def singleprocess(request) -> Iterator[bool]:
     yield request.config.getoption("--singleprocess")
 
 
+@pytest.fixture(scope="session")
+def bench_results(request) -> Iterator[BenchResults]:
+    """Results of the benchmarks, written to the file given by
+    `--bench-results` at the end of the session."""
+    results = BenchResults(request.config.getoption("--bench-results"))
+    yield results
+    results.write()
+
+
 @pytest.fixture(scope="class")
 def session() -> Iterator[dict]:
     """Dictionary to store data between tests."""
@@ -72,8 +83,20 @@ You can investigate daemon logs by running this test using the
 `--log-dir=LOG_DIR` option.'''
 
 
+@pytest.fixture(scope="session")
+def chain_templates() -> Iterator[ChainTemplates]:
+    """Chain states saved by sandboxes, shared by all tests."""
+    templates = ChainTemplates()
+    yield templates
+    templates.cleanup()
+
+
 @pytest.fixture(scope="class")
-def sandbox(log_dir: Optional[str], singleprocess: bool) -> Iterator[Sandbox]:
+def sandbox(
+    log_dir: Optional[str],
+    singleprocess: bool,
+    chain_templates: ChainTemplates,
+) -> Iterator[Sandbox]:
     """Sandboxed network of nodes.
 
     Nodes, bakers and endorsers are added/removed dynamically."""
@@ -84,6 +107,7 @@ def sandbox(log_dir: Optional[str], singleprocess: bool) -> Iterator[Sandbox]:
         constants.IDENTITIES,
         log_dir=log_dir,
         singleprocess=singleprocess,
+        templates=chain_templates,
     ) as sandbox:
         yield sandbox
         assert sandbox.are_daemons_alive(), DEAD_DAEMONS_WARN
@@ -196,6 +220,25 @@ def pytest_addoption(parser) -> None:
         help="the node validates blocks using only one process,\
             useful for debugging",
     )
+    parser.addoption(
+        "--bench-results",
+        action="store",
+        help="append the results of benchmarks to this JSON file",
+    )
+    parser.addoption(
+        "--durations-file",
+        action="store",
+        help="record the durations of the test classes in this JSON file, "
+        "see tools/durations.py",
+    )
+
+
+def pytest_configure(config) -> None:
+    path = config.getoption("--durations-file")
+    if path is not None:
+        config.pluginmanager.register(
+            durations.DurationRecorder(path), "durations_recorder"
+        )
 
 
 @pytest.fixture(scope="class")
@@ -212,45 +255,13 @@ def legacy_stores(request):
     export_snapshots = request.param['snapshot']
     session = {}
     data_dir = tempfile.mkdtemp(prefix='tezos-legacy-stores.')
-    build_dir = '_build/'
-    builder_target = 'legacy_store_builder'
-    builder_path = f'src/lib_store/legacy_store/{builder_target}.exe'
-    builder_bin = f'{build_dir}default/{builder_path}'
-    maker_target = 'legacy_store_maker'
-    maker_path = f'src/lib_store/test/{maker_target}.exe'
-    maker_bin = f'{build_dir}default/{maker_path}'
-    subprocess.run(
-        [
-            'dune',
-            'build',
-            '--build-dir',
-            f'{home}{build_dir}',
-            f'{builder_path}',
-        ],
-        check=True,
-        cwd=home,
-    )
-    subprocess.run(
-        ['dune', 'build', '--build-dir', f'{home}{build_dir}', f'{maker_path}'],
-        check=True,
-        cwd=home,
-    )
-    # Call the magic binary which generates legacy stores such as:
+    # Generates legacy stores such as:
     # data_dir/archive_store_to_upgrade
     #         /full_store_to_upgrade
     #         /rolling_store_to_upgrade
-    # where every store contains the "same chain"
-    subprocess.run(
-        [
-            maker_bin,
-            data_dir,
-            builder_bin,
-            str(batch),
-            str(export_snapshots).lower(),
-        ],
-        check=True,
-        cwd=home,
-    )
+    # where every store contains the "same chain", or copies them from
+    # a previous session
+    generate_legacy_stores(home, data_dir, batch, export_snapshots)
 
     # Store data paths in session
     for history_mode in ['archive', 'full', 'rolling']:
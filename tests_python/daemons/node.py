@@ -4,27 +4,57 @@ import shutil
 import subprocess
 import sys
 import tempfile
+import time
 from typing import Dict, List, Optional, Tuple
 
 from process import process_utils
+from daemons.node_cache import DATA_DIR, NodeCache
 
 # Timeout before killing a node which doesn't react to SIGTERM
 TERM_TIMEOUT = 10
 
 
-def _run_and_print(cmd):
+class CommandStats:
+    """Wall-clock time and peak resident memory of a node command."""
+
+    def __init__(self, duration: float, max_rss: int):
+        # in seconds
+        self.duration = duration
+        # in KiB
+        self.max_rss = max_rss
+
+    def __repr__(self) -> str:
+        return f'CommandStats({self.duration:.2f}s, {self.max_rss} KiB)'
+
+
+def _run_and_print(cmd) -> CommandStats:
     cmd_str = process_utils.format_command(cmd)
     print(cmd_str)
-    completed_process = subprocess.run(
-        cmd, capture_output=True, text=True, check=False
-    )
-    stdout = completed_process.stdout
-    stderr = completed_process.stderr
+    # outputs go to files rather than pipes, so that the process can be
+    # waited for with `wait4`, which gives its own resource usage
+    with tempfile.TemporaryFile('w+') as stdout_file:
+        with tempfile.TemporaryFile('w+') as stderr_file:
+            start = time.monotonic()
+            process = subprocess.Popen(
+                cmd, stdout=stdout_file, stderr=stderr_file
+            )
+            _, status, rusage = os.wait4(process.pid, 0)
+            duration = time.monotonic() - start
+            process.returncode = os.waitstatus_to_exitcode(status)
+            stdout_file.seek(0)
+            stdout = stdout_file.read()
+            stderr_file.seek(0)
+            stderr = stderr_file.read()
     if stdout:
         print(stdout)
     if stderr:
         print(stderr, file=sys.stderr)
-    completed_process.check_returncode()
+    if process.returncode:
+        raise subprocess.CalledProcessError(
+            process.returncode, cmd, stdout, stderr
+        )
+    # `ru_maxrss` is in KiB on Linux
+    return CommandStats(duration, rusage.ru_maxrss)
 
 
 class Node:
@@ -75,6 +105,7 @@ class Node:
         log_levels: Dict[str, str] = None,
         singleprocess: bool = False,
         env: Dict[str, str] = None,
+        cache: NodeCache = None,
     ):
 
         """Creates a new Popen instance for a tezos-node, and manages context.
@@ -82,6 +113,8 @@ class Node:
         args:
             use_tls (tuple): None if no tls, else couple of strings
                             (certificate, key)
+            cache (NodeCache): if not None, identity and config files are
+                               copied from this cache when possible
 
         Creates a temporary node directory unless provided  by caller.
         Generate node identity.
@@ -126,6 +159,7 @@ class Node:
                 node_run.append(f'127.0.0.1:{peer}')
 
         self.use_tls = use_tls
+        self.cache = cache
 
         new_env = None
         if env is not None:
@@ -179,7 +213,7 @@ class Node:
                 (f'{self.node_dir}/tezos.crt,' f'{self.node_dir}/tezos.key'),
             ]
 
-        _run_and_print(node_config)
+        self._run_cached('config', node_config)
 
         if self.config is not None:
             config_file = os.path.join(self.node_dir, 'config.json')
@@ -192,6 +226,20 @@ class Node:
                 file.write(json.dumps(config))
                 file.truncate()
 
+    def _run_cached(
+        self, kind: str, cmd: List[str], extra_key: List[str] = None
+    ) -> None:
+        """Run `cmd`, which generates file `kind`.json in the node dir,
+        unless that file is in the cache."""
+        if self.cache is None:
+            _run_and_print(cmd)
+            return
+        key = [arg.replace(self.node_dir, DATA_DIR) for arg in cmd[1:]]
+        key += extra_key or []
+        if not self.cache.fetch(self.node, kind, key, self.node_dir):
+            _run_and_print(cmd)
+            self.cache.store(self.node, kind, key, self.node_dir)
+
     def init_id(self):
         node_identity = [
             self.node,
@@ -201,7 +249,9 @@ class Node:
             '--data-dir',
             self.node_dir,
         ]
-        _run_and_print(node_identity)
+        # the identity doesn't depend on ports, but nodes of a sandbox must
+        # have distinct identities
+        self._run_cached('identity', node_identity, [str(self.p2p_port)])
         if self.use_tls:
             with open(f'{self.node_dir}/tezos.crt', 'w+') as file:
                 file.write(self.use_tls[0])
@@ -218,32 +268,37 @@ class Node:
         ]
         _run_and_print(node_upgrade)
 
-    def snapshot_export(self, file, params=None):
+    def snapshot_export(self, file, params=None) -> CommandStats:
         if params is None:
             params = []
         params = ['--data-dir', self.node_dir] + params
         snapshot_cmd = [self.node, 'snapshot', 'export'] + list(params) + [file]
-        _run_and_print(snapshot_cmd)
+        return _run_and_print(snapshot_cmd)
 
-    def snapshot_import(self, file, params=None):
+    def snapshot_import(self, file, params=None) -> CommandStats:
         if params is None:
             params = []
         params = ['--data-dir', self.node_dir] + params
         snapshot_cmd = [self.node, 'snapshot', 'import'] + list(params) + [file]
-        _run_and_print(snapshot_cmd)
+        return _run_and_print(snapshot_cmd)
 
-    def reconstruct(self, params=None):
+    def reconstruct(self, params=None) -> CommandStats:
         if params is None:
             params = []
         params = ['--data-dir', self.node_dir] + params
         reconstruct_cmd = [self.node, 'reconstruct'] + list(params)
-        _run_and_print(reconstruct_cmd)
+        return _run_and_print(reconstruct_cmd)
 
     def cleanup(self):
         """Remove node directory (only if generated by constructor)"""
         if self._temp_dir:
             shutil.rmtree(self.node_dir)
 
+    @property
+    def process(self) -> Optional[subprocess.Popen]:
+        """Process of the node, None if it hasn't been run yet"""
+        return self._process
+
     def terminate(self) -> None:
         """Send SIGTERM to node, do nothing if node hasn't been run yet"""
         if self._process is not None:
@@ -0,0 +1,136 @@
+"""On-disk cache of the identity and configuration files of sandbox nodes.
+
+Sandbox nodes are disposable, but each of them used to generate its
+identity (`tezos-node identity generate`, proof of work included) and its
+configuration (`tezos-node config init`) from scratch. `NodeCache` keeps
+the generated `identity.json` and `config.json` files, and copies them
+into the data dir of later nodes set up the same way.
+
+Entries are keyed by the content hash of the node binary, and by the
+arguments of the command generating them (expected proof of work, ports,
+parameters). Paths to the data dir are templated in the cached files, so
+that they can be reused for any data dir. Whenever a node binary changes
+(e.g. it is rebuilt), the entries of its previous version are evicted.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from typing import Dict, List, Tuple
+
+# Root dir of the cache, can be overridden by the environment
+CACHE_DIR = os.environ.get(
+    'TEZOS_NODE_CACHE',
+    os.path.join(tempfile.gettempdir(), f'tezos-node-cache-{os.getuid()}'),
+)
+
+# Stands for the data dir of the node in cached files
+DATA_DIR = '@DATA_DIR@'
+
+_LOCK = threading.Lock()
+# binary hashes, by (path, size, mtime)
+_BINARY_HASHES = {}  # type: Dict[Tuple[str, int, int], str]
+
+
+def binary_hash(binary: str) -> str:
+    """sha256 of file `binary`, computed once per version of the file."""
+    path = os.path.realpath(binary)
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    with _LOCK:
+        if key not in _BINARY_HASHES:
+            digest = hashlib.sha256()
+            with open(path, 'rb') as file:
+                for chunk in iter(lambda: file.read(1 << 20), b''):
+                    digest.update(chunk)
+            _BINARY_HASHES[key] = digest.hexdigest()
+        return _BINARY_HASHES[key]
+
+
+def digest(value: str) -> str:
+    """Short sha256 (hex) of `value`, used as a name in cache dirs."""
+    return hashlib.sha256(value.encode()).hexdigest()[:32]
+
+
+class NodeCache:
+    """Cache of `identity.json` and `config.json` files.
+
+    Typical use, in a data dir `node_dir`:
+
+    key = [arg.replace(node_dir, DATA_DIR) for arg in cmd[1:]]
+    if not cache.fetch(node_bin, 'config', key, node_dir):
+        run(cmd) # creates node_dir/config.json
+        cache.store(node_bin, 'config', key, node_dir)
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR):
+        """
+        Args:
+            cache_dir (str): root dir of the cache, created if needed
+        """
+        self.cache_dir = cache_dir
+
+    def _binary_dir(self, binary: str) -> str:
+        binary_dir = os.path.join(
+            self.cache_dir, digest(os.path.realpath(binary))
+        )
+        current = binary_hash(binary)
+        res = os.path.join(binary_dir, current)
+        if not os.path.isdir(res):
+            # evict entries of previous versions of the binary
+            if os.path.isdir(binary_dir):
+                for version in os.listdir(binary_dir):
+                    if version != current:
+                        shutil.rmtree(
+                            os.path.join(binary_dir, version),
+                            ignore_errors=True,
+                        )
+            os.makedirs(res, exist_ok=True)
+        return res
+
+    def _entry(self, binary: str, kind: str, key: List[str]) -> str:
+        name = digest(json.dumps(key))
+        return os.path.join(self._binary_dir(binary), f'{kind}-{name}.json')
+
+    def fetch(
+        self, binary: str, kind: str, key: List[str], node_dir: str
+    ) -> bool:
+        """Copy cached file `kind`.json in `node_dir`.
+
+        Args:
+            binary (str): path to the node binary
+            kind (str): `identity` or `config`
+            key (list): arguments of the command generating the file, with
+                        `node_dir` replaced by `DATA_DIR`
+            node_dir (str): the data dir of the node
+        Returns:
+            True if the file was cached.
+        """
+        entry = self._entry(binary, kind, key)
+        try:
+            with open(entry) as file:
+                content = file.read()
+        except FileNotFoundError:
+            return False
+        with open(os.path.join(node_dir, f'{kind}.json'), 'w') as file:
+            file.write(content.replace(DATA_DIR, node_dir))
+        print(f'# {kind}.json of {node_dir} copied from {entry}')
+        return True
+
+    def store(
+        self, binary: str, kind: str, key: List[str], node_dir: str
+    ) -> None:
+        """Cache file `kind`.json generated in `node_dir`, see `fetch`."""
+        with open(os.path.join(node_dir, f'{kind}.json')) as file:
+            content = file.read().replace(node_dir, DATA_DIR)
+        if os.path.basename(node_dir) in content:
+            # the data dir is written in an unexpected form, don't cache
+            return
+        entry = self._entry(binary, kind, key)
+        # concurrent sandboxes may share the cache, write atomically
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(entry))
+        with os.fdopen(fd, 'w') as file:
+            file.write(content)
+        os.replace(tmp_path, entry)
@@ -0,0 +1,109 @@
+"""Readiness of baker, endorser and accuser daemons.
+
+A daemon prints `Baker started.` (resp. `Endorser started.`,
+`Accuser started.`) once the node it runs with is bootstrapped and
+streams it the new heads (resp. valid blocks): from then on, the daemon
+reacts to the chain. A `Probe` watches the log file of a daemon for this
+message, and `wait_ready` waits for many daemons starting concurrently.
+
+    probes = [Probe('baker 0', baker, log_file, READY_MESSAGES['baker'])]
+    latencies = wait_ready(probes)
+"""
+import subprocess
+import time
+from typing import Dict, List
+
+# Message printed by each kind of daemon once started
+READY_MESSAGES = {
+    'baker': 'Baker started.',
+    'endorser': 'Endorser started.',
+    'accuser': 'Accuser started.',
+}
+
+# Default delay for daemons to be ready. A daemon whose node isn't
+# bootstrapped waits for it indefinitely, without printing its message:
+# the delay only bounds the startup of daemons of bootstrapped nodes
+STARTUP_TIMEOUT = 30
+
+# Upper bound of the delay between two polls of the daemons
+POLL_INTERVAL = 0.05
+
+# Number of log lines shown when a daemon fails
+TAIL_LINES = 10
+
+
+class Probe:
+    """Watch the log file of a daemon for the message `ready_message`."""
+
+    def __init__(
+        self,
+        name: str,
+        process: subprocess.Popen,
+        log_file: str,
+        ready_message: str,
+    ):
+        self.name = name
+        self.process = process
+        self.log_file = log_file
+        self.ready_message = ready_message
+        self.start = time.monotonic()
+        # log read so far, the daemon can be in the middle of a line
+        self._log = ''
+        self._offset = 0
+
+    def _read(self) -> None:
+        try:
+            with open(self.log_file, 'rb') as file:
+                file.seek(self._offset)
+                data = file.read()
+        except FileNotFoundError:
+            return
+        self._offset += len(data)
+        self._log += data.decode('utf-8', errors='replace')
+
+    def is_ready(self) -> bool:
+        """Whether the daemon has printed its ready message. Fails if the
+        daemon has exited before."""
+        # poll first, the message may have been written before exiting
+        returncode = self.process.poll()
+        self._read()
+        if self.ready_message in self._log:
+            return True
+        assert returncode is None, (
+            f'{self.name} failed at startup ({returncode}):\n' + self.tail()
+        )
+        return False
+
+    def tail(self) -> str:
+        return '\n'.join(self._log.splitlines()[-TAIL_LINES:])
+
+
+def wait_ready(
+    probes: List[Probe], timeout: float = STARTUP_TIMEOUT
+) -> Dict[str, float]:
+    """Wait until all daemons of `probes` are ready. Fails as soon as one
+    of them exits, or after `timeout` seconds.
+
+    Returns:
+        The delay between the start of each daemon and its readiness, in
+        seconds.
+    """
+    deadline = time.monotonic() + timeout
+    latencies = {}  # type: Dict[str, float]
+    waiting = list(probes)
+    interval = 0.001
+    while waiting:
+        for probe in list(waiting):
+            if probe.is_ready():
+                latencies[probe.name] = time.monotonic() - probe.start
+                waiting.remove(probe)
+        if not waiting:
+            break
+        if time.monotonic() >= deadline:
+            names = ', '.join(probe.name for probe in waiting)
+            assert False, (
+                f'{names} not ready after {timeout}s:\n' + waiting[0].tail()
+            )
+        time.sleep(interval)
+        interval = min(2 * interval, POLL_INTERVAL)
+    return latencies
@@ -0,0 +1,101 @@
+"""Named copies of node data dirs, to start nodes from a prepared chain.
+
+Many tests start a node, activate a protocol and bake a few blocks before
+doing anything else. A `ChainTemplates` keeps the data dir of such a node,
+once set up, so that later nodes start from the same chain without
+replaying the setup. See `Sandbox.save_template` and the `template`
+argument of `Sandbox.add_node`.
+
+Data dirs are copied with `cp --reflink=auto`, i.e. with copy-on-write
+clones where the file system supports them (btrfs, xfs...), and plain
+copies elsewhere. Hard links aren't an option: the node modifies its
+store and context files in place.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+
+# Files specific to a node, which aren't part of the chain state
+NODE_FILES = frozenset(
+    [
+        'identity.json',
+        'config.json',
+        'peers.json',
+        'lock',
+        'tezos.crt',
+        'tezos.key',
+    ]
+)
+
+
+def copy_data_dir(src: str, dst: str) -> None:
+    """Copy the chain state of data dir `src` into existing dir `dst`."""
+    entries = [
+        os.path.join(src, entry)
+        for entry in os.listdir(src)
+        if entry not in NODE_FILES
+    ]
+    if not entries:
+        return
+    cmd = ['cp', '-a', '--reflink=auto'] + entries + [dst]
+    if shutil.which('cp') is not None:
+        completed = subprocess.run(cmd, capture_output=True, check=False)
+        if completed.returncode == 0:
+            return
+    # e.g. a cp without --reflink
+    for entry in entries:
+        target = os.path.join(dst, os.path.basename(entry))
+        if os.path.isdir(entry):
+            shutil.copytree(entry, target, symlinks=True, dirs_exist_ok=True)
+        else:
+            shutil.copy2(entry, target)
+
+
+class ChainTemplates:
+    """A directory of named chain states.
+
+    Typical use, `node` being stopped.
+
+    templates = ChainTemplates()
+    templates.save('activated', node.node_dir)
+    templates.clone('activated', other_node.node_dir)
+    templates.cleanup()
+    """
+
+    def __init__(self, root: str = None):
+        """
+        Args:
+            root (str): dir of the templates. If None, a temp dir is
+                        created, and removed by `cleanup`.
+        """
+        self._is_tmp_dir = root is None
+        if root is None:
+            root = tempfile.mkdtemp(prefix='tezos-templates.')
+        self.root = root
+
+    def path(self, name: str) -> str:
+        assert name and os.sep not in name, f'invalid template name {name}'
+        return os.path.join(self.root, name)
+
+    def __contains__(self, name: str) -> bool:
+        return os.path.isdir(self.path(name))
+
+    def save(self, name: str, node_dir: str) -> None:
+        """Save the chain state of (stopped) node data dir `node_dir` as
+        template `name`, replacing any previous template `name`."""
+        tmp_dir = tempfile.mkdtemp(prefix=f'.{name}.', dir=self.root)
+        copy_data_dir(node_dir, tmp_dir)
+        if name in self:
+            shutil.rmtree(self.path(name))
+        os.rename(tmp_dir, self.path(name))
+
+    def clone(self, name: str, node_dir: str) -> None:
+        """Copy template `name` into data dir `node_dir`."""
+        assert name in self, f'no template {name}'
+        copy_data_dir(self.path(name), node_dir)
+
+    def cleanup(self) -> None:
+        """Remove the templates dir, only if not provided by user."""
+        if self._is_tmp_dir:
+            shutil.rmtree(self.root, ignore_errors=True)
@@ -1,12 +1,21 @@
+import concurrent.futures
 import os
+import shutil
+import subprocess
+import tempfile
 import time
-from typing import Callable, Dict, List, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 
 from client.client import Client
 from daemons.baker import Baker
 from daemons.endorser import Endorser
 from daemons.accuser import Accuser
 from daemons.node import Node
+from daemons.node_cache import NodeCache
+from daemons import readiness
+from launchers.chain_templates import ChainTemplates
+from process import shutdown
+from tools import ports, resources, wallet
 
 NODE = 'tezos-node'
 CLIENT = 'tezos-client'
@@ -23,7 +32,9 @@ class Sandbox:
     Wrapper objects (Client, Node, Baker...) allow interacting with the
     corresponding processes. In the sandbox, they are identified by an
     integer 0 <= node_id < num_peers, which corresponds to ports
-    ``rpc + node_id``, ``p2p + node_id``.
+    ``rpc + node_id``, ``p2p + node_id``. Unless given, the base ports
+    ``rpc`` and ``p2p`` are reserved with `tools.ports`, so that sandboxes
+    of concurrent test sessions don't collide.
 
     Clients, nodes and daemons can be dynamically added or removed. Daemons are
     protocol specific. There can be more than one daemon for a given node,
@@ -54,21 +65,31 @@ class Sandbox:
         self,
         binaries_path: str,
         identities: Dict[str, Dict[str, str]],
-        rpc: int = 18730,
-        p2p: int = 19730,
+        rpc: int = None,
+        p2p: int = None,
         num_peers: int = 45,
         log_dir: str = None,
         singleprocess: bool = False,
+        node_cache: bool = True,
+        templates: ChainTemplates = None,
     ):
         """
         Args:
             binaries_path (str): path to the binaries (client, node, baker,
                 endorser). Typically, this parameter is TEZOS_HOME.
             identities (dict): identities known to all clients.
-            rpc (int): base RPC port
-            p2p (int): base P2P port
+            rpc (int): base RPC port, reserved with `ports.reserve` if
+                neither `rpc` nor `p2p` is given
+            p2p (int): base P2P port, idem
             num_peers (int): max number of peers
             log_dir (str): optional log directory for node/daemons logs
+            singleprocess (bool): run nodes in single process mode
+            node_cache (bool): reuse the identity and config files of
+                previous nodes with the same binary and ports, see
+                `daemons.node_cache`, default=True
+            templates (ChainTemplates): chain states saved by
+                `save_template`, possibly shared with other sandboxes. If
+                None, templates are private to this sandbox.
 
         Binaries contained in `binaries_path` are supposed to follow the
         naming conventions used in the Tezos codebase. For instance,
@@ -85,6 +106,19 @@ class Sandbox:
         self.binaries_path = binaries_path
         self.log_dir = log_dir
         self.identities = dict(identities)
+        # unencrypted ed25519 identities, written to the client wallets
+        # without running the client, see `init_client`
+        self._keys = {
+            name: wallet.Key.from_secret(identity['secret'])
+            for name, identity in self.identities.items()
+            if identity['secret'].startswith('unencrypted:edsk')
+        }  # type: Dict[str, wallet.Key]
+        self._ports = None  # type: Optional[ports.PortRange]
+        if rpc is None and p2p is None:
+            self._ports = ports.reserve(num_peers)
+            rpc = self._ports.rpc
+            p2p = self._ports.p2p
+        assert rpc is not None and p2p is not None
         self.rpc = rpc
         self.p2p = p2p
         self.num_peers = num_peers
@@ -94,9 +128,22 @@ class Sandbox:
         self.bakers = {}  # type: Dict[str, Dict[int, Baker]]
         self.endorsers = {}  # type: Dict[str, Dict[int, Endorser]]
         self.accusers = {}  # type: Dict[str, Dict[int, Accuser]]
+        # daemons started with `wait=False`, by binary, see `wait_daemons`
+        self._starting = []  # type: List[Tuple[str, readiness.Probe]]
+        # startup latencies of the daemons, in seconds, by binary
+        self.startup_latencies = {}  # type: Dict[str, List[float]]
+        # logs of the daemons, if there is no `log_dir`
+        self._daemon_log_dir = None  # type: Optional[str]
+        # resources used by the nodes and daemons, see `start_sampler`
+        self.sampler = None  # type: Optional[resources.Sampler]
+        # shutdown of the daemons, by `cleanup`
+        self.stops = {}  # type: Dict[str, shutdown.Stop]
         self.counter = 0
         self.logs = []  # type: List[str]
         self.singleprocess = singleprocess
+        self.node_cache = NodeCache() if node_cache else None
+        self._own_templates = templates is None
+        self.templates = ChainTemplates() if templates is None else templates
 
     def __enter__(self):
         return self
@@ -157,6 +204,7 @@ class Sandbox:
             log_levels=log_levels,
             use_tls=use_tls,
             singleprocess=self.singleprocess,
+            cache=self.node_cache,
         )
 
         self.nodes[node_id] = node
@@ -269,30 +317,49 @@ class Sandbox:
         self.clients[node_id] = client
         return client
 
-    def init_node(self, node, snapshot, reconstruct):
-        """Generate node id and import snapshot """
+    def init_node(self, node, snapshot, reconstruct, template=None):
+        """Generate node id and import snapshot or copy chain template"""
+        assert (
+            template is None or snapshot is None
+        ), 'template and snapshot are mutually exclusive'
+        if template is not None:
+            self.templates.clone(template, node.node_dir)
         node.init_id()
         node.init_config()
         if snapshot is not None:
             params = ['--reconstruct'] if reconstruct else []
             node.snapshot_import(snapshot, params)
 
+    def wait_node_listening(
+        self,
+        client: Client,
+        node: Node,
+        timeout: float = 1,
+        attempts: int = 20,
+    ) -> None:
+        """Check that `node` is running and responds to RPCs of `client`,
+        see `Client.check_node_listening` for `timeout` and `attempts`."""
+        if not client.check_node_listening(timeout, attempts):
+            node_id = node.rpc_port - self.rpc
+            assert node.poll() is None, f"# Node {node_id} isn't running"
+            node.kill()
+            assert False, f"# Node {node_id} isn't responding to RPC"
+
     def init_client(
         self, client, node: Node = None, config_client: bool = True
     ):
         """Initialize client with bootstrap keys. If node object is provided,
         check whether the node is running and responsive"""
 
-        if node is not None and not client.check_node_listening():
-            node_id = node.rpc_port - self.rpc
-            assert node.poll() is None, "# Node {node_id} isn't running"
-            node.kill()
-            assert False, f"# Node {node_id} isn't responding to RPC"
+        if node is not None:
+            self.wait_node_listening(client, node)
 
         client.run(['-w', 'none', 'config', 'update'])
         if config_client:
+            wallet.write_wallet(client.base_dir, self._keys)
             for name, iden in self.identities.items():
-                client.import_secret_key(name, iden['secret'])
+                if name not in self._keys:
+                    client.import_secret_key(name, iden['secret'])
 
     def add_node(
         self,
@@ -310,6 +377,7 @@ class Sandbox:
         node_config: dict = None,
         mode: str = None,
         client_factory: Callable = Client,
+        template: str = None,
     ) -> None:
         """Launches new node with given node_id and initializes client
 
@@ -333,6 +401,9 @@ class Sandbox:
                         "proxy", default=None (equivalent to "client").
             client_factory (Callable): the constructor of clients. Defaults to
                                        Client. Allows e.g. regression testing.
+            template (str): start from the chain state saved under this
+                            name by `save_template`, default=None. Can't
+                            be used with `snapshot`.
 
         This registers a node and a client for the given id. It initializes
         both the client and the node, and run the node.
@@ -346,6 +417,9 @@ class Sandbox:
         Whenever a node has been added with `add_node()`, we can access a
         corresponding client object `client()` to interact with this node.
         """
+        assert (
+            template is None or snapshot is None
+        ), 'template and snapshot are mutually exclusive'
         node = self.register_node(
             node_id,
             node_dir,
@@ -358,7 +432,7 @@ class Sandbox:
             node_config,
         )
 
-        self.init_node(node, snapshot, reconstruct)
+        self.init_node(node, snapshot, reconstruct, template)
 
         node.run()
 
@@ -374,6 +448,121 @@ class Sandbox:
 
         self.init_client(client, node, config_client)
 
+    def add_nodes(
+        self,
+        node_ids: List[int],
+        peers: List[int] = None,
+        params: List[str] = None,
+        log_levels: Dict[str, str] = None,
+        private: bool = True,
+        config_client: bool = True,
+        use_tls: Tuple[str, str] = None,
+        snapshot: str = None,
+        reconstruct: bool = False,
+        branch: str = "",
+        node_config: dict = None,
+        mode: str = None,
+        client_factory: Callable = Client,
+        template: str = None,
+        workers: Optional[int] = None,
+    ) -> Dict[int, Dict[str, float]]:
+        """Launches new nodes with the given ids and initializes their
+        clients, concurrently.
+
+        Same as calling `add_node` for each id of `node_ids` (see
+        `add_node` for the other args), except that identity generation,
+        configuration, snapshot import, node startup and client
+        initialization of all nodes run in parallel. It returns once the
+        RPC server of every node is up.
+
+        Args:
+            node_ids (list): ids of the nodes
+            workers (int): max number of nodes started at the same time,
+                           defaults to all of them
+        Returns:
+            The startup timings (sec) of each node, e.g.
+            {0: {'init': 1.2, 'rpc': 0.4, 'client': 0.6, 'total': 2.2}}.
+            `init` covers identity, config, snapshot import or template
+            copy, `rpc` the
+            time the node takes to answer RPCs once started, `client` the
+            client initialization. If a node fails to start, the first
+            error is raised once all nodes have been processed.
+        """
+        assert len(set(node_ids)) == len(node_ids), 'duplicated node ids'
+        assert (
+            template is None or snapshot is None
+        ), 'template and snapshot are mutually exclusive'
+        # Registration allocates log files, keep it sequential
+        started = []
+        for node_id in node_ids:
+            node = self.register_node(
+                node_id,
+                None,
+                peers,
+                params,
+                log_levels,
+                private,
+                use_tls,
+                branch,
+                node_config,
+            )
+            client = self.register_client(
+                node_id=node_id,
+                rpc_port=node.rpc_port,
+                use_tls=use_tls,
+                branch=branch,
+                mode=mode,
+                client_factory=client_factory,
+            )
+            started.append((node_id, node, client))
+
+        def start(node: Node, client: Client) -> Dict[str, float]:
+            timings = {}  # type: Dict[str, float]
+            start_time = time.monotonic()
+            self.init_node(node, snapshot, reconstruct, template)
+            timings['init'] = time.monotonic() - start_time
+            node.run()
+            step_time = time.monotonic()
+            # poll more often than add_node, nodes come up at different times
+            self.wait_node_listening(client, node, timeout=0.1, attempts=200)
+            timings['rpc'] = time.monotonic() - step_time
+            step_time = time.monotonic()
+            self.init_client(client, None, config_client)
+            timings['client'] = time.monotonic() - step_time
+            timings['total'] = time.monotonic() - start_time
+            return timings
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers or len(node_ids) or 1,
+            thread_name_prefix='add-node',
+        ) as executor:
+            futures = {
+                node_id: executor.submit(start, node, client)
+                for node_id, node, client in started
+            }
+        res = {}
+        for node_id, future in futures.items():
+            res[node_id] = future.result()
+            summary = ', '.join(
+                f'{step} {duration:.2f}s'
+                for step, duration in res[node_id].items()
+            )
+            print(f'# node {node_id} started: {summary}')
+        return res
+
+    def save_template(self, name: str, node_id: int) -> None:
+        """Save the chain state of node `node_id` as template `name`.
+
+        The node is stopped while its data dir is copied, then restarted.
+        Nodes added later with `template=name` start from this state,
+        with their own identity and configuration.
+        """
+        node = self.nodes[node_id]
+        node.terminate_or_kill()
+        self.templates.save(name, node.node_dir)
+        node.run()
+        self.wait_node_listening(self.clients[node_id], node)
+
     def add_baker(
         self,
         node_id: int,
@@ -382,6 +571,7 @@ class Sandbox:
         params: List[str] = None,
         branch: str = "",
         run_params: List[str] = None,
+        wait: bool = True,
     ) -> None:
         """
         Add a baker associated to a node.
@@ -393,6 +583,10 @@ class Sandbox:
                          use. E.g. 'alpha` for `tezos-baker-alpha`.
             params (list): additional parameters
             branch (str): see branch parameter for `add_node()`
+            wait (bool): wait for the daemon to be ready, otherwise it
+                starts concurrently with the next daemons, until
+                `wait_daemons()`. The daemon is ready once the node is
+                bootstrapped: use `wait=False` if it isn't yet.
         """
         assert node_id in self.nodes, f'No node running with id={node_id}'
         if proto not in self.bakers:
@@ -404,14 +598,7 @@ class Sandbox:
         client = self.clients[node_id]
         rpc_node = node.rpc_port
 
-        log_file = None
-        if self.log_dir:
-            log_file = (
-                f'{self.log_dir}/baker-{proto}_{node_id}_#'
-                f'{self.counter}.txt'
-            )
-            self.logs.append(log_file)
-            self.counter += 1
+        log_file = self._daemon_log_file('baker', proto, node_id)
 
         baker = Baker(
             baker_path,
@@ -423,9 +610,15 @@ class Sandbox:
             log_file=log_file,
             run_params=run_params,
         )
-        time.sleep(0.1)
-        assert baker.poll() is None, 'seems baker failed at startup'
         self.bakers[proto][node_id] = baker
+        self._start_daemon(
+            'baker',
+            baker_path,
+            f'baker {proto} {node_id}',
+            baker,
+            log_file,
+            wait,
+        )
 
     def add_endorser(
         self,
@@ -434,6 +627,7 @@ class Sandbox:
         proto: str,
         endorsement_delay: int = 0,
         branch: str = "",
+        wait: bool = True,
     ) -> None:
         """
         Add an endorser associated to a node.
@@ -445,6 +639,10 @@ class Sandbox:
                          use. E.g. 'alpha` for `tezos-endorser-alpha`.
             params (list): additional parameters
             branch (str): see branch parameter for `add_node()`
+            wait (bool): wait for the daemon to be ready, otherwise it
+                starts concurrently with the next daemons, until
+                `wait_daemons()`. The daemon is ready once the node is
+                bootstrapped: use `wait=False` if it isn't yet.
         """
         assert node_id in self.nodes, f'No node running with id={node_id}'
         if proto not in self.endorsers:
@@ -460,14 +658,7 @@ class Sandbox:
         client = self.clients[node_id]
         rpc_node = node.rpc_port
 
-        log_file = None
-        if self.log_dir:
-            log_file = (
-                f'{self.log_dir}/endorser-{proto}_{node_id}_#'
-                f'{self.counter}.txt'
-            )
-            self.logs.append(log_file)
-            self.counter += 1
+        log_file = self._daemon_log_file('endorser', proto, node_id)
         params = (
             ['run']
             + account_param
@@ -480,15 +671,22 @@ class Sandbox:
             params=params,
             log_file=log_file,
         )
-        time.sleep(0.1)
-        assert endorser.poll() is None, 'seems endorser failed at startup'
         self.endorsers[proto][node_id] = endorser
+        self._start_daemon(
+            'endorser',
+            endorser_path,
+            f'endorser {proto} {node_id}',
+            endorser,
+            log_file,
+            wait,
+        )
 
     def add_accuser(
         self,
         node_id: int,
         proto: str,
         branch: str = "",
+        wait: bool = True,
     ) -> None:
         """
         Add an accuser associated to a node.
@@ -498,6 +696,10 @@ class Sandbox:
             proto (str): name of protocol, used to determine the binary to
                          use. E.g. 'alpha` for `tezos-accuser-alpha`.
             branch (str): see branch parameter for `add_node()`
+            wait (bool): wait for the daemon to be ready, otherwise it
+                starts concurrently with the next daemons, until
+                `wait_daemons()`. The daemon is ready once the node is
+                bootstrapped: use `wait=False` if it isn't yet.
         """
         assert node_id in self.nodes, f'No node running with id={node_id}'
         if proto not in self.accusers:
@@ -510,14 +712,7 @@ class Sandbox:
         client = self.clients[node_id]
         rpc_node = node.rpc_port
 
-        log_file = None
-        if self.log_dir:
-            log_file = (
-                f'{self.log_dir}/accuser-{proto}_{node_id}_#'
-                f'{self.counter}.txt'
-            )
-            self.logs.append(log_file)
-            self.counter += 1
+        log_file = self._daemon_log_file('accuser', proto, node_id)
         params = ['run']
         accuser = Accuser(
             accuser_path,
@@ -526,22 +721,104 @@ class Sandbox:
             params=params,
             log_file=log_file,
         )
-        time.sleep(0.1)
-        assert accuser.poll() is None, 'seems accuser failed at startup'
         self.accusers[proto][node_id] = accuser
+        self._start_daemon(
+            'accuser',
+            accuser_path,
+            f'accuser {proto} {node_id}',
+            accuser,
+            log_file,
+            wait,
+        )
+
+    def _daemon_log_file(self, kind: str, proto: str, node_id: int) -> str:
+        """Log file of a new daemon. Daemons always log to a file, which
+        tells when they are ready, in a temporary dir if there is no
+        `log_dir`."""
+        if self.log_dir:
+            log_file = (
+                f'{self.log_dir}/{kind}-{proto}_{node_id}_#'
+                f'{self.counter}.txt'
+            )
+            self.logs.append(log_file)
+        else:
+            if self._daemon_log_dir is None:
+                self._daemon_log_dir = tempfile.mkdtemp(prefix='tezos-daemons.')
+            log_file = (
+                f'{self._daemon_log_dir}/{kind}-{proto}_{node_id}_#'
+                f'{self.counter}.txt'
+            )
+        self.counter += 1
+        return log_file
+
+    def _start_daemon(
+        self,
+        kind: str,
+        path: str,
+        name: str,
+        process: subprocess.Popen,
+        log_file: str,
+        wait: bool,
+    ) -> None:
+        """Watch daemon `process` until it is ready, see `wait_daemons`."""
+        probe = readiness.Probe(
+            name, process, log_file, readiness.READY_MESSAGES[kind]
+        )
+        self._starting.append((os.path.basename(path), probe))
+        if wait:
+            self.wait_daemons()
+
+    def wait_daemons(self, timeout: float = readiness.STARTUP_TIMEOUT) -> None:
+        """Wait until the daemons started so far are ready, i.e. connected
+        to their bootstrapped node, see `daemons.readiness`.
+
+        Their startup latencies are added to `self.startup_latencies`.
+
+        Args:
+            timeout (float): fail if the daemons aren't ready after
+                             `timeout` seconds, e.g. if their nodes
+                             don't get bootstrapped
+        """
+        starting = self._starting
+        self._starting = []
+        latencies = readiness.wait_ready(
+            [probe for _, probe in starting], timeout
+        )
+        for binary, probe in starting:
+            latency = latencies[probe.name]
+            self.startup_latencies.setdefault(binary, []).append(latency)
+            print(f'# {probe.name} ready in {latency:.2f}s')
+
+    def _forget_daemon(self, process: subprocess.Popen) -> None:
+        """Stop waiting for `process`, if it was started with `wait=False`,
+        so that `wait_daemons` doesn't fail once it is killed."""
+        self._starting = [
+            (binary, probe)
+            for binary, probe in self._starting
+            if probe.process is not process
+        ]
 
     def rm_baker(self, node_id: int, proto: str) -> None:
         """Kill baker for given node_id and proto"""
         baker = self.bakers[proto][node_id]
         del self.bakers[proto][node_id]
+        self._forget_daemon(baker)
         baker.terminate_or_kill()
 
     def rm_endorser(self, node_id: int, proto: str) -> None:
         """Kill endorser for given node_id and proto"""
-        endorser = self.bakers[proto][node_id]
+        endorser = self.endorsers[proto][node_id]
         del self.endorsers[proto][node_id]
+        self._forget_daemon(endorser)
         endorser.terminate_or_kill()
 
+    def rm_accuser(self, node_id: int, proto: str) -> None:
+        """Kill accuser for given node_id and proto"""
+        accuser = self.accusers[proto][node_id]
+        del self.accusers[proto][node_id]
+        self._forget_daemon(accuser)
+        accuser.terminate_or_kill()
+
     def rm_client(self, client_id: int) -> None:
         """Delete client for given client_id"""
         error_msg = f"Client {client_id} wasn't registered"
@@ -583,19 +860,66 @@ class Sandbox:
     def __exit__(self, *exc):
         self.cleanup()
 
+    def _processes(self) -> Dict[str, subprocess.Popen]:
+        """Processes of the nodes and daemons, by name."""
+        processes = {}  # type: Dict[str, subprocess.Popen]
+        for node_id, node in self.nodes.items():
+            if node.process is not None:
+                processes[f'node {node_id}'] = node.process
+        for kind, daemons in [
+            ('baker', self.bakers),
+            ('endorser', self.endorsers),
+            ('accuser', self.accusers),
+        ]:
+            for proto, proto_daemons in daemons.items():
+                for daemon_id, daemon in proto_daemons.items():
+                    processes[f'{kind} {proto} {daemon_id}'] = daemon
+        return processes
+
+    def start_sampler(
+        self, interval: float = resources.INTERVAL
+    ) -> resources.Sampler:
+        """Sample the resources used by the nodes and daemons every
+        `interval` seconds, until `cleanup`, see `tools.resources`.
+
+        Samples are written to `log_dir`, if any. Their peak and mean are
+        given by `self.sampler.summary()`.
+        """
+        assert self.sampler is None, 'sampler already started'
+        path = None
+        if self.log_dir:
+            path = f'{self.log_dir}/resources_#{self.counter}.csv'
+            self.counter += 1
+        self.sampler = resources.Sampler(self._processes, interval, path)
+        self.sampler.start()
+        return self.sampler
+
     def cleanup(self):
-        """Kill all daemons and cleanup temp dirs."""
+        """Kill all daemons and cleanup temp dirs.
+
+        All daemons are terminated at once, those still running after
+        `shutdown.TERM_TIMEOUT` are killed. Their shutdown times are
+        printed, and kept in `self.stops`."""
+        if self.sampler is not None:
+            self.sampler.stop()
+            for name, summary in sorted(self.sampler.summary().items()):
+                print(f'# {name}: {summary}')
+        processes = self._processes()
+        if processes:
+            self.stops = shutdown.shutdown(processes)
+            print(shutdown.report(self.stops))
         for node in self.nodes.values():
-            node.terminate_or_kill()
             node.cleanup()
-        for proto in self.bakers:
-            for baker in self.bakers[proto].values():
-                baker.terminate_or_kill()
-        for proto in self.endorsers:
-            for endorser in self.endorsers[proto].values():
-                endorser.terminate_or_kill()
         for client in self.clients.values():
             client.cleanup()
+        if self._daemon_log_dir is not None:
+            shutil.rmtree(self._daemon_log_dir, ignore_errors=True)
+            self._daemon_log_dir = None
+        if self._own_templates:
+            self.templates.cleanup()
+        if self._ports is not None:
+            self._ports.release()
+            self._ports = None
 
     def are_daemons_alive(self) -> bool:
         """Returns True iff all started daemons/nodes are still alive.
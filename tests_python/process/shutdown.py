@@ -0,0 +1,118 @@
+"""Shutdown of many processes at once, within one deadline.
+
+Terminating processes one after the other costs the sum of their exit
+times, and up to `TERM_TIMEOUT` for each process ignoring SIGTERM.
+`shutdown` sends SIGTERM to all processes first, then waits for them
+together: processes still running `term_timeout` seconds after the
+signal are sent SIGKILL.
+
+    stops = shutdown.shutdown({'node 0': popen_0, 'baker 0': popen_1})
+    print(stops['node 0'].duration)
+"""
+import subprocess
+import time
+from typing import Dict, Optional
+
+# Delay between SIGTERM and SIGKILL of the processes still running
+TERM_TIMEOUT = 10
+
+# Delay after SIGKILL before giving up on the processes still running
+KILL_TIMEOUT = 5
+
+# Upper bound of the delay between two polls of the processes
+POLL_INTERVAL = 0.05
+
+
+class Stop:
+    """How a process stopped during a `shutdown`."""
+
+    def __init__(self, returncode: Optional[int], duration: float):
+        self.returncode = returncode
+        # seconds from SIGTERM to the observed exit, 0 if it had exited
+        # before the shutdown
+        self.duration = duration
+        self.killed = False
+
+    def __repr__(self) -> str:
+        status = 'killed' if self.killed else f'exit {self.returncode}'
+        return f'Stop({status}, {self.duration:.2f}s)'
+
+
+def _wait_all(
+    processes: Dict[str, subprocess.Popen],
+    stops: Dict[str, Stop],
+    start: float,
+    deadline: float,
+) -> None:
+    """Poll the running `processes` until they have all exited or
+    `deadline` is reached, recording their exit in `stops`."""
+    running = [name for name in processes if name not in stops]
+    interval = 0.001
+    while running:
+        now = time.monotonic()
+        for name in list(running):
+            returncode = processes[name].poll()
+            if returncode is not None:
+                stops[name] = Stop(returncode, now - start)
+                running.remove(name)
+        if not running or now >= deadline:
+            return
+        time.sleep(min(interval, deadline - now))
+        interval = min(2 * interval, POLL_INTERVAL)
+
+
+def shutdown(
+    processes: Dict[str, subprocess.Popen],
+    term_timeout: float = TERM_TIMEOUT,
+    kill_timeout: float = KILL_TIMEOUT,
+) -> Dict[str, Stop]:
+    """Terminate `processes`, gently (SIGTERM) then forcefully (SIGKILL).
+
+    Args:
+        processes (dict): processes by name, the names are only used in
+                          the result
+        term_timeout (float): delay before SIGKILL, for all processes
+        kill_timeout (float): delay after SIGKILL before giving up
+    Returns:
+        The stop of each process. The return code of processes still
+        running after SIGKILL, which shouldn't happen, is None.
+    """
+    stops = {}  # type: Dict[str, Stop]
+    for name, process in processes.items():
+        returncode = process.poll()
+        if returncode is not None:
+            stops[name] = Stop(returncode, 0.0)
+    start = time.monotonic()
+    for name, process in processes.items():
+        if name not in stops:
+            process.terminate()
+    _wait_all(processes, stops, start, start + term_timeout)
+    stragglers = [name for name in processes if name not in stops]
+    for name in stragglers:
+        processes[name].kill()
+    _wait_all(processes, stops, start, time.monotonic() + kill_timeout)
+    for name in stragglers:
+        if name not in stops:
+            stops[name] = Stop(None, time.monotonic() - start)
+        stops[name].killed = True
+    return stops
+
+
+def report(stops: Dict[str, Stop]) -> str:
+    """Summary of a `shutdown`, slowest processes first.
+
+    Example:
+        shutdown of 3 processes in 10.02s: node 1 killed after 10.02s,
+        node 0 0.31s, baker 0 0.05s
+    """
+    duration = max((stop.duration for stop in stops.values()), default=0.0)
+    details = []
+    for name, stop in sorted(stops.items(), key=lambda item: -item[1].duration):
+        if stop.returncode is None:
+            details.append(f'{name} still running after {stop.duration:.2f}s')
+        elif stop.killed:
+            details.append(f'{name} killed after {stop.duration:.2f}s')
+        else:
+            details.append(f'{name} {stop.duration:.2f}s')
+    summary = f'shutdown of {len(stops)} processes in {duration:.2f}s'
+    return ': '.join([summary, ', '.join(details)]) if details else summary
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""Run tests on parallel workers, balanced by their recorded durations.
+
+    poetry run python -m scripts.shard --jobs 8 --log-dir tmp tests_alpha
+
+Tests are collected, then grouped by unit (see `tools.durations`): the
+tests of a class share its fixtures and may depend on each other, so they
+always run on the same worker. Units are assigned to `--jobs` workers,
+longest first, each to the least loaded worker, using the durations
+recorded by previous runs. Units without record are given the mean
+duration.
+
+Each worker is a pytest process, with its own log dir `LOG_DIR/worker-I`.
+Sandboxes reserve their ports with `tools.ports`, so that workers don't
+collide. When all workers are done:
+
+- the durations they recorded are merged into `--durations-file`, for the
+  next runs,
+- their JUnit reports are merged into `LOG_DIR/junit.xml`,
+- the output of worker `I` is in `LOG_DIR/worker-I.log`.
+
+Workers are given the ids of the collected tests of their units, rather
+than the units: a module unit (its tests outside of classes) doesn't
+include the classes of the module, and a class unit only includes the
+tests of the class selected by the arguments. The run fails if any
+worker fails, or is killed.
+
+The wall-clock time of a run is at least the duration of its longest
+unit. Arguments after `--` are given to each pytest process.
+"""
+import argparse
+import heapq
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Tuple
+
+import pytest
+
+from tools import durations
+
+DURATIONS_FILE = '.durations.json'
+
+
+class Collector:
+    """Pytest plugin keeping the ids of the collected tests."""
+
+    def __init__(self):
+        self.nodeids = []  # type: List[str]
+
+    def pytest_collection_finish(self, session) -> None:
+        self.nodeids = [item.nodeid for item in session.items]
+
+
+def collect_units(args: List[str]) -> Dict[str, List[str]]:
+    """Ids of the tests selected by pytest arguments `args`, by unit, in
+    collection order."""
+    collector = Collector()
+    code = pytest.main(
+        ['--collect-only', '--quiet', '--quiet'] + args, plugins=[collector]
+    )
+    assert code in (
+        pytest.ExitCode.OK,
+        pytest.ExitCode.NO_TESTS_COLLECTED,
+    ), f'collection failed ({code})'
+    units = {}  # type: Dict[str, List[str]]
+    for nodeid in collector.nodeids:
+        units.setdefault(durations.unit_of(nodeid), []).append(nodeid)
+    return units
+
+
+def shard(
+    units: List[str], estimates: List[float], jobs: int
+) -> List[Tuple[float, List[str]]]:
+    """Assign `units` to `jobs` workers, longest first, each to the least
+    loaded worker.
+
+    Returns:
+        The estimated duration and the units of each worker, the units of
+        a worker being in the order of `units`.
+    """
+    order = {unit: i for i, unit in enumerate(units)}
+    # (load, worker)
+    loads = [(0.0, worker) for worker in range(jobs)]
+    assigned = [[] for _ in range(jobs)]  # type: List[List[str]]
+    for estimate, unit in sorted(
+        zip(estimates, units), key=lambda pair: (-pair[0], order[pair[1]])
+    ):
+        load, worker = heapq.heappop(loads)
+        assigned[worker].append(unit)
+        heapq.heappush(loads, (load + estimate, worker))
+    totals = dict((worker, load) for load, worker in loads)
+    return [
+        (totals[worker], sorted(assigned[worker], key=order.__getitem__))
+        for worker in range(jobs)
+    ]
+
+
+def merge_junit(reports: List[str], path: str) -> Dict[str, int]:
+    """Merge the JUnit XML `reports` into file `path`.
+
+    Returns:
+        The total counts of tests, failures, errors and skipped tests.
+    """
+    merged = ET.Element('testsuites')
+    totals = {'tests': 0, 'failures': 0, 'errors': 0, 'skipped': 0}
+    for report in reports:
+        if not os.path.isfile(report):
+            # the worker died before writing its report
+            totals['errors'] += 1
+            continue
+        root = ET.parse(report).getroot()
+        suites = [root] if root.tag == 'testsuite' else list(root)
+        for suite in suites:
+            merged.append(suite)
+            for key in totals:
+                totals[key] += int(suite.get(key, 0))
+    ET.ElementTree(merged).write(path, encoding='utf-8', xml_declaration=True)
+    return totals
+
+
+def run_workers(
+    plan: List[Tuple[float, List[str]]],
+    units: Dict[str, List[str]],
+    log_dir: str,
+    durations_file: str,
+    pytest_args: List[str],
+) -> Tuple[List[int], List[str]]:
+    """Run a pytest process per worker of `plan`, concurrently.
+
+    Args:
+        plan (list): the units of each worker, see `shard`
+        units (dict): ids of the tests of each unit, see `collect_units`
+        log_dir (str): dir of the logs and reports of the workers
+        durations_file (str): file of the durations, updated with the
+                              durations recorded by the workers
+        pytest_args (list): arguments given to each pytest process
+
+    Returns:
+        The exit codes of the workers, and their JUnit reports.
+    """
+    processes = []
+    reports = []
+    records = []
+    for worker, (_, worker_units) in enumerate(plan):
+        worker_log_dir = os.path.join(log_dir, f'worker-{worker}')
+        os.makedirs(worker_log_dir, exist_ok=True)
+        report = os.path.join(log_dir, f'worker-{worker}.xml')
+        record = os.path.join(log_dir, f'worker-{worker}.durations.json')
+        if os.path.exists(record):
+            os.remove(record)
+        cmd = [
+            sys.executable,
+            '-m',
+            'pytest',
+            f'--log-dir={worker_log_dir}',
+            f'--junitxml={report}',
+            f'--durations-file={record}',
+        ]
+        cmd += pytest_args
+        for unit in worker_units:
+            cmd += units[unit]
+        output = open(os.path.join(log_dir, f'worker-{worker}.log'), 'w')
+        processes.append(
+            (
+                subprocess.Popen(cmd, stdout=output, stderr=subprocess.STDOUT),
+                output,
+            )
+        )
+        reports.append(report)
+        records.append(record)
+    codes = []
+    for process, output in processes:
+        codes.append(process.wait())
+        output.close()
+    for record in records:
+        durations.update(durations_file, durations.load(record))
+    return codes, reports
+
+
+def exit_code(codes: List[int]) -> int:
+    """Exit code of a run whose workers exited with `codes`: 1 if any of
+    them failed or was killed by a signal (negative code)."""
+    return 0 if all(code == pytest.ExitCode.OK for code in codes) else 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description='Run tests on parallel workers.'
+    )
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=os.cpu_count(), help='workers'
+    )
+    parser.add_argument(
+        '--log-dir',
+        help='logs and reports of the workers, a temporary dir by default',
+    )
+    parser.add_argument(
+        '--durations-file',
+        default=DURATIONS_FILE,
+        help=f'durations of previous runs, {DURATIONS_FILE} by default',
+    )
+    parser.add_argument(
+        '--dry-run', action='store_true', help='only print the assignment'
+    )
+    parser.add_argument('tests', nargs='*', help='tests to run, as pytest')
+    argv = sys.argv[1:]
+    pytest_args = []  # type: List[str]
+    if '--' in argv:
+        pytest_args = argv[argv.index('--') + 1 :]
+        argv = argv[: argv.index('--')]
+    args = parser.parse_args(argv)
+    assert args.jobs >= 1
+    units = collect_units(args.tests + pytest_args)
+    if not units:
+        print('no tests collected')
+        return 0
+    estimates = durations.estimate(
+        durations.load(args.durations_file), list(units)
+    )
+    plan = shard(list(units), estimates, min(args.jobs, len(units)))
+    for worker, (estimate, worker_units) in enumerate(plan):
+        print(
+            f'worker {worker}: {len(worker_units)} units, '
+            f'estimated {estimate:.0f}s'
+        )
+    print(
+        f'estimated {max(estimate for estimate, _ in plan):.0f}s '
+        f'(sequential {sum(estimates):.0f}s, '
+        f'longest unit {max(estimates):.0f}s)'
+    )
+    if args.dry_run:
+        for worker, (_, worker_units) in enumerate(plan):
+            print(f'worker {worker}:', *worker_units, sep='\n  ')
+        return 0
+    log_dir = args.log_dir or tempfile.mkdtemp(prefix='tezos-shard.')
+    os.makedirs(log_dir, exist_ok=True)
+    start = time.monotonic()
+    codes, reports = run_workers(
+        plan, units, log_dir, args.durations_file, pytest_args
+    )
+    totals = merge_junit(reports, os.path.join(log_dir, 'junit.xml'))
+    print(
+        f'{totals["tests"]} tests, {totals["failures"]} failures, '
+        f'{totals["errors"]} errors, {totals["skipped"]} skipped '
+        f'in {time.monotonic() - start:.0f}s, reports in {log_dir}'
+    )
+    for worker, code in enumerate(codes):
+        if code < 0:
+            print(
+                f'worker {worker} killed by signal {-code}, '
+                f'see worker-{worker}.log'
+            )
+        elif code != pytest.ExitCode.OK:
+            print(f'worker {worker} failed ({code}), see worker-{worker}.log')
+    return exit_code(codes)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
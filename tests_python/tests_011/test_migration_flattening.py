@@ -81,8 +81,6 @@ def sandbox_noupgrade(singleprocess):
     with Sandbox(
         paths.TEZOS_HOME,
         constants.IDENTITIES,
-        rpc=20730,
-        p2p=21730,
         singleprocess=singleprocess,
     ) as sandbox:
         yield sandbox
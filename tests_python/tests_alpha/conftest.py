@@ -19,10 +19,19 @@ def client(sandbox: Sandbox) -> Iterator[Client]:
 
     Activate protocol alpha one year in the past. This avoids waiting
     when baking blocks manually from the client using `bake for`
+
+    The activated chain is saved as a template the first time, and
+    copied in the nodes of later test classes.
     """
-    sandbox.add_node(0, params=constants.NODE_PARAMS)
-    client = sandbox.client(0)
-    protocol.activate(client, activate_in_the_past=True)
+    template = f'{protocol.HASH}-activated'
+    if template in sandbox.templates:
+        sandbox.add_node(0, params=constants.NODE_PARAMS, template=template)
+        client = sandbox.client(0)
+    else:
+        sandbox.add_node(0, params=constants.NODE_PARAMS)
+        client = sandbox.client(0)
+        protocol.activate(client, activate_in_the_past=True)
+        sandbox.save_template(template, 0)
     yield client
 
 
@@ -76,9 +85,8 @@ def clients(sandbox: Sandbox, request) -> Iterator[List[Client]]:
     """
     assert request.param is not None
     num_nodes = request.param
-    for i in range(num_nodes):
-        # Large number may increases peers connection time
-        sandbox.add_node(i, params=constants.NODE_PARAMS)
+    # Large number may increases peers connection time
+    sandbox.add_nodes(list(range(num_nodes)), params=constants.NODE_PARAMS)
     protocol.activate(sandbox.client(0), activate_in_the_past=True)
     clients = sandbox.all_clients()
     for client in clients:
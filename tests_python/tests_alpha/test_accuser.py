@@ -1,5 +1,3 @@
-import time
-
 import pytest
 from tools import utils, constants
 from launchers.sandbox import Sandbox
@@ -58,11 +56,9 @@ class TestAccuser:
         assert sandbox.client(1).check_node_listening()
 
     def test_start_accuser(self, sandbox: Sandbox):
+        # Returns once the accuser listens to the node's block stream,
+        # otherwise the accuser might miss the next two blocks.
         sandbox.add_accuser(1, proto=protocol.DAEMON)
-        # We make sure that there is enough time for the accuser to start
-        # listing to the node's block stream, otherwise the accuser might miss
-        # the next two blocks.
-        time.sleep(2)
 
     def test_bake_node_1(self, sandbox: Sandbox):
         """Client 1 bakes block B at level 5, not communicated to node 0"""
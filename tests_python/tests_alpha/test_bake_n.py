@@ -0,0 +1,39 @@
+import pytest
+from client.client import Client
+from tools import constants, utils
+
+BLOCKS_PER_COMMITMENT = 4
+
+
+@pytest.mark.incremental
+class TestBakeN:
+    """Blocks baked back to back by `utils.bake_n`."""
+
+    def test_bake_n(self, client: Client):
+        # some of the blocks commit to a seed nonce
+        level = client.get_level()
+        report = utils.bake_n(client, 2 * BLOCKS_PER_COMMITMENT)
+        assert [block.level for block in report.blocks] == list(
+            range(level + 1, level + 2 * BLOCKS_PER_COMMITMENT + 1)
+        )
+        assert client.get_head()['hash'] == report.blocks[-1].hash
+        assert report.blocks_per_second() > 0
+
+    def test_bake_operations(self, client: Client):
+        client.transfer(10, 'bootstrap1', 'bootstrap2')
+        report = utils.bake_n(client, 1, 'bootstrap3')
+        assert report.blocks[0].operations == 1
+        operations = client.rpc(
+            'get', '/chains/main/blocks/head/operation_hashes/3'
+        )
+        assert len(operations) == 1
+        baker = client.rpc('get', '/chains/main/blocks/head/metadata')['baker']
+        assert baker == constants.IDENTITIES['bootstrap3']['identity']
+
+    def test_bake_until(self, client: Client):
+        target = client.get_level() + 3
+        report = utils.bake_until(
+            client, lambda block: block.level == target, max_blocks=5
+        )
+        assert len(report.blocks) == 3
+        assert client.get_level() == target
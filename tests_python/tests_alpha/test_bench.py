@@ -0,0 +1,33 @@
+import json
+import multiprocessing
+
+from tools.bench import BenchResults
+
+WORKERS = 8
+ENTRIES = 20
+
+
+def record(path: str, worker: int) -> None:
+    for i in range(ENTRIES):
+        results = BenchResults(path)
+        results.record('worker', {'worker': worker}, {'entry': i})
+        results.write()
+
+
+class TestBenchResults:
+    """Results appended to one file by concurrent sessions."""
+
+    def test_concurrent_writes(self, tmp_path):
+        path = str(tmp_path / 'bench.json')
+        processes = [
+            multiprocessing.Process(target=record, args=(path, worker))
+            for worker in range(WORKERS)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            assert process.exitcode == 0
+        with open(path) as file:
+            entries = json.load(file)
+        assert len(entries) == WORKERS * ENTRIES
@@ -0,0 +1,113 @@
+import json
+import threading
+
+import pytest
+import requests
+
+from client.block_fetcher import BlockCache, BlockFetcher, BlockUnavailable
+
+# A chain of 20 blocks
+HASHES = [f'B{level:050d}' for level in range(20)]
+
+
+class FakeSession:
+    """Answers the block RPCs of the chain `HASHES`, down to level
+    `caboose`."""
+
+    def __init__(self, endpoint='http://127.0.0.1:18731', caboose=0):
+        self.endpoint = endpoint
+        self.caboose = caboose
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def call(self, verb, path, data=None):
+        assert verb == 'get' and data is None
+        with self._lock:
+            self.calls.append(path)
+        response = requests.Response()
+        response.status_code = 200
+        prefix = '/chains/main/blocks'
+        if path.startswith(prefix + '?'):
+            # ?head=<hash>&length=<n>
+            length = int(path.split('length=')[1])
+            value = [list(reversed(HASHES[self.caboose :]))[:length]]
+        else:
+            block, _, sub_path = path[len(prefix) + 1 :].partition('/')
+            level = len(HASHES) - 1 if block == 'head' else None
+            if block in HASHES:
+                level = HASHES.index(block)
+            elif block.isdigit():
+                level = int(block)
+            if level is None or level >= len(HASHES) or level == 13:
+                response.status_code = 404
+                value = []
+            else:
+                value = {'hash': HASHES[level], 'level': level}
+                if not sub_path:
+                    value = {'hash': HASHES[level], 'header': value}
+        # pylint: disable=protected-access
+        response._content = json.dumps(value).encode()
+        return response
+
+
+class TestBlockFetcher:
+    def test_cache(self):
+        cache = BlockCache(max_size=2)
+        node = 'http://127.0.0.1:18731'
+        cache.put(node, HASHES[0], '', 0)
+        cache.put(node, HASHES[1], '', 1)
+        assert cache.get(node, HASHES[0], '') == 0
+        cache.put(node, HASHES[2], '', 2)
+        # least recently used
+        assert cache.get(node, HASHES[1], '') is None
+        assert cache.get(node, HASHES[2], '') == 2
+        assert len(cache) == 2
+        assert (cache.hits, cache.misses) == (2, 1)
+
+    def test_levels(self):
+        session = FakeSession()
+        fetcher = BlockFetcher(session, workers=3, cache=BlockCache())
+        headers = list(fetcher.levels(2, 12, '/header'))
+        assert [header['level'] for header in headers] == list(range(2, 13))
+        calls = len(session.calls)
+        assert list(fetcher.levels(2, 12, '/header')) == headers
+        # head and hashes, the blocks are cached
+        assert len(session.calls) == calls + 2
+
+    def test_cache_by_node(self):
+        """Nodes don't share cached blocks, they may have pruned them"""
+        cache = BlockCache()
+        session = FakeSession()
+        other_session = FakeSession('http://127.0.0.1:18732')
+        fetcher = BlockFetcher(session, workers=3, cache=cache)
+        other_fetcher = BlockFetcher(other_session, workers=3, cache=cache)
+        fetcher.get(HASHES[2], '/header')
+        other_fetcher.get(HASHES[2], '/header')
+        assert len(other_session.calls) == 1
+        fetcher.get(HASHES[2], '/header')
+        assert len(session.calls) == 1
+
+    def test_metadata_not_cached(self):
+        """Metadata depend on the node, which may reuse an endpoint"""
+        session = FakeSession()
+        fetcher = BlockFetcher(session, workers=3, cache=BlockCache())
+        fetcher.get(HASHES[2])
+        fetcher.get(HASHES[2])
+        assert len(session.calls) == 2
+
+    def test_caboose(self):
+        fetcher = BlockFetcher(FakeSession(caboose=5), workers=3, cache=None)
+        assert fetcher.hashes(5, 12) == HASHES[5:13]
+        # the node only knows the blocks down to its caboose
+        with pytest.raises(BlockUnavailable):
+            fetcher.hashes(2, 12)
+
+    def test_unavailable(self):
+        fetcher = BlockFetcher(FakeSession(), workers=3, cache=None)
+        with pytest.raises(BlockUnavailable):
+            list(fetcher.levels(0, 19))
+        statuses = [
+            (block, response.status_code)
+            for block, response in fetcher.responses(['12', '13', '20'])
+        ]
+        assert statuses == [('12', 200), ('13', 404), ('20', 404)]
@@ -44,7 +44,10 @@ class TestBakers:
 
     def test_add_bakers(self, sandbox: Sandbox):
         for i in range(NUM_NODES):
-            sandbox.add_baker(i, f'bootstrap{i+1}', proto=protocol.DAEMON)
+            sandbox.add_baker(
+                i, f'bootstrap{i+1}', proto=protocol.DAEMON, wait=False
+            )
+        sandbox.wait_daemons()
 
     def test_check_level_and_timestamp(self, sandbox: Sandbox):
         time.sleep(TEST_DURATION)
@@ -102,14 +105,18 @@ class TestBakersAndEndorsers:
 
     def test_add_bakers_and_endorsers(self, sandbox: Sandbox):
         for i in range(NUM_NODES):
-            sandbox.add_baker(i, f'bootstrap{i+1}', proto=protocol.DAEMON)
+            sandbox.add_baker(
+                i, f'bootstrap{i+1}', proto=protocol.DAEMON, wait=False
+            )
         for i in range(NUM_NODES):
             sandbox.add_endorser(
                 i,
                 account=f'bootstrap{i+1}',
                 endorsement_delay=0,
                 proto=protocol.DAEMON,
+                wait=False,
             )
+        sandbox.wait_daemons()
 
     def test_rm_bakers(self, sandbox: Sandbox):
         time.sleep(TEST_DURATION)
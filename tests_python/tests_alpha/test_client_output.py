@@ -0,0 +1,83 @@
+import pytest
+
+from client import client_output
+from client.client_output import InvalidClientOutput
+
+OPERATION_HASH = 'ooMXmLhKyGiEHsMrHz3CukSHxmcRrbX8xByxpYcDtd6zimRypXn'
+
+TRANSFER = f'''Node is bootstrapped.
+Estimated gas: 1427 units (will add 100 for safety)
+Operation successfully injected in the node.
+Operation hash is '{OPERATION_HASH}'
+NOT waiting for the operation to be included.
+Use command
+  tezos-client wait for {OPERATION_HASH} to be included --confirmations 1 \
+--branch BLockGenesisGenesisGenesisGenesisGenesisf79b5d1CoW2
+and/or an external block explorer to make sure that it has been included.
+This sequence of operations was run:
+  Manager signed operations:
+    From: tz1KqTpEZ7Yob7QbPE4Hy4Wo8fHG8LhKxZSx
+    Fee to the baker: ꜩ0.000404
+'''
+
+RUN_SCRIPT = (
+    'storage\n'
+    '  { Elt "hello" "hi" }\n'
+    'emitted operations\n'
+    '  \n'
+    'big_map diff\n'
+    '  New map(4) of type (big_map string string)\n'
+    '  Set map(4)["hello"] to "hi"\n'
+)
+
+
+class TestClientOutput:
+    """Results parsed from client output, on first access of their
+    fields."""
+
+    def test_transfer(self):
+        result = client_output.TransferResult(TRANSFER)
+        assert result.operation_hash == OPERATION_HASH
+        assert result.branch_hash == (
+            'BLockGenesisGenesisGenesisGenesisGenesisf79b5d1CoW2'
+        )
+        assert result.fees == 0.000404
+
+    def test_transfer_lazy(self):
+        result = client_output.TransferResult(
+            TRANSFER.replace('Fee to the baker', 'Fees')
+        )
+        assert result.operation_hash == OPERATION_HASH
+        with pytest.raises(InvalidClientOutput):
+            assert result.fees
+
+    def test_transfer_invalid(self):
+        with pytest.raises(InvalidClientOutput):
+            client_output.TransferResult('Node is bootstrapped.\n')
+
+    def test_run_script(self):
+        result = client_output.RunScriptResult(RUN_SCRIPT)
+        assert result.storage == '{ Elt "hello" "hi" }'
+        assert result.big_map_diff == [
+            ['New map(4) of type (big_map string string)'],
+            ['Set map(4)["hello"] to "hi"'],
+        ]
+
+    def test_receipt(self):
+        operation = {
+            'hash': OPERATION_HASH,
+            'contents': [
+                {
+                    'kind': 'transaction',
+                    'fee': '404',
+                    'metadata': {'operation_result': {'status': 'applied'}},
+                }
+            ],
+        }
+        receipt = client_output.OperationReceipt('BLock', operation)
+        assert receipt.operation_hash == OPERATION_HASH
+        assert receipt.fees == 0.000404
+        assert receipt.statuses == ['applied']
+        receipt = client_output.OperationReceipt(None, None)
+        assert receipt.operation_hash is None
+        assert receipt.statuses == []
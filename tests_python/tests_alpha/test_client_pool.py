@@ -0,0 +1,44 @@
+import os
+import pytest
+from client.client import Client
+from client.client_pool import ClientPool
+from tools import utils
+from .contract_paths import (
+    CONTRACT_PATH,
+    MACROS_CONTRACT_PATH,
+    OPCODES_CONTRACT_PATH,
+    all_contracts,
+)
+
+
+@pytest.fixture(scope="class")
+def pool(client: Client):
+    with ClientPool(client, workers=4) as pool:
+        yield pool
+
+
+@pytest.mark.contract
+class TestClientPool:
+    """Commands run through a ClientPool behave as sequential commands."""
+
+    def test_typecheck_all(self, pool: ClientPool):
+        contracts = [
+            (os.path.join(CONTRACT_PATH, contract),)
+            for contract in all_contracts(['opcodes'])
+        ]
+        assert len(pool.map('typecheck', contracts)) == len(contracts)
+
+    def test_run_script_in_order(self, client: Client, pool: ClientPool):
+        contract = os.path.join(OPCODES_CONTRACT_PATH, 'cons.tz')
+        cases = [(contract, '{}', str(i)) for i in range(16)]
+        results = pool.map('run_script', cases)
+        assert [res.storage for res in results] == [
+            f'{{ {i} }}' for i in range(16)
+        ]
+        assert results[3].storage == client.run_script(*cases[3]).storage
+
+    def test_failure_is_raised(self, pool: ClientPool):
+        contract = os.path.join(MACROS_CONTRACT_PATH, 'assert.tz')
+        future = pool.submit('run_script', contract, 'Unit', 'False')
+        with utils.assert_run_failure('script reached FAILWITH instruction'):
+            future.result()
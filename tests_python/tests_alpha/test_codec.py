@@ -1,6 +1,8 @@
-from typing import Any
+import random
+import string
+from typing import Any, Callable, Dict
 import pytest
-from codec.codec import Codec
+from codec.codec import Codec, CodecError
 from tools import paths
 
 CODEC_BIN = paths.TEZOS_HOME + "tezos-codec"
@@ -21,3 +23,75 @@ class TestCodec:
         data_encoded = codec.encode(encoding_name, data_json=data)
         data_decoded = codec.decode(encoding_name, data=data_encoded)
         assert data_decoded == data
+
+
+# Number of values of each encoding of the round-trip tests
+FUZZ_VALUES = 2000
+
+
+def random_string(rng: random.Random) -> str:
+    return ''.join(
+        rng.choice(string.printable + 'ꜩ★é') for _ in range(rng.randint(0, 40))
+    )
+
+
+# Generators of random values, in JSON, of some registered encodings
+GENERATORS = {
+    'ground.bool': lambda rng: rng.random() < 0.5,
+    'ground.uint8': lambda rng: rng.randint(0, 2 ** 8 - 1),
+    'ground.int8': lambda rng: rng.randint(-(2 ** 7), 2 ** 7 - 1),
+    'ground.uint16': lambda rng: rng.randint(0, 2 ** 16 - 1),
+    'ground.int16': lambda rng: rng.randint(-(2 ** 15), 2 ** 15 - 1),
+    'ground.int31': lambda rng: rng.randint(-(2 ** 30), 2 ** 30 - 1),
+    'ground.int32': lambda rng: rng.randint(-(2 ** 31), 2 ** 31 - 1),
+    'ground.int64': lambda rng: str(rng.randint(-(2 ** 63), 2 ** 63 - 1)),
+    'ground.N': lambda rng: str(rng.getrandbits(rng.randint(1, 256))),
+    'ground.Z': lambda rng: str(
+        rng.choice([-1, 1]) * rng.getrandbits(rng.randint(1, 256))
+    ),
+    'ground.string': random_string,
+    'ground.bytes': lambda rng: rng.randbytes(rng.randint(0, 64)).hex(),
+    'network_version': lambda rng: {
+        'chain_name': random_string(rng),
+        'distributed_db_version': rng.randint(0, 2 ** 16 - 1),
+        'p2p_version': rng.randint(0, 2 ** 16 - 1),
+    },
+}  # type: Dict[str, Callable[[random.Random], Any]]
+
+
+@pytest.fixture(scope="class")
+def codec():
+    codec = Codec(CODEC_BIN)
+    yield codec
+    codec.close()
+
+
+@pytest.mark.codec
+class TestCodecRoundTrip:
+    """Random values of some encodings, encoded and decoded back by one
+    `tezos-codec batch` process."""
+
+    @pytest.mark.parametrize("encoding_name", GENERATORS.keys())
+    def test_round_trip(self, codec: Codec, encoding_name: str):
+        rng = random.Random(encoding_name)
+        values = [GENERATORS[encoding_name](rng) for _ in range(FUZZ_VALUES)]
+        encoded = codec.encode_many(encoding_name, values)
+        assert codec.decode_many(encoding_name, encoded) == values
+        # as encoded by a process per value
+        assert codec.encode(encoding_name, values[0]) == encoded[0]
+
+    def test_errors(self, codec: Codec):
+        results = codec.batch(
+            [
+                ('encode', 'ground.uint8', 1),
+                ('encode', 'ground.uint8', 256),
+                ('encode', 'ground.uint8', 2),
+            ]
+        )
+        assert next(results) == '01'
+        with pytest.raises(CodecError):
+            next(results)
+        # the process is replaced
+        assert codec.encode_many('ground.uint8', [3]) == ['03']
+        with pytest.raises(CodecError):
+            codec.decode_many('unknown encoding', ['00'])
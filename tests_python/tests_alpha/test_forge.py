@@ -0,0 +1,105 @@
+import pytest
+
+from client.client import Client
+from tools import constants, utils
+from tools.forge import Forger
+
+BOOTSTRAP1 = constants.IDENTITIES['bootstrap1']
+BOOTSTRAP2 = constants.IDENTITIES['bootstrap2']
+NUM_TRANSFERS = 20
+
+MANAGER_FIELDS = {
+    'source': BOOTSTRAP1['identity'],
+    'fee': '1274',
+    'counter': '2',
+    'gas_limit': '10600',
+    'storage_limit': '300',
+}
+
+CONTENTS = [
+    {'kind': 'reveal', 'public_key': BOOTSTRAP1['public']},
+    {
+        'kind': 'transaction',
+        'amount': '1000000',
+        'destination': BOOTSTRAP2['identity'],
+    },
+    {
+        'kind': 'transaction',
+        'amount': '0',
+        'destination': 'KT1DieU51jzXLerQx5AqMCiLC1SsCeM8yRat',
+        'parameters': {
+            'entrypoint': 'action',
+            'value': {
+                'prim': 'Pair',
+                'args': [{'int': '-4096'}, {'string': 'tezos'}],
+                'annots': ['%pair'],
+            },
+        },
+    },
+    {
+        'kind': 'origination',
+        'balance': '0',
+        'delegate': BOOTSTRAP2['identity'],
+        'script': {
+            'code': [
+                {'prim': 'parameter', 'args': [{'prim': 'unit'}]},
+                {'prim': 'storage', 'args': [{'prim': 'bytes'}]},
+                {
+                    'prim': 'code',
+                    'args': [
+                        [
+                            {'prim': 'CDR'},
+                            {
+                                'prim': 'NIL',
+                                'args': [{'prim': 'operation'}],
+                                'annots': ['@ops'],
+                            },
+                            {'prim': 'PAIR'},
+                        ]
+                    ],
+                },
+            ],
+            'storage': {'bytes': '00ff'},
+        },
+    },
+    {'kind': 'delegation', 'delegate': BOOTSTRAP2['identity']},
+    {'kind': 'delegation'},
+]
+
+
+@pytest.fixture(scope="class")
+def forger(client: Client):
+    yield Forger(client.rpc_session, check=True)
+
+
+@pytest.mark.incremental
+class TestForge:
+    """Operations forged and signed locally are accepted by the node."""
+
+    @pytest.mark.parametrize('content', CONTENTS)
+    def test_forge_like_node(self, forger: Forger, content: dict):
+        # raises if the node forges the operation differently
+        forger.forge(
+            {
+                'branch': forger.branch(),
+                'contents': [{**MANAGER_FIELDS, **content}],
+            }
+        )
+
+    def test_transfers(self, client: Client, forger: Forger, session: dict):
+        forger.refresh()
+        operations = forger.transfers(
+            BOOTSTRAP1['identity'],
+            BOOTSTRAP1['secret'],
+            [(BOOTSTRAP2['identity'], 1000 + i) for i in range(NUM_TRANSFERS)],
+        )
+        forger.preapply(operations)
+        hashes = forger.inject(operations)
+        assert hashes == [operation.hash for operation in operations]
+        applied = client.get_mempool()['applied']
+        assert {op['hash'] for op in applied} == set(hashes)
+        session['hashes'] = hashes
+
+    def test_bake(self, client: Client, session: dict):
+        utils.bake(client)
+        assert utils.check_block_contains_operations(client, session['hashes'])
@@ -0,0 +1,32 @@
+import pytest
+
+from client import head_monitor
+from client.client import Client
+from tools import utils
+
+
+@pytest.mark.incremental
+class TestHeadMonitor:
+    """Head monitors follow the heads of the node."""
+
+    def test_current_head(self, client: Client):
+        monitor = client.head_monitor()
+        assert monitor is not None
+        seen = head_monitor.heads_seen()
+        if monitor.head is None:
+            assert head_monitor.wait_new_head(seen, 10)
+        assert monitor.head is not None
+        assert monitor.head['hash'] == client.get_head()['hash']
+
+    def test_new_head(self, client: Client):
+        monitor = client.head_monitor()
+        seen = head_monitor.heads_seen()
+        utils.bake(client)
+        assert head_monitor.wait_new_head(seen, 10)
+        assert int(monitor.head['level']) == client.get_level()
+
+    def test_check_level(self, client: Client):
+        level = client.get_level()
+        utils.bake(client)
+        assert utils.check_level(client, level + 1)
+        assert utils.check_level_greater_than(client, level)
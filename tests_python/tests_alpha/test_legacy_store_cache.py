@@ -0,0 +1,99 @@
+import os
+import stat
+
+import pytest
+
+from tools import legacy_stores
+
+# Writes the stores and snapshots, and counts its runs in file `runs`
+MAKER = '''#!/bin/sh
+echo run >> "$(dirname "$0")/runs"
+for mode in archive full rolling; do
+    mkdir -p "$1/${mode}_store_to_upgrade/store"
+    echo "$3" > "$1/${mode}_store_to_upgrade/store/blocks"
+done
+if [ "$4" = true ]; then
+    echo snapshot > "$1/snapshot_from_full_storage.full"
+fi
+'''
+
+
+@pytest.fixture
+def home(tmp_path, monkeypatch):
+    """Sources with a fake maker, the cache in `tmp_path`."""
+    monkeypatch.setattr(legacy_stores, 'CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr(legacy_stores, 'build', lambda home: None)
+    home = tmp_path / 'home'
+    for path, content in [
+        (legacy_stores.MAKER_PATH, MAKER),
+        (legacy_stores.BUILDER_PATH, 'builder'),
+    ]:
+        binary = home / legacy_stores.BUILD_DIR / 'default' / path
+        binary.parent.mkdir(parents=True, exist_ok=True)
+        binary.write_text(content)
+        binary.chmod(binary.stat().st_mode | stat.S_IEXEC)
+    yield str(home) + '/'
+
+
+def runs(home: str) -> int:
+    path = os.path.dirname(
+        f'{home}{legacy_stores.BUILD_DIR}default/{legacy_stores.MAKER_PATH}'
+    )
+    with open(f'{path}/runs') as file:
+        return len(file.readlines())
+
+
+def blocks(data_dir) -> str:
+    return (data_dir / 'full_store_to_upgrade' / 'store' / 'blocks').read_text()
+
+
+class TestLegacyStoreCache:
+    """Legacy stores generated once by `legacy_stores.generate`."""
+
+    def test_cached(self, home, tmp_path):
+        for i in range(3):
+            data_dir = tmp_path / f'data-{i}'
+            data_dir.mkdir()
+            legacy_stores.generate(home, str(data_dir), 10, True)
+            assert blocks(data_dir) == '10\n'
+            assert (data_dir / 'snapshot_from_full_storage.full').exists()
+        assert runs(home) == 1
+        # other parameters
+        data_dir = tmp_path / 'data-3'
+        data_dir.mkdir()
+        legacy_stores.generate(home, str(data_dir), 10, False)
+        assert runs(home) == 2
+
+    def test_copies(self, home, tmp_path):
+        """Stores are modified in place by tests, not the cache."""
+        first = tmp_path / 'first'
+        first.mkdir()
+        legacy_stores.generate(home, str(first), 10, False)
+        (first / 'full_store_to_upgrade' / 'store' / 'blocks').write_text('')
+        second = tmp_path / 'second'
+        second.mkdir()
+        legacy_stores.generate(home, str(second), 10, False)
+        assert blocks(second) == '10\n'
+        assert runs(home) == 1
+
+    def test_rebuilt(self, home, tmp_path):
+        first = tmp_path / 'first'
+        first.mkdir()
+        legacy_stores.generate(home, str(first), 10, False)
+        builder = (
+            f'{home}{legacy_stores.BUILD_DIR}default/'
+            f'{legacy_stores.BUILDER_PATH}'
+        )
+        with open(builder, 'a') as file:
+            file.write('rebuilt')
+        data_dir = tmp_path / 'data'
+        data_dir.mkdir()
+        legacy_stores.generate(home, str(data_dir), 10, False)
+        assert runs(home) == 2
+        # entries of the previous builder are evicted
+        entries = [
+            entry
+            for params in os.listdir(legacy_stores.CACHE_DIR)
+            for entry in os.listdir(f'{legacy_stores.CACHE_DIR}/{params}')
+        ]
+        assert len(entries) == 1
@@ -0,0 +1,53 @@
+import pytest
+
+from client.client import Client
+from tools import utils
+from tools.bench import BenchResults
+from tools.load import LoadGenerator
+
+NUM_ACCOUNTS = 40
+RATE = 20
+DURATION = 5
+
+
+@pytest.fixture(scope="class")
+def load(client: Client):
+    yield LoadGenerator(client, NUM_ACCOUNTS)
+
+
+@pytest.mark.mempool
+@pytest.mark.slow
+@pytest.mark.incremental
+class TestLoad:
+    """Transfers injected at a steady rate by many accounts."""
+
+    def test_fund(self, client: Client, load: LoadGenerator):
+        hashes = load.fund()
+        assert len(hashes) == NUM_ACCOUNTS
+        utils.bake(client)
+        assert utils.check_block_contains_operations(client, hashes)
+
+    def test_run(self, load: LoadGenerator, session: dict):
+        report = load.run(RATE, DURATION)
+        assert report.failed == 0
+        assert len(report.injected) == RATE * DURATION
+        assert report.max_pending() > 0
+        session['report'] = report
+
+    def test_bake(
+        self,
+        client: Client,
+        load: LoadGenerator,
+        session: dict,
+        bench_results: BenchResults,
+    ):
+        report = session['report']
+        utils.bake(client)
+        load.count_blocks(report)
+        assert report.included() == len(report.injected)
+        assert client.mempool_is_empty()
+        bench_results.record(
+            'load',
+            {'accounts': NUM_ACCOUNTS, 'rate': RATE, 'duration': DURATION},
+            report.to_dict(),
+        )
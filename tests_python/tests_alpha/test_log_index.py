@@ -0,0 +1,29 @@
+from tools.log_index import LogIndex
+
+
+class TestLogIndex:
+    """Incremental search in growing log files."""
+
+    def test_appended_lines(self, tmp_path):
+        log = str(tmp_path / 'node.log')
+        index = LogIndex()
+        with open(log, 'w') as file:
+            file.write('ok\nUncaught exception\npartial ')
+        pattern = r'Uncaught|registered$'
+        assert index.search([log], pattern) == {log: ['Uncaught exception\n']}
+        with open(log, 'a') as file:
+            file.write('registered\nok\n')
+        assert index.search([log], pattern) == {
+            log: ['Uncaught exception\n', 'partial registered\n']
+        }
+        assert index.search([log], r'^ok$') == {log: ['ok\n', 'ok\n']}
+
+    def test_truncated_file(self, tmp_path):
+        log = str(tmp_path / 'node.log')
+        index = LogIndex()
+        with open(log, 'w') as file:
+            file.write('Uncaught exception\nok\n')
+        assert index.search([log], r'Uncaught')
+        with open(log, 'w') as file:
+            file.write('ok\n')
+        assert index.search([log, str(tmp_path / 'missing')], 'Uncaught') == {}
@@ -0,0 +1,67 @@
+import pytest
+
+from tools import log_metrics
+
+STATUS = 'Request pushed on 2021-06-07T10:00:00-00:00, treated in 12us, '
+FORGE = 'alpha.baking.forge'
+OPERATION = '{ "protocol": "P", "branch": "BLaaa", "contents": [] }'
+
+NODE_LOG = [
+    ('node.main', 'starting the Tezos node'),
+    ('validator.block', 'block BLaaa successfully validated'),
+    ('validator.block', f'  {STATUS}completed in 4.5ms'),
+    ('validator.block', 'validation of block BLbbb failed'),
+    ('validator.block', f'  {STATUS}completed in 1.2s , Error:'),
+    ('prevalidator', 'injecting operation ooaaa'),
+    ('prevalidator', f'  {STATUS}completed in 800us'),
+    ('validator.block', 'block BLccc successfully validated'),
+    ('validator.block', f'  {STATUS}completed in 1min2.5s'),
+]
+
+BAKER_LOG = [
+    (FORGE, 'injected block BLaaa for bootstrap1 after BLzzz (level 2, '),
+    (FORGE, '  priority 0, fitness 01::02, operations [])'),
+    (FORGE, 'injected block BLccc for bootstrap1 after BLaaa (level 3, '),
+    (FORGE, f'  priority 0, fitness 01::03, operations [ {OPERATION},'),
+    (FORGE, f'    {OPERATION} ])'),
+    (FORGE, 'no slot found at level 4'),
+]
+
+
+def write_log(path, lines) -> str:
+    with open(path, 'w') as file:
+        for section, message in lines:
+            file.write(f'Jun  7 10:00:00.100 - {section}: {message}\n')
+    return str(path)
+
+
+@pytest.mark.parametrize(
+    'duration,expected',
+    [('4.5ms', 4.5), ('800us', 0.8), ('1.2s', 1200), ('1min2.5s', 62500)],
+)
+def test_parse_duration(duration, expected):
+    assert log_metrics.parse_duration(duration) == pytest.approx(expected)
+
+
+def test_percentile():
+    values = [4.0, 1.0, 3.0, 2.0]
+    assert log_metrics.percentile(values, 0) == 1.0
+    assert log_metrics.percentile(values, 50) == 2.5
+    assert log_metrics.percentile(values, 100) == 4.0
+
+
+def test_collect(tmp_path):
+    node_log = write_log(tmp_path / 'node0_1.txt', NODE_LOG)
+    baker_log = write_log(tmp_path / 'baker-alpha_0_#2.txt', BAKER_LOG)
+    metrics = log_metrics.collect([node_log, baker_log])
+    assert sorted(metrics) == ['baker-alpha_0', 'node0']
+    validation = metrics['node0'].block_validation
+    assert [sample.block for sample in validation.samples] == [
+        'BLaaa',
+        'BLccc',
+    ]
+    assert validation.values() == pytest.approx([4.5, 62500])
+    assert metrics['node0'].prevalidator.values() == pytest.approx([0.8])
+    operations = metrics['baker-alpha_0'].operations_per_block
+    assert [sample.level for sample in operations.samples] == [2, 3]
+    assert operations.values() == [0, 2]
@@ -16,11 +16,13 @@ class TestManyBakers:
     """Run 5 bakers and num nodes, wait and check logs"""
 
     def test_init(self, sandbox: Sandbox):
-        for i in range(10):
-            sandbox.add_node(i, params=constants.NODE_PARAMS)
+        sandbox.add_nodes(list(range(10)), params=constants.NODE_PARAMS)
         protocol.activate(sandbox.client(0))
         for i in range(5):
-            sandbox.add_baker(i, f'bootstrap{i + 1}', proto=protocol.DAEMON)
+            sandbox.add_baker(
+                i, f'bootstrap{i + 1}', proto=protocol.DAEMON, wait=False
+            )
+        sandbox.wait_daemons()
 
     def test_wait(self):
         time.sleep(10)
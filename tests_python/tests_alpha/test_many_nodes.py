@@ -1,7 +1,7 @@
 import random
 import time
 import pytest
-from tools import utils, constants
+from tools import constants, resources, utils
 from launchers.sandbox import Sandbox
 from . import protocol
 
@@ -19,6 +19,7 @@ class TestManyNodesBootstrap:
     """Run many nodes, wait a while, run more nodes, check logs"""
 
     def test_init(self, sandbox: Sandbox):
+        sandbox.start_sampler()
         sandbox.add_node(0, params=constants.NODE_PARAMS)
         parameters = dict(protocol.PARAMETERS)
         parameters["time_between_blocks"] = ["1", "0"]
@@ -56,6 +57,21 @@ class TestManyNodesBootstrap:
         level = sandbox.client(0).get_level()
         assert level >= 5
 
+    def test_resources(self, sandbox: Sandbox):
+        """Memory and CPU used by each node and daemon so far, and the
+        growth of the memory of the nodes (see `resources.peak_growth`).
+
+        The growth is only printed: nodes bootstrapping a growing chain
+        legitimately grow, it isn't a leak detector."""
+        assert sandbox.sampler is not None
+        for name, summary in sorted(sandbox.sampler.summary().items()):
+            print(f'{name}: {summary}')
+        assert 'node 0' in sandbox.sampler.summary()
+        for name, samples in sorted(sandbox.sampler.samples.items()):
+            if name.startswith('node') and len(samples) >= 2:
+                growth = resources.peak_growth(samples)
+                print(f'{name}: peak memory growth {growth:.2f}')
+
     def test_check_logs(self, sandbox: Sandbox):
         if not sandbox.log_dir:
             pytest.skip()
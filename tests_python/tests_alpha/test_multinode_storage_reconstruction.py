@@ -40,8 +40,7 @@ class TestMultiNodeStorageReconstruction:
 
     # Node 0 bakes a few blocks
     def test_bake_node0_level_a(self, sandbox: Sandbox, session: dict):
-        for _ in range(BATCH_1):
-            utils.bake(sandbox.client(0))
+        utils.bake_n(sandbox.client(0), BATCH_1)
         session['head_hash'] = sandbox.client(0).get_head()['hash']
         session['head_level'] = sandbox.client(0).get_head()['header']['level']
 
@@ -87,8 +86,7 @@ class TestMultiNodeStorageReconstruction:
     def test_node1_request_all_blocks_with_metadata(
         self, sandbox: Sandbox, session: dict
     ):
-        for i in range(session['head_level']):
-            assert utils.get_block_at_level(sandbox.client(1), i)
+        utils.check_blocks(sandbox.client(1), 0, session['head_level'] - 1)
 
     # Node 2 import and then reconstruct using the dedicated command.
     def test_import_before_reconstruct(self, sandbox: Sandbox, session: dict):
@@ -116,15 +114,13 @@ class TestMultiNodeStorageReconstruction:
     # with their metadata
     def test_available_blocks_node_2(self, sandbox: Sandbox, session: dict):
         # We should now success requesting those reconstructed blocks
-        for i in range(session['head_level']):
-            assert utils.get_block_at_level(sandbox.client(2), i)
+        utils.check_blocks(sandbox.client(2), 0, session['head_level'] - 1)
 
     # Second batch
 
     # Bake a few blocks
     def test_bake_node0_level_b(self, sandbox: Sandbox, session: dict):
-        for _ in range(BATCH_2 - BATCH_1):
-            utils.bake(sandbox.client(0))
+        utils.bake_n(sandbox.client(0), BATCH_2 - BATCH_1)
         session['head_hash'] = sandbox.client(0).get_head()['hash']
         session['head_level'] = sandbox.client(0).get_head()['header']['level']
         assert utils.check_level(sandbox.client(0), session['head_level'])
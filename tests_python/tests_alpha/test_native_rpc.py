@@ -0,0 +1,102 @@
+import functools
+import socket
+import pytest
+import requests
+from client import client as client_module
+from client.client import Client
+from client.rpc_session import RpcSession
+from launchers.sandbox import Sandbox
+from tools import constants, utils
+from tools.utils import assert_run_failure
+from . import protocol
+
+
+@pytest.fixture(scope="class")
+def clients(sandbox: Sandbox):
+    """A node with two clients, the first one forks tezos-client for
+    RPCs, the second one talks to the node directly."""
+    sandbox.add_node(0, params=constants.NODE_PARAMS)
+    protocol.activate(sandbox.client(0), activate_in_the_past=True)
+    utils.bake(sandbox.client(0))
+    native_client = sandbox.get_new_client(
+        sandbox.node(0),
+        client_factory=functools.partial(Client, native_rpc=True),
+    )
+    yield sandbox.client(0), native_client
+    native_client.cleanup()
+
+
+@pytest.mark.incremental
+class TestNativeRpc:
+    """Native RPCs return the same answers as tezos-client RPCs."""
+
+    @pytest.mark.parametrize(
+        "path",
+        [
+            '/chains/main/blocks/head',
+            '/chains/main/blocks/head/header/shell',
+            'chains/main/blocks/head/votes/current_period',
+            '/chains/main/blocks/head/helpers/current_level?offset=1',
+            '/chains/main/checkpoint',
+            '/network/version',
+        ],
+    )
+    def test_get(self, clients, path: str):
+        client, native_client = clients
+        assert native_client.rpc('get', path) == client.rpc('get', path)
+
+    def test_post(self, clients):
+        client, native_client = clients
+        path = '/chains/main/blocks/head/helpers/scripts/pack_data'
+        data = {'data': {'int': '42'}, 'type': {'prim': 'nat'}}
+        assert native_client.rpc('post', path, data) == client.rpc(
+            'post', path, data
+        )
+
+    def test_post_error(self, clients):
+        """Failed calls other than `get` aren't run again by the client"""
+        _, native_client = clients
+        path = '/chains/main/blocks/head/helpers/scripts/pack_data'
+        data = {'data': {'int': '42'}, 'type': {'prim': 'unknown_type'}}
+        # as tezos-client, with the errors of the node
+        with assert_run_failure('unknown_type'):
+            native_client.rpc('post', path, data)
+
+    def test_level(self, clients):
+        client, native_client = clients
+        assert native_client.get_level() == client.get_level()
+
+    def test_error_falls_back_to_client(self, clients):
+        _, native_client = clients
+        with assert_run_failure('Did not find service'):
+            native_client.rpc('get', '/chains/main/blocks/head/unknown')
+
+    def test_receipt(self, clients):
+        client, native_client = clients
+        transfer = client.transfer(10, 'bootstrap1', 'bootstrap2')
+        utils.bake(client)
+        receipt = native_client.get_receipt(transfer.operation_hash)
+        assert (
+            receipt.block_hash
+            == client.get_receipt(transfer.operation_hash).block_hash
+        )
+        assert receipt.operation_hash == transfer.operation_hash
+        assert receipt.statuses == ['applied']
+        assert receipt.fees == transfer.fees
+        unknown = 'ooXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX'
+        assert native_client.get_receipt(unknown).block_hash is None
+
+
+def test_maybe_sent():
+    """Failed requests are sent again only if they didn't reach the node"""
+    with socket.socket() as sock:
+        # a port nobody listens on
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    session = RpcSession(f'http://127.0.0.1:{port}', timeout=1)
+    with pytest.raises(requests.ConnectionError) as exc:
+        session.call('post', '/injection/operation', '00')
+    session.close()
+    assert not client_module._maybe_sent(exc.value)
+    assert not client_module._maybe_sent(requests.ConnectTimeout())
+    assert client_module._maybe_sent(requests.ReadTimeout())
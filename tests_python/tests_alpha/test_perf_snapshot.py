@@ -0,0 +1,145 @@
+"""Cost of snapshot export and import, for each history mode.
+
+Each test class bakes a chain of `CHAIN_LENGTH` blocks, followed by an
+archive, a full and a rolling node. Snapshots of all kinds are exported
+from each node that can export them, then imported into fresh data dirs,
+with and without `--reconstruct` for full snapshots. Export and import
+times, peak resident memory of the node command (see
+`Node.snapshot_export`) and snapshot sizes are recorded with fixture
+`bench_results` (see option `--bench-results`), together with the
+version of the node, so that builds can be compared.
+"""
+import os
+import subprocess
+from typing import Iterator
+
+import pytest
+from launchers.sandbox import Sandbox
+from tools import constants, utils
+from tools.bench import BenchResults
+from . import protocol
+
+PARAMS = constants.NODE_PARAMS
+
+HISTORY_MODES = ['archive', 'full', 'rolling']
+
+# (history mode of the exporting node, kind of snapshot)
+EXPORTS = [
+    ('archive', 'full'),
+    ('archive', 'rolling'),
+    ('full', 'full'),
+    ('full', 'rolling'),
+    ('rolling', 'rolling'),
+]
+
+# Imports with and without `--reconstruct`, by kind of snapshot: only
+# full snapshots can be reconstructed
+RECONSTRUCT = {'full': [False, True], 'rolling': [False]}
+
+# Id of the nodes importing snapshots, after the exporting nodes
+IMPORT_NODE = len(HISTORY_MODES)
+
+
+@pytest.fixture(scope="class")
+def snapshot_dir(tmp_path_factory) -> Iterator[str]:
+    yield str(tmp_path_factory.mktemp('snapshots'))
+
+
+def node_version(sandbox: Sandbox) -> str:
+    node = sandbox.node(0).node
+    version = subprocess.run(
+        [node, '--version'], capture_output=True, text=True, check=True
+    )
+    return version.stdout.strip()
+
+
+@pytest.mark.slow
+@pytest.mark.snapshot
+@pytest.mark.multinode
+@pytest.mark.incremental
+class _SnapshotBench:
+    """Subclasses set the length of the chain."""
+
+    CHAIN_LENGTH = 0
+
+    def test_init(self, sandbox: Sandbox):
+        for node_id, history_mode in enumerate(HISTORY_MODES):
+            sandbox.add_node(
+                node_id, params=PARAMS + ['--history-mode', history_mode]
+            )
+        protocol.activate(sandbox.client(0), activate_in_the_past=True)
+
+    def test_bake(self, sandbox: Sandbox, session: dict):
+        utils.bake_n(sandbox.client(0), self.CHAIN_LENGTH)
+        session['level'] = sandbox.client(0).get_level()
+        for node_id in range(len(HISTORY_MODES)):
+            assert utils.check_level(sandbox.client(node_id), session['level'])
+
+    def test_export(self, sandbox: Sandbox, session: dict, snapshot_dir: str):
+        session['exports'] = {}
+        for history_mode, kind in EXPORTS:
+            node = sandbox.node(HISTORY_MODES.index(history_mode))
+            file = f'{snapshot_dir}/{history_mode}.{kind}'
+            params = ['--block', str(session['level'])]
+            if kind == 'rolling':
+                params.append('--rolling')
+            stats = node.snapshot_export(file, params=params)
+            session['exports'][(history_mode, kind)] = {
+                'export_s': stats.duration,
+                'export_max_rss_kib': stats.max_rss,
+                'size_bytes': os.path.getsize(file),
+            }
+
+    def test_import(self, sandbox: Sandbox, session: dict, snapshot_dir: str):
+        session['imports'] = {}
+        for history_mode, kind in EXPORTS:
+            for reconstruct in RECONSTRUCT[kind]:
+                node = sandbox.register_node(IMPORT_NODE, params=PARAMS)
+                node.init_id()
+                node.init_config()
+                stats = node.snapshot_import(
+                    f'{snapshot_dir}/{history_mode}.{kind}',
+                    params=['--reconstruct'] if reconstruct else [],
+                )
+                sandbox.rm_node(IMPORT_NODE)
+                session['imports'][(history_mode, kind, reconstruct)] = {
+                    'import_s': stats.duration,
+                    'import_max_rss_kib': stats.max_rss,
+                }
+
+    def test_record(
+        self, sandbox: Sandbox, session: dict, bench_results: BenchResults
+    ):
+        version = node_version(sandbox)
+        for (history_mode, kind), metrics in session['exports'].items():
+            bench_results.record(
+                'snapshot_export',
+                {
+                    'blocks': self.CHAIN_LENGTH,
+                    'history_mode': history_mode,
+                    'snapshot': kind,
+                    'node_version': version,
+                },
+                metrics,
+            )
+        imports = session['imports']
+        for (history_mode, kind, reconstruct), metrics in imports.items():
+            bench_results.record(
+                'snapshot_import',
+                {
+                    'blocks': self.CHAIN_LENGTH,
+                    'history_mode': history_mode,
+                    'snapshot': kind,
+                    'reconstruct': reconstruct,
+                    'node_version': version,
+                },
+                metrics,
+            )
+
+
+class TestSnapshot64Blocks(_SnapshotBench):
+    CHAIN_LENGTH = 64
+
+
+class TestSnapshot512Blocks(_SnapshotBench):
+    CHAIN_LENGTH = 512
@@ -0,0 +1,36 @@
+import socket
+
+import pytest
+
+from tools import ports
+
+
+@pytest.fixture
+def lock_dir(tmp_path, monkeypatch):
+    # ranges reserved by these tests only
+    monkeypatch.setattr(ports, 'LOCK_DIR', str(tmp_path))
+    yield tmp_path
+
+
+class TestPorts:
+    """Ranges of ports reserved by `ports.reserve`."""
+
+    def test_disjoint(self, lock_dir):
+        with ports.reserve(10) as first, ports.reserve(10) as second:
+            assert first.index != second.index
+            first_ports = set(range(first.rpc, first.rpc + 10))
+            first_ports |= set(range(first.p2p, first.p2p + 10))
+            assert second.rpc not in first_ports
+            assert second.p2p not in first_ports
+        # released
+        with ports.reserve(10) as third:
+            assert third.index == first.index
+
+    def test_port_in_use(self, lock_dir):
+        with ports.reserve(2) as first:
+            index, p2p = first.index, first.p2p
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', p2p + 1))
+            sock.listen()
+            with ports.reserve(2) as port_range:
+                assert port_range.index != index
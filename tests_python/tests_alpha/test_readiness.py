@@ -0,0 +1,70 @@
+import subprocess
+import sys
+
+import pytest
+
+from daemons import readiness
+
+
+def daemon(log_file: str, script: str) -> subprocess.Popen:
+    with open(log_file, 'w') as log:
+        return subprocess.Popen(
+            [sys.executable, '-u', '-c', script],
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+
+
+def baker(log_file: str, delay: float) -> readiness.Probe:
+    """A fake baker, ready after `delay` seconds."""
+    process = daemon(
+        log_file,
+        'import time\n'
+        'print("Node is bootstrapped.")\n'
+        f'time.sleep({delay})\n'
+        'print("Baker started.")\n'
+        'time.sleep(60)\n',
+    )
+    return readiness.Probe(
+        log_file, process, log_file, readiness.READY_MESSAGES['baker']
+    )
+
+
+class TestReadiness:
+    """Daemons waited for by `readiness.wait_ready`."""
+
+    def test_ready(self, tmp_path):
+        probes = [baker(str(tmp_path / f'{i}.log'), 0.2 * i) for i in range(5)]
+        try:
+            latencies = readiness.wait_ready(probes, timeout=10)
+            assert set(latencies) == {probe.name for probe in probes}
+            # started concurrently
+            assert max(latencies.values()) < 0.8 + 2
+            assert latencies[probes[4].name] >= 0.8
+        finally:
+            for probe in probes:
+                probe.process.kill()
+                probe.process.wait()
+
+    def test_failed(self, tmp_path):
+        log_file = str(tmp_path / 'failed.log')
+        process = daemon(log_file, 'print("Error: unknown account")\nexit(1)')
+        probes = [
+            baker(str(tmp_path / 'slow.log'), 30),
+            readiness.Probe('failed', process, log_file, 'Baker started.'),
+        ]
+        try:
+            with pytest.raises(AssertionError, match='unknown account'):
+                readiness.wait_ready(probes, timeout=10)
+        finally:
+            probes[0].process.kill()
+            probes[0].process.wait()
+
+    def test_timeout(self, tmp_path):
+        probe = baker(str(tmp_path / 'slow.log'), 30)
+        try:
+            with pytest.raises(AssertionError, match='not ready after'):
+                readiness.wait_ready([probe], timeout=0.5)
+        finally:
+            probe.process.kill()
+            probe.process.wait()
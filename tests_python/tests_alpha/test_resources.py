@@ -0,0 +1,91 @@
+import csv
+import os
+import subprocess
+import sys
+import time
+
+from tools import resources
+
+# Allocates 50 MiB and opens 20 files, once it has printed 'start'
+GREEDY = [
+    sys.executable,
+    '-c',
+    'import sys, time\n'
+    'sys.stdin.readline()\n'
+    'data = bytearray(50 * 1024 * 1024)\n'
+    'files = [open(sys.executable, "rb") for _ in range(20)]\n'
+    'time.sleep(60)\n',
+]
+
+
+def wait_for(condition, timeout: float = 10) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+
+
+class TestResources:
+    """Processes sampled by `resources.Sampler`."""
+
+    def test_read_sample(self):
+        process = subprocess.Popen(GREEDY, stdin=subprocess.PIPE, text=True)
+        try:
+            before = resources.read_sample(process.pid, 0)
+            assert before is not None
+            assert process.stdin is not None
+            process.stdin.write('start\n')
+            process.stdin.close()
+            wait_for(
+                lambda: resources.read_sample(process.pid, 0).fds
+                >= before.fds + 20
+            )
+            after = resources.read_sample(process.pid, 0)
+            assert after.rss >= before.rss + 40 * 1024
+            assert after.cpu_time >= before.cpu_time
+        finally:
+            process.kill()
+            process.wait()
+        assert resources.read_sample(process.pid, 0) is None
+
+    def test_sampler(self, tmp_path):
+        process = subprocess.Popen(GREEDY, stdin=subprocess.PIPE, text=True)
+        path = str(tmp_path / 'resources.csv')
+        sampler = resources.Sampler(lambda: {'greedy': process}, 0.05, path)
+        sampler.start()
+        try:
+            wait_for(lambda: len(sampler.samples.get('greedy', [])) >= 2)
+            assert process.stdin is not None
+            process.stdin.write('start\n')
+            process.stdin.close()
+            wait_for(
+                lambda: sampler.summary()['greedy'].peak['rss'] >= 40 * 1024
+            )
+        finally:
+            sampler.stop()
+            process.kill()
+            process.wait()
+        summary = sampler.summary()['greedy']
+        assert summary.peak['rss'] > summary.mean['rss']
+        with open(path) as file:
+            rows = list(csv.DictReader(file))
+        assert len(rows) == summary.samples
+        assert {row['process'] for row in rows} == {'greedy'}
+        assert max(int(row['rss']) for row in rows) == summary.peak['rss']
+
+    def test_exited_process(self):
+        process = subprocess.Popen([sys.executable, '-c', ''])
+        # exited but not reaped yet, its pid can't be reused
+        os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+        sampler = resources.Sampler(lambda: {'exited': process})
+        assert not sampler.sample()
+        assert process.returncode == 0
+
+    def test_peak_growth(self):
+        samples = []
+        for rss in [10, 100, 90, 100, 120, 100]:
+            sample = resources.Sample(len(samples), 1)
+            sample.rss = rss
+            samples.append(sample)
+        assert resources.peak_growth(samples) == 1.2
+        assert resources.peak_growth(samples[:2]) == 10
@@ -0,0 +1,66 @@
+from os import path
+
+import pytest
+
+from client.client import Client, RunScriptCase
+from tools import utils
+from tools.constants import IDENTITIES
+from .contract_paths import MACROS_CONTRACT_PATH, OPCODES_CONTRACT_PATH
+
+
+BOOTSTRAP1 = IDENTITIES['bootstrap1']['identity']
+
+
+def opcode(contract: str) -> str:
+    return path.join(OPCODES_CONTRACT_PATH, contract)
+
+
+CASES = [
+    RunScriptCase(opcode('cons.tz'), '{}', '10'),
+    RunScriptCase(opcode('cons.tz'), '{ 10 }', '-5', trace_stack=True),
+    RunScriptCase(opcode('ret_int.tz'), 'None', 'Unit'),
+    RunScriptCase(
+        opcode('slice.tz'), 'Some' + '"' + 'Foo' * 2000 + '"', 'Pair 1 10000'
+    ),
+    RunScriptCase(opcode('balance.tz'), '0', 'Unit', balance=0.5),
+    RunScriptCase(opcode('transfer_amount.tz'), '0', 'Unit', amount=8.000001),
+    RunScriptCase(
+        opcode('get_and_update_big_map.tz'),
+        '(Pair None { Elt "hello" 4 })',
+        '"hello"',
+        trace_stack=True,
+    ),
+    RunScriptCase(
+        opcode('big_map_to_self.tz'), '{ Elt "hello" 4 }', 'Right Unit'
+    ),
+    RunScriptCase(opcode('proxy.tz'), 'Unit', f'"{BOOTSTRAP1}"', amount=12),
+    RunScriptCase(opcode('set_delegate.tz'), 'Unit', f'(Some "{BOOTSTRAP1}")'),
+    RunScriptCase(opcode('set_delegate.tz'), 'Unit', 'None'),
+    RunScriptCase(
+        opcode('list_map_block.tz'), '{0}', '{ 1 ; 1 ; 1 ; 1 }', gas=10000
+    ),
+]
+
+
+@pytest.mark.contract
+class TestRunScriptsBatch:
+    """`run_scripts_batch` returns the outputs of `run_script`."""
+
+    def test_same_outputs(self, client: Client):
+        results = list(client.run_scripts_batch(CASES))
+        assert len(results) == len(CASES)
+        for case, result in zip(CASES, results):
+            assert result.client_output == case.run(client).client_output
+
+    def test_failure_is_raised_in_order(self, client: Client):
+        cases = [
+            RunScriptCase(opcode('cons.tz'), '{}', '1'),
+            RunScriptCase(
+                path.join(MACROS_CONTRACT_PATH, 'assert.tz'), 'Unit', 'False'
+            ),
+            RunScriptCase(opcode('cons.tz'), '{}', '2'),
+        ]
+        results = client.run_scripts_batch(cases)
+        assert next(results).storage == '{ 1 }'
+        with utils.assert_run_failure('script reached FAILWITH instruction'):
+            next(results)
@@ -0,0 +1,163 @@
+import os
+import random
+import re
+import time
+
+import pytest
+
+from tools import utils
+from tools.bench import BenchResults
+from tools.scrubber import Scrubber
+
+REGTEST_OUTPUTS = os.path.join(os.path.dirname(__file__), '_regtest_outputs')
+
+BLOCK_HASH = 'BLockGenesisGenesisGenesisGenesisGenesisf79b5d1CoW2'
+OPERATION_HASH = 'ooMXmLhKyGiEHsMrHz3CukSHxmcRrbX8xByxpYcDtd6zimRypXn'
+PKH = 'tz1KqTpEZ7Yob7QbPE4Hy4Wo8fHG8LhKxZSx'
+KT1 = 'KT1BEqzn5Wx8uJrZNvuS9DVHmLvG9td3fDLi'
+
+
+# Values of the placeholders of the regression outputs, to rebuild outputs
+# as printed by the client
+RAW_VALUES = {
+    '[BLOCK_HASH]': BLOCK_HASH,
+    '[OPERATION_HASH]': OPERATION_HASH,
+    '[CONTRACT_HASH]': PKH,
+    '[EXPECTED_COUNTER]': '1042',
+    '[TIMESTAMP]': '2021-06-07T10:00:00Z',
+    '[SIGNATURE]': 'sig' + 93 * 'a',
+    '[LEVEL]': '12',
+    '[CONTEXT]': 'CoV' + 49 * 'b',
+    '"[FITNESS]"': '[ "01", "000000000000000a" ]',
+}
+
+# Pieces of random client outputs
+FRAGMENTS = [
+    '"fitness": [ "01" ]',
+    '"fitness": [',
+    '"level": 12',
+    '"priority": 0',
+    '"context": "CoV' + 49 * 'b' + '"',
+    '"proof_of_work_nonce": "' + 16 * 'c' + '"',
+    BLOCK_HASH,
+    OPERATION_HASH,
+    PKH,
+    KT1,
+    f'fees({PKH},12)',
+    'fees([CONTRACT_HASH],3)',
+    f"Operation hash is '{OPERATION_HASH}'",
+    f'wait for {OPERATION_HASH}',
+    'wait for ab',
+    f'--branch {BLOCK_HASH}',
+    f'To: {KT1} ...',
+    f'Injected block {BLOCK_HASH}',
+    'Expected counter: 12',
+    '2021-06-07T10:00:00Z',
+    'sig' + 93 * 'a',
+    'ab',
+    '1',
+    'é',
+    '\u0663',  # an Arabic-Indic digit, matched by `\d` in Unicode mode
+    '\x1c',  # matched by `\s` in Unicode mode
+    '[',
+    ']',
+]
+
+# Separators of the pieces, possibly none
+SEPARATORS = ['', ' ', '\n', ', ', '"', ': ', '(', ')', ' ]', '[ ']
+
+
+def legacy(text: str) -> str:
+    """`text` scrubbed with `re.sub`, as by the legacy converter."""
+    return utils.suball(utils.CLIENT_OUTPUT_SCRUBBER.rules, text)
+
+
+def random_texts(count: int, seed: int = 0):
+    generator = random.Random(seed)
+    for _ in range(count):
+        text = generator.choice(FRAGMENTS)
+        for _ in range(generator.randint(0, 12)):
+            text += generator.choice(SEPARATORS) + generator.choice(FRAGMENTS)
+        yield text
+
+
+def outputs():
+    for name in sorted(os.listdir(REGTEST_OUTPUTS)):
+        with open(os.path.join(REGTEST_OUTPUTS, name)) as output:
+            yield output.read()
+
+
+def raw_outputs():
+    """Regression outputs with placeholders replaced by values, as printed
+    by the client before scrubbing."""
+    for text in outputs():
+        for placeholder, value in RAW_VALUES.items():
+            text = text.replace(placeholder, value)
+        yield text
+
+
+class TestScrubber:
+    """Rules of `Scrubber`, applied as by successive `re.sub`."""
+
+    @pytest.mark.parametrize(
+        'text',
+        [
+            f'Injected block {OPERATION_HASH}',
+            f'{OPERATION_HASH}ab {BLOCK_HASH}',
+            f"Operation hash is '{OPERATION_HASH}'",
+            f'wait for {BLOCK_HASH} to be included',
+            f'--branch {BLOCK_HASH[:20]}',
+            f'Fees: fees({PKH},12) and fees({KT1},3)',
+            f'To: {KT1} ...\nFrom: {PKH}',
+            'sig' + 93 * 'a' + 'b',
+            '"level": 12, "priority": 0, "fitness": [ "01", "0a" ]',
+            '"fitness": [ "01" ] "level": 12)',
+            '"fitness": [ "01" ], "priority": 3, "level": 2 ] "priority": 4',
+            f'"fitness": [ "01" ] {BLOCK_HASH}\n"level": 1',
+            'Expected counter: 3\n2021-06-07T10:00:00Z',
+            'no rule applies here',
+            '"proof_of_work_nonce": "' + 16 * 'c' + '"fitness": [ "01" ]',
+            f'{OPERATION_HASH}{BLOCK_HASH}ab',
+            f'2021-06-07T10:00:00Z \u0663{BLOCK_HASH}',
+        ],
+    )
+    def test_client_output_rules(self, text):
+        assert utils.client_output_converter(text) == legacy(text)
+
+    def test_random_outputs(self):
+        for text in random_texts(5000):
+            assert utils.client_output_converter(text) == legacy(text), text
+
+    @pytest.mark.parametrize(
+        'rules',
+        [
+            [(r'\s', '_')],
+            [(r'(?i)k', '_')],
+            [(r'\d+', '_'), (r'\w{2}', '.')],
+            [(re.compile(r'\w+', re.UNICODE), '_')],
+        ],
+    )
+    @pytest.mark.parametrize('text', ['ab\x1ck 12', 'ab\x1c\u0663k \u212a'])
+    def test_unicode_classes(self, rules, text):
+        assert Scrubber(rules).scrub(text) == utils.suball(rules, text)
+
+    def test_group_references(self):
+        scrubber = Scrubber([(r'a\w', r'<\g<0>>'), (r'\w{3}', 'X')])
+        assert scrubber.scrub('abc ab bcd') == '<ab>c <ab> X'
+
+    def test_regtest_outputs(self, bench_results: BenchResults):
+        """Cost of scrubbing the regression outputs, with their
+        placeholders replaced by actual hashes, timestamps..."""
+        scrubber = utils.CLIENT_OUTPUT_SCRUBBER
+        texts = list(raw_outputs())
+        start = time.perf_counter()
+        scrubbed = [legacy(text) for text in texts]
+        sequential_s = time.perf_counter() - start
+        start = time.perf_counter()
+        assert [scrubber.scrub(text) for text in texts] == scrubbed
+        scrubber_s = time.perf_counter() - start
+        bench_results.record(
+            'scrubber',
+            {'outputs': len(texts)},
+            {'sequential_s': sequential_s, 'scrubber_s': scrubber_s},
+        )
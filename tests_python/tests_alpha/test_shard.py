@@ -0,0 +1,83 @@
+from scripts import shard
+from tools import durations
+
+# A module with tests outside and inside of a class
+TESTS = '''
+import pytest
+
+
+@pytest.mark.parametrize('x', [1, 2])
+def test_b(x):
+    pass
+
+
+class TestA:
+    def test_c(self):
+        pass
+
+    def test_d(self):
+        pass
+'''
+
+
+class TestShard:
+    """Assignment of test units to workers by `scripts/shard.py`."""
+
+    def test_unit_of(self):
+        assert (
+            durations.unit_of('tests_alpha/test_a.py::TestA::test_b[x::y]')
+            == 'tests_alpha/test_a.py::TestA'
+        )
+        assert (
+            durations.unit_of('tests_alpha/test_a.py::test_b')
+            == 'tests_alpha/test_a.py'
+        )
+
+    def test_collect_units(self, tmp_path, monkeypatch):
+        (tmp_path / 'test_m.py').write_text(TESTS)
+        monkeypatch.chdir(tmp_path)
+        args = ['-p', 'no:cacheprovider', '--rootdir', str(tmp_path)]
+        assert shard.collect_units(args + ['test_m.py']) == {
+            'test_m.py': ['test_m.py::test_b[1]', 'test_m.py::test_b[2]'],
+            'test_m.py::TestA': [
+                'test_m.py::TestA::test_c',
+                'test_m.py::TestA::test_d',
+            ],
+        }
+        # the selection of the tests of a class is kept
+        assert shard.collect_units(args + ['test_m.py::TestA::test_c']) == {
+            'test_m.py::TestA': ['test_m.py::TestA::test_c']
+        }
+
+    def test_exit_code(self):
+        assert shard.exit_code([0, 0]) == 0
+        assert shard.exit_code([0, 1]) == 1
+        # killed by a signal
+        assert shard.exit_code([-9, 0]) == 1
+
+    def test_estimate(self):
+        assert durations.estimate({'a': 1.0, 'b': 3.0}, ['a', 'c']) == [
+            1.0,
+            2.0,
+        ]
+        assert durations.estimate({}, ['a']) == [durations.DEFAULT_DURATION]
+
+    def test_shard(self):
+        units = ['a', 'b', 'c', 'd', 'e']
+        plan = shard.shard(units, [5.0, 1.0, 8.0, 3.0, 3.0], 2)
+        # longest first: 8 | 5, 3 | 5, 3, 3 | 8, 3, 1
+        assert sorted(estimate for estimate, _ in plan) == [9.0, 11.0]
+        assert sorted(unit for _, units in plan for unit in units) == units
+        # units of a worker keep the collection order
+        for _, worker_units in plan:
+            assert worker_units == sorted(worker_units)
+
+    def test_longest_unit(self):
+        plan = shard.shard(['a', 'b', 'c'], [20.0, 1.0, 1.0], 3)
+        assert max(estimate for estimate, _ in plan) == 20.0
+
+    def test_durations_file(self, tmp_path):
+        path = str(tmp_path / 'durations.json')
+        durations.update(path, {'a': 1.0, 'b': 2.0})
+        durations.update(path, {'b': 3.0})
+        assert durations.load(path) == {'a': 1.0, 'b': 3.0}
@@ -0,0 +1,64 @@
+import subprocess
+import sys
+import time
+
+from process import shutdown
+
+# Exits on SIGTERM (default action)
+SLEEPER = [sys.executable, '-c', 'import time; time.sleep(60)']
+
+# Ignores SIGTERM, once it has printed that it is ready
+STUBBORN = [
+    sys.executable,
+    '-c',
+    'import signal, time\n'
+    'signal.signal(signal.SIGTERM, signal.SIG_IGN)\n'
+    'print("ready", flush=True)\n'
+    'time.sleep(60)\n',
+]
+
+
+def stubborn() -> subprocess.Popen:
+    process = subprocess.Popen(STUBBORN, stdout=subprocess.PIPE, text=True)
+    assert process.stdout is not None
+    assert process.stdout.readline() == 'ready\n'
+    process.stdout.close()
+    return process
+
+
+class TestShutdown:
+    """Processes terminated together by `shutdown.shutdown`."""
+
+    def test_terminate(self):
+        processes = {
+            f'sleeper {i}': subprocess.Popen(SLEEPER) for i in range(10)
+        }
+        stops = shutdown.shutdown(processes, term_timeout=5)
+        assert set(stops) == set(processes)
+        for stop in stops.values():
+            assert not stop.killed
+            assert stop.returncode == -15
+            assert stop.duration < 5
+        assert 'shutdown of 10 processes' in shutdown.report(stops)
+
+    def test_deadline(self):
+        processes = {f'stubborn {i}': stubborn() for i in range(3)}
+        processes['sleeper'] = subprocess.Popen(SLEEPER)
+        start = time.monotonic()
+        stops = shutdown.shutdown(processes, term_timeout=0.5)
+        # one deadline for all processes
+        assert time.monotonic() - start < 1.5
+        for i in range(3):
+            stop = stops[f'stubborn {i}']
+            assert stop.killed
+            assert stop.returncode == -9
+            assert stop.duration >= 0.5
+        assert not stops['sleeper'].killed
+        assert 'stubborn 0 killed after' in shutdown.report(stops)
+
+    def test_exited(self):
+        process = subprocess.Popen([sys.executable, '-c', 'pass'])
+        process.wait()
+        stops = shutdown.shutdown({'done': process})
+        assert stops['done'].returncode == 0
+        assert stops['done'].duration == 0.0
@@ -27,8 +27,7 @@ def client_get_current_period_kind(client) -> dict:
 
 
 def bake_n_blocks(client: Client, baker: str, n_blocks: int):
-    for _ in range(n_blocks):
-        utils.bake(client, baker)
+    utils.bake_n(client, n_blocks, baker)
 
 
 def bake_until_next_voting_period(client: Client, baker: str, offset: int = 0):
@@ -0,0 +1,36 @@
+import pytest
+from client.client import Client
+from tools import constants, wallet
+
+
+@pytest.mark.client
+class TestWallet:
+    """Keys generated and written by `tools.wallet`, as read by the
+    client."""
+
+    def test_key_of_identity(self):
+        identity = constants.IDENTITIES['bootstrap1']
+        assert wallet.Key.from_secret(identity['secret']).identity() == (
+            identity
+        )
+
+    def test_write_wallet(self, nodeless_client: Client):
+        keys = wallet.generate_keys(['key1', 'key2'])
+        wallet.write_wallet(nodeless_client.base_dir, keys)
+        # aliases with the same name are replaced
+        wallet.write_wallet(
+            nodeless_client.base_dir, {'key2': wallet.Key.generate()}
+        )
+        address = nodeless_client.show_address('key1', show_secret=True)
+        assert address.hash == keys['key1'].pkh
+        assert address.public_key == keys['key1'].public_key
+        assert address.secret_key == keys['key1'].secret_key
+        address = nodeless_client.show_address('key2')
+        assert address.hash != keys['key2'].pkh
+
+    def test_key_of_client_key(self, nodeless_client: Client):
+        nodeless_client.gen_key('generated')
+        address = nodeless_client.show_address('generated', show_secret=True)
+        key = wallet.Key.from_secret(address.secret_key)
+        assert key.pkh == address.hash
+        assert key.public_key == address.public_key
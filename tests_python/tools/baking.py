@@ -0,0 +1,337 @@
+"""Baking of blocks back to back, without a client process per block.
+
+`utils.bake` runs `tezos-client bake for`, which forks a process and
+reads the head again for every block. A `BlockBaker` bakes blocks the
+way `bake for ... --minimal-timestamp` does, but through the RPCs of a
+keep-alive `RpcSession`: it looks for the best priority of its delegate,
+preapplies the operations of the mempool with the minimal valid
+timestamp, forges the header and injects the block. The protocol data of
+the header is encoded in-process, but the header itself is forged by the
+node (`helpers/forge_block_header`), only its signature is computed
+in-process.
+
+    baker = BlockBaker(client.rpc_session, 'bootstrap1')
+    report = baker.bake_n(100)
+    print(report.summary())
+
+The delegate must be an unencrypted ed25519 identity of
+`constants.IDENTITIES`. The seed nonces committed by the baked blocks are
+kept in `BlockBaker.nonces`, they aren't revealed.
+"""
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import quote
+
+import pyblake2
+
+from client.rpc_session import RpcSession
+from . import constants, forge
+
+# Watermark of block headers, followed by the chain id
+BLOCK_WATERMARK = b'\x01'
+
+CHAIN_ID_PREFIX = bytes([87, 82, 0])
+NONCE_HASH_PREFIX = bytes([69, 220, 169])
+
+# As `utils.bake`
+MAX_PRIORITY = 1024
+
+# Sandboxed protocols have no proof of work
+PROOF_OF_WORK_NONCE = bytes(8)
+
+NONCE_LENGTH = 32
+
+# Signature of the headers given to `preapply/block` (`Signature.zero`)
+ZERO_SIGNATURE = (
+    'sigMzJ4GVAvXEd2RjsKGfG2H9QvqTSKCZsuB2KiHbZRGFz72XgF6KaKADznh674fQgBat'
+    'xw3xdHqTtMHUZAGRprxy64wg1aq'
+)
+
+# Validation pass of operations, by kind of their first content (see
+# `Operation_repr.acceptable_passes`), others are manager operations
+VALIDATION_PASSES = {
+    'endorsement': 0,
+    'endorsement_with_slot': 0,
+    'proposals': 1,
+    'ballot': 1,
+    'seed_nonce_revelation': 2,
+    'double_endorsement_evidence': 2,
+    'double_baking_evidence': 2,
+    'activate_account': 2,
+}
+MANAGER_PASS = 3
+
+
+class BakedBlock:
+    """A block baked by a `BlockBaker`."""
+
+    def __init__(
+        self,
+        block_hash: str,
+        level: int,
+        priority: int,
+        timestamp: str,
+        operations: int,
+    ):
+        self.hash = block_hash
+        self.level = level
+        self.priority = priority
+        self.timestamp = timestamp
+        self.operations = operations
+
+
+class BakeReport:
+    """Blocks baked by a call of a `BlockBaker`, and the time it took."""
+
+    def __init__(self):
+        self.blocks = []  # type: List[BakedBlock]
+        self.duration = 0.0
+
+    def blocks_per_second(self) -> float:
+        return len(self.blocks) / self.duration if self.duration else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'blocks': len(self.blocks),
+            'duration_s': self.duration,
+            'blocks_per_s': self.blocks_per_second(),
+        }
+
+    def summary(self) -> str:
+        return (
+            f'{len(self.blocks)} blocks baked in {self.duration:.1f}s '
+            f'({self.blocks_per_second():.1f} blocks/s)'
+        )
+
+
+def _protocol_data(
+    priority: int, seed_nonce_hash: Optional[bytes], escape_vote: bool
+) -> bytes:
+    # `Block_header_repr.contents_encoding`
+    data = priority.to_bytes(2, 'big') + PROOF_OF_WORK_NONCE
+    if seed_nonce_hash is None:
+        data += b'\x00'
+    else:
+        data += b'\xff' + seed_nonce_hash
+    return data + (b'\xff' if escape_vote else b'\x00')
+
+
+def validation_pass(operation: Dict[str, Any]) -> Optional[int]:
+    """Validation pass of `operation`, None if it can't be included."""
+    kind = operation['contents'][0]['kind']
+    if kind == 'failing_noop':
+        return None
+    return VALIDATION_PASSES.get(kind, MANAGER_PASS)
+
+
+class BlockBaker:
+    """Bakes blocks for a delegate through a `RpcSession`.
+
+    The head is read once, then each block is baked on top of the
+    previous one.
+    """
+
+    def __init__(
+        self,
+        session: RpcSession,
+        delegate: str = 'bootstrap1',
+        chain: str = 'main',
+        mempool: bool = True,
+        liquidity_baking_escape_vote: bool = False,
+    ):
+        """
+        Args:
+            session (RpcSession): session to the node
+            delegate (str): name of the delegate in `constants.IDENTITIES`
+            chain (str): the chain of the blocks
+            mempool (bool): include the applied operations of the mempool
+            liquidity_baking_escape_vote (bool): vote of the baked blocks
+        """
+        identity = constants.IDENTITIES[delegate]
+        self.session = session
+        self.pkh = identity['identity']
+        self.secret_key = identity['secret']
+        self.chain = chain
+        self.mempool = mempool
+        self.liquidity_baking_escape_vote = liquidity_baking_escape_vote
+        # seed nonces (hex) of the baked blocks, by level
+        self.nonces = {}  # type: Dict[int, str]
+        self._head = None  # type: Optional[Dict[str, Any]]
+        self._watermark = None  # type: Optional[bytes]
+
+    def _rpc(self, verb: str, path: str, data: Any = None) -> Any:
+        response = self.session.call(verb, path, data)
+        assert (
+            response.status_code == 200
+        ), f'{verb} {path}: HTTP {response.status_code} {response.text}'
+        return response.json()
+
+    def _block_rpc(self, path: str, data: Any = None) -> Any:
+        # RPC of the predecessor of the next block
+        block = f'/chains/{self.chain}/blocks/{self._head["hash"]}'
+        return self._rpc('get' if data is None else 'post', block + path, data)
+
+    def refresh(self) -> None:
+        """Read the head again, e.g. after blocks baked by others."""
+        self._head = None
+
+    def _predecessor(self) -> Dict[str, Any]:
+        # hash and level of the last baked block, or of the head
+        if self._head is None:
+            header = self._rpc(
+                'get', f'/chains/{self.chain}/blocks/head/header'
+            )
+            self._head = {'hash': header['hash'], 'level': header['level']}
+        return self._head
+
+    def _endorsing_power(self, endorsements: List[dict]) -> int:
+        if not endorsements:
+            return 0
+        rights = self._block_rpc(
+            f'/helpers/endorsing_rights?level={self._head["level"]}'
+        )
+        power = {
+            slot: len(right['slots'])
+            for right in rights
+            for slot in right['slots']
+        }
+        return sum(
+            power.get(operation['contents'][0].get('slot'), 0)
+            for operation in endorsements
+        )
+
+    def _operations(self, protocol: str) -> List[List[dict]]:
+        passes = [[], [], [], []]  # type: List[List[dict]]
+        if not self.mempool:
+            return passes
+        pending = self._rpc(
+            'get', f'/chains/{self.chain}/mempool/pending_operations'
+        )
+        for operation in pending['applied']:
+            validation = validation_pass(operation)
+            if validation is not None:
+                passes[validation].append(
+                    {
+                        'protocol': protocol,
+                        'branch': operation['branch'],
+                        'contents': operation['contents'],
+                        'signature': operation['signature'],
+                    }
+                )
+        return passes
+
+    def bake(self) -> BakedBlock:
+        """Bake a block on top of the last baked block (or the head) with
+        the best priority of the delegate, at the minimal valid time.
+
+        The shell header comes from `preapply/block` and is forged by the
+        node with the protocol data encoded by `_protocol_data`; the
+        forged header is then signed in-process."""
+        self._predecessor()
+        if self._watermark is None:
+            chain_id = self._rpc('get', f'/chains/{self.chain}/chain_id')
+            self._watermark = BLOCK_WATERMARK + forge.b58decode(
+                chain_id, CHAIN_ID_PREFIX
+            )
+        level = self._head['level'] + 1
+        protocol = self._block_rpc('/protocols')['next_protocol']
+        rights = self._block_rpc(
+            f'/helpers/baking_rights?level={level}&delegate={self.pkh}'
+            f'&max_priority={MAX_PRIORITY}'
+        )
+        assert rights, f'no slot found at level {level} for {self.pkh}'
+        priority = rights[0]['priority']
+        protocol_data = {
+            'protocol': protocol,
+            'priority': priority,
+            'proof_of_work_nonce': PROOF_OF_WORK_NONCE.hex(),
+            'liquidity_baking_escape_vote': self.liquidity_baking_escape_vote,
+            'signature': ZERO_SIGNATURE,
+        }
+        seed_nonce_hash = None
+        if self._block_rpc('/helpers/current_level?offset=1')[
+            'expected_commitment'
+        ]:
+            nonce = os.urandom(NONCE_LENGTH)
+            seed_nonce_hash = pyblake2.blake2b(nonce, digest_size=32).digest()
+            self.nonces[level] = nonce.hex()
+            protocol_data['seed_nonce_hash'] = forge.b58encode(
+                seed_nonce_hash, NONCE_HASH_PREFIX
+            )
+        operations = self._operations(protocol)
+        timestamp = self._block_rpc(
+            f'/minimal_valid_time?priority={priority}&endorsing_power='
+            f'{self._endorsing_power(operations[0])}'
+        )
+        preapplied = self._block_rpc(
+            f'/helpers/preapply/block?sort&timestamp={quote(timestamp)}',
+            {'protocol_data': protocol_data, 'operations': operations},
+        )
+        shell_header = preapplied['shell_header']
+        unsigned = self._block_rpc(
+            '/helpers/forge_block_header',
+            dict(
+                shell_header,
+                protocol_data=_protocol_data(
+                    priority,
+                    seed_nonce_hash,
+                    self.liquidity_baking_escape_vote,
+                ).hex(),
+            ),
+        )['block']
+        signature = forge.sign(unsigned, self.secret_key, self._watermark)
+        applied = [
+            [
+                {'branch': operation['branch'], 'data': operation['data']}
+                for operation in result['applied']
+            ]
+            for result in preapplied['operations']
+        ]
+        block_hash = self._rpc(
+            'post',
+            f'/injection/block?chain={self.chain}',
+            {'data': unsigned + signature, 'operations': applied},
+        )
+        self._head = {'hash': block_hash, 'level': level}
+        return BakedBlock(
+            block_hash,
+            level,
+            priority,
+            shell_header['timestamp'],
+            sum(len(operations) for operations in applied),
+        )
+
+    def bake_until(
+        self, predicate: Callable[[BakedBlock], bool], max_blocks: int
+    ) -> BakeReport:
+        """Bake blocks until `predicate` holds for the last baked block.
+
+        Args:
+            predicate (function): condition on the last baked block
+            max_blocks (int): fail if the condition doesn't hold after
+                              `max_blocks` blocks
+        """
+        report = BakeReport()
+        start = time.monotonic()
+        while True:
+            assert (
+                len(report.blocks) < max_blocks
+            ), f'condition not reached after {max_blocks} blocks'
+            block = self.bake()
+            report.blocks.append(block)
+            if predicate(block):
+                break
+        report.duration = time.monotonic() - start
+        return report
+
+    def bake_n(self, n: int) -> BakeReport:
+        """Bake `n` blocks."""
+        if n <= 0:
+            return BakeReport()
+        target = self._predecessor()['level'] + n
+        return self.bake_until(lambda block: block.level >= target, n)
+
+    def bake_until_level(self, level: int) -> BakeReport:
+        """Bake blocks until the level of the last block is `level`."""
+        return self.bake_n(level - self._predecessor()['level'])
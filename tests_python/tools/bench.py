@@ -0,0 +1,84 @@
+"""Machine-readable results of benchmarks.
+
+Benchmark tests record one entry per configuration they measure. Entries
+are printed, and appended to the JSON file given by option
+`--bench-results` if any, so that successive runs (e.g. one per commit)
+can be compared.
+
+    def test_bench(bench_results):
+        bench_results.record(
+            'endorsement', {'accounts': 256}, {'validation_ms': 120.5}
+        )
+
+The file holds a JSON list of entries of the form
+
+    {"name": "endorsement", "date": "2021-06-07T10:00:00Z",
+     "params": {"accounts": 256}, "metrics": {"validation_ms": 120.5}}
+"""
+import datetime
+import fcntl
+import json
+import os
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional
+
+
+class BenchResults:
+    """Results of the benchmarks of a test session."""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path (str): JSON file the results are appended to by `write`,
+                        or None to only print them
+        """
+        self.path = path
+        self.entries = []  # type: List[Dict[str, Any]]
+        self._lock = threading.Lock()
+
+    def record(
+        self, name: str, params: Dict[str, Any], metrics: Dict[str, Any]
+    ) -> None:
+        """Record the measures of a benchmark.
+
+        Args:
+            name (str): name of the benchmark
+            params (dict): its configuration, e.g. numbers of accounts
+            metrics (dict): measures, with units in their names
+                            (e.g. `validation_ms`)
+        """
+        date = datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+        entry = {
+            'name': name,
+            'date': date,
+            'params': params,
+            'metrics': metrics,
+        }
+        print(f'# bench {json.dumps(entry, sort_keys=True)}')
+        with self._lock:
+            self.entries.append(entry)
+
+    def write(self) -> None:
+        """Append the recorded entries to file `path`, if any.
+
+        Concurrent sessions (e.g. workers of `scripts/shard.py`) may
+        share `path`: the file is updated under an exclusive lock of
+        `path`.lock."""
+        if self.path is None or not self.entries:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        # the results file itself is replaced, the lock is on another one
+        with open(f'{self.path}.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            entries = []  # type: List[Dict[str, Any]]
+            if os.path.isfile(self.path):
+                with open(self.path) as file:
+                    entries = json.load(file)
+            entries.extend(self.entries)
+            fd, tmp_path = tempfile.mkstemp(dir=directory)
+            with os.fdopen(fd, 'w') as file:
+                json.dump(entries, file, indent=2, sort_keys=True)
+                file.write('\n')
+            os.replace(tmp_path, self.path)
+        self.entries = []
@@ -10,7 +10,7 @@ class ClientRegression(client.Client):
     as provided by the `pytest-regtest`, using the `set_regtest`
     method. When a `regtest` fixture is present, all output from the
     client that results from executing the `run` method is written to
-    this regtest.
+    this regtest, as well as the outputs emulated by `run_scripts_batch`.
 
     If the command fails, the stderr output is also written.
     """
@@ -68,3 +68,8 @@ class ClientRegression(client.Client):
         if caught_exc is not None:
             raise caught_exc
         return output, stderr, retcode
+
+    def _report_output(self, output: str) -> None:
+        super()._report_output(output)
+        if self.regtest is not None:
+            self.regtest.write(output)
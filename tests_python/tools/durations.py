@@ -0,0 +1,72 @@
+"""Wall-clock durations of test units, to balance parallel runs.
+
+A unit is a test class, whose tests share class-scoped fixtures (a
+sandbox...) and may depend on each other (`incremental`), or the tests of
+a module outside of classes. Units are never split across workers.
+
+Durations are recorded by pytest option `--durations-file=FILE`, which
+adds the durations of the units run by the session to the JSON object
+`{unit: seconds}` of FILE. `scripts/shard.py` reads them to assign units
+to workers.
+"""
+import json
+import os
+import tempfile
+from typing import Dict, Iterable, List
+
+# Default duration of units, in seconds, if there is no record at all
+DEFAULT_DURATION = 10.0
+
+
+def unit_of(nodeid: str) -> str:
+    """Unit of test `nodeid`, e.g. `tests_alpha/test_a.py::TestA` for
+    `tests_alpha/test_a.py::TestA::test_b[param]`."""
+    parts = nodeid.split('::')
+    return '::'.join(parts[:2]) if len(parts) > 2 else parts[0]
+
+
+def load(path: str) -> Dict[str, float]:
+    if not os.path.isfile(path):
+        return {}
+    with open(path) as file:
+        return json.load(file)
+
+
+def update(path: str, durations: Dict[str, float]) -> None:
+    """Replace the records of `durations` in file `path`."""
+    records = load(path)
+    records.update(durations)
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile(
+        'w', dir=directory, delete=False, suffix='.tmp'
+    ) as file:
+        json.dump(records, file, indent=2, sort_keys=True)
+    os.replace(file.name, path)
+
+
+def estimate(durations: Dict[str, float], units: Iterable[str]) -> List[float]:
+    """Durations of `units`. Units without record are given the mean of
+    the records."""
+    default = (
+        sum(durations.values()) / len(durations)
+        if durations
+        else DEFAULT_DURATION
+    )
+    return [durations.get(unit, default) for unit in units]
+
+
+class DurationRecorder:
+    """Pytest plugin recording the durations of the units of a session,
+    setup and teardown included."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.durations = {}  # type: Dict[str, float]
+
+    def pytest_runtest_logreport(self, report) -> None:
+        unit = unit_of(report.nodeid)
+        self.durations[unit] = self.durations.get(unit, 0.0) + report.duration
+
+    def pytest_sessionfinish(self) -> None:
+        if self.durations:
+            update(self.path, self.durations)
@@ -0,0 +1,535 @@
+"""Local forging, signing and injection of manager operations.
+
+`examples/forge_transfer.py` forges and injects an operation with one
+RPC per step (`forge/operations`, `preapply/operations`,
+`injection/operation`). This module encodes manager operations of
+protocol alpha locally, in the binary format of the node, and signs them
+in-process, so that tests can build many operations without a round trip
+per operation:
+
+    forger = Forger(RpcSession(client.endpoint))
+    ops = forger.transfers(
+        source, secret_key, [(destination, 1000)] * 100
+    )
+    forger.preapply(ops)
+    hashes = forger.inject(ops)
+
+Supported operations are `reveal`, `transaction`, `origination`,
+`delegation` and `register_global_constant`, given in the JSON format of
+RPC `forge/operations`. With `check=True`, every forged operation is
+compared with the output of `forge/operations`.
+"""
+import hashlib
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import base58check
+import pyblake2
+
+from client.rpc_session import RpcSession
+from . import constants, utils
+
+# Primitives of Michelson, in the order of their binary tags
+# (Michelson_v1_primitives.prim_encoding)
+PRIMITIVE_TAGS = {
+    name: tag
+    for tag, name in enumerate(
+        '''
+        parameter storage code False Elt Left None Pair Right Some True Unit
+        PACK UNPACK BLAKE2B SHA256 SHA512 ABS ADD AMOUNT AND BALANCE CAR CDR
+        CHECK_SIGNATURE COMPARE CONCAT CONS CREATE_ACCOUNT CREATE_CONTRACT
+        IMPLICIT_ACCOUNT DIP DROP DUP EDIV EMPTY_MAP EMPTY_SET EQ EXEC
+        FAILWITH GE GET GT HASH_KEY IF IF_CONS IF_LEFT IF_NONE INT LAMBDA LE
+        LEFT LOOP LSL LSR LT MAP MEM MUL NEG NEQ NIL NONE NOT NOW OR PAIR
+        PUSH RIGHT SIZE SOME SOURCE SENDER SELF STEPS_TO_QUOTA SUB SWAP
+        TRANSFER_TOKENS SET_DELEGATE UNIT UPDATE XOR ITER LOOP_LEFT ADDRESS
+        CONTRACT ISNAT CAST RENAME bool contract int key key_hash lambda list
+        map big_map nat option or pair set signature string bytes mutez
+        timestamp unit operation address SLICE DIG DUG EMPTY_BIG_MAP APPLY
+        chain_id CHAIN_ID LEVEL SELF_ADDRESS never NEVER UNPAIR VOTING_POWER
+        TOTAL_VOTING_POWER KECCAK SHA3 PAIRING_CHECK bls12_381_g1
+        bls12_381_g2 bls12_381_fr sapling_state sapling_transaction
+        SAPLING_EMPTY_STATE SAPLING_VERIFY_UPDATE ticket TICKET READ_TICKET
+        SPLIT_TICKET JOIN_TICKETS GET_AND_UPDATE chest chest_key OPEN_CHEST
+        VIEW view constant
+        '''.split()
+    )
+}
+
+# Tags of manager operations (Operation_repr.Encoding)
+OPERATION_TAGS = {
+    'reveal': 107,
+    'transaction': 108,
+    'origination': 109,
+    'delegation': 110,
+    'register_global_constant': 111,
+}
+
+ENTRYPOINT_TAGS = {
+    'default': 0,
+    'root': 1,
+    'do': 2,
+    'set_delegate': 3,
+    'remove_delegate': 4,
+}
+
+# b58check prefixes, as bytes, and tags of the binary encodings
+PUBLIC_KEY_HASH_PREFIXES = {
+    'tz1': (bytes([6, 161, 159]), 0),
+    'tz2': (bytes([6, 161, 161]), 1),
+    'tz3': (bytes([6, 161, 164]), 2),
+}
+PUBLIC_KEY_PREFIXES = {
+    'edpk': (bytes([13, 15, 37, 217]), 0),
+    'sppk': (bytes([3, 254, 226, 86]), 1),
+    'p2pk': (bytes([3, 178, 139, 217]), 2),
+}
+CONTRACT_HASH_PREFIX = bytes([2, 90, 121])
+BLOCK_HASH_PREFIX = bytes([1, 52])
+OPERATION_HASH_PREFIX = bytes([5, 116])
+ED25519_SEED_PREFIX = bytes([13, 15, 58, 7])
+
+# Watermark of manager operations, see `tezos-client sign bytes`
+GENERIC_WATERMARK = b'\x03'
+
+# Defaults of operations built by `Forger`, large enough for transfers
+# between implicit accounts
+DEFAULT_FEE = 2000
+DEFAULT_GAS_LIMIT = 10600
+DEFAULT_STORAGE_LIMIT = 300
+
+
+class ForgeError(Exception):
+    """Operation that can't be forged, or a local forge different from
+    the node's."""
+
+
+def _sha256(data: bytes) -> bytes:
+    return hashlib.sha256(data).digest()
+
+
+def b58decode(value: str, prefix: bytes) -> bytes:
+    """Payload of b58check string `value`, whose prefix is `prefix`."""
+    decoded = base58check.b58decode(value.encode('ascii'))
+    payload, checksum = decoded[:-4], decoded[-4:]
+    if _sha256(_sha256(payload))[:4] != checksum:
+        raise ForgeError(f'invalid checksum: {value}')
+    if not payload.startswith(prefix):
+        raise ForgeError(f'unexpected prefix: {value}')
+    return payload[len(prefix) :]
+
+
+def b58encode(payload: bytes, prefix: bytes) -> str:
+    prefixed = prefix + payload
+    checksum = _sha256(_sha256(prefixed))[:4]
+    return base58check.b58encode(prefixed + checksum).decode('ascii')
+
+
+def zarith(value: int) -> bytes:
+    """Binary encoding of a natural number (`Data_encoding.n`)."""
+    assert value >= 0, f'negative natural {value}'
+    res = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value == 0:
+            res.append(byte)
+            return bytes(res)
+        res.append(byte | 0x80)
+
+
+def zarith_signed(value: int) -> bytes:
+    """Binary encoding of an integer (`Data_encoding.z`)."""
+    abs_value = abs(value)
+    byte = abs_value & 0x3F
+    if value < 0:
+        byte |= 0x40
+    abs_value >>= 6
+    if abs_value == 0:
+        return bytes([byte])
+    return bytes([byte | 0x80]) + zarith(abs_value)
+
+
+def _dynamic(data: bytes) -> bytes:
+    return len(data).to_bytes(4, 'big') + data
+
+
+def _bool(value: bool) -> bytes:
+    return b'\xff' if value else b'\x00'
+
+
+def public_key_hash(pkh: str) -> bytes:
+    prefix, tag = PUBLIC_KEY_HASH_PREFIXES[pkh[:3]]
+    return bytes([tag]) + b58decode(pkh, prefix)
+
+
+def public_key(key: str) -> bytes:
+    prefix, tag = PUBLIC_KEY_PREFIXES[key[:4]]
+    return bytes([tag]) + b58decode(key, prefix)
+
+
+def contract(address: str) -> bytes:
+    if address.startswith('KT1'):
+        return b'\x01' + b58decode(address, CONTRACT_HASH_PREFIX) + b'\x00'
+    return b'\x00' + public_key_hash(address)
+
+
+def micheline(expr: Any) -> bytes:
+    """Binary encoding of a JSON Micheline expression."""
+    if isinstance(expr, list):
+        return b'\x02' + _dynamic(b''.join(micheline(arg) for arg in expr))
+    if 'int' in expr:
+        return b'\x00' + zarith_signed(int(expr['int']))
+    if 'string' in expr:
+        return b'\x01' + _dynamic(expr['string'].encode())
+    if 'bytes' in expr:
+        return b'\x0a' + _dynamic(bytes.fromhex(expr['bytes']))
+    prim = bytes([PRIMITIVE_TAGS[expr['prim']]])
+    args = expr.get('args', [])
+    annots = expr.get('annots', [])
+    encoded_annots = _dynamic(' '.join(annots).encode()) if annots else b''
+    if len(args) <= 2:
+        tag = 0x03 + 2 * len(args) + (1 if annots else 0)
+        return (
+            bytes([tag])
+            + prim
+            + b''.join(micheline(arg) for arg in args)
+            + encoded_annots
+        )
+    return (
+        b'\x09'
+        + prim
+        + _dynamic(b''.join(micheline(arg) for arg in args))
+        + _dynamic(' '.join(annots).encode())
+    )
+
+
+def entrypoint(name: str) -> bytes:
+    if name in ENTRYPOINT_TAGS:
+        return bytes([ENTRYPOINT_TAGS[name]])
+    encoded = name.encode()
+    assert len(encoded) <= 31, f'entrypoint name too long: {name}'
+    return b'\xff' + bytes([len(encoded)]) + encoded
+
+
+def _optional_pkh(content: Dict[str, Any], field: str) -> bytes:
+    if field not in content:
+        return _bool(False)
+    return _bool(True) + public_key_hash(content[field])
+
+
+def forge_content(content: Dict[str, Any]) -> bytes:
+    """Binary encoding of a manager operation.
+
+    Args:
+        content (dict): the operation, as in the `contents` of RPC
+                        `forge/operations`
+    Returns:
+        The encoded operation. Raises `ForgeError` if its kind isn't
+        supported.
+    """
+    kind = content['kind']
+    if kind not in OPERATION_TAGS:
+        raise ForgeError(f'unsupported operation kind {kind}')
+    res = (
+        bytes([OPERATION_TAGS[kind]])
+        + public_key_hash(content['source'])
+        + zarith(int(content['fee']))
+        + zarith(int(content['counter']))
+        + zarith(int(content['gas_limit']))
+        + zarith(int(content['storage_limit']))
+    )
+    if kind == 'reveal':
+        return res + public_key(content['public_key'])
+    if kind == 'transaction':
+        res += zarith(int(content['amount'])) + contract(content['destination'])
+        parameters = content.get('parameters')
+        if parameters is None:
+            return res + _bool(False)
+        return (
+            res
+            + _bool(True)
+            + entrypoint(parameters['entrypoint'])
+            + _dynamic(micheline(parameters['value']))
+        )
+    if kind == 'origination':
+        script = content['script']
+        return (
+            res
+            + zarith(int(content['balance']))
+            + _optional_pkh(content, 'delegate')
+            + _dynamic(micheline(script['code']))
+            + _dynamic(micheline(script['storage']))
+        )
+    if kind == 'delegation':
+        return res + _optional_pkh(content, 'delegate')
+    # register_global_constant
+    return res + _dynamic(micheline(content['value']))
+
+
+def forge_operation(operation: Dict[str, Any]) -> str:
+    """Hex encoding of an unsigned operation, as returned by RPC
+    `forge/operations`.
+
+    Args:
+        operation (dict): a dict with fields `branch` and `contents`
+    """
+    res = b58decode(operation['branch'], BLOCK_HASH_PREFIX) + b''.join(
+        forge_content(content) for content in operation['contents']
+    )
+    return res.hex()
+
+
+def sign(
+    forged: str, secret_key: str, watermark: bytes = GENERIC_WATERMARK
+) -> str:
+    """Signature (hex) of forged operation `forged`.
+
+    Args:
+        forged (str): hex encoding of the operation
+        secret_key (str): an unencrypted ed25519 secret key, with or
+                          without prefix `unencrypted:`
+        watermark (bytes): the watermark of the signed data, see
+                           `tezos-client sign bytes`
+    """
+    if secret_key.startswith('unencrypted:'):
+        secret_key = secret_key[len('unencrypted:') :]
+    assert secret_key.startswith('edsk'), 'only ed25519 keys are supported'
+    key = bytes.fromhex(utils.b58_key_to_hex(secret_key))
+    return utils.sign(watermark + bytes.fromhex(forged), key)
+
+
+def operation_hash(signed: str) -> str:
+    """b58check hash of signed operation `signed` (hex)."""
+    digest = pyblake2.blake2b(bytes.fromhex(signed), digest_size=32).digest()
+    return b58encode(digest, OPERATION_HASH_PREFIX)
+
+
+class SignedOperation:
+    """An operation, forged and signed."""
+
+    def __init__(self, operation: Dict[str, Any], forged: str, signature: str):
+        """
+        Args:
+            operation (dict): the operation, with fields `branch` and
+                              `contents`
+            forged (str): its hex encoding
+            signature (str): its signature (hex)
+        """
+        self.operation = operation
+        self.forged = forged
+        self.signature = signature
+
+    @property
+    def signed(self) -> str:
+        """Hex encoding of the signed operation, as injected."""
+        return self.forged + self.signature
+
+    @property
+    def hash(self) -> str:
+        return operation_hash(self.signed)
+
+    def preapply_json(self, protocol: str) -> Dict[str, Any]:
+        res = dict(self.operation)
+        res['protocol'] = protocol
+        res['signature'] = utils.hex_sig_to_b58(self.signature)
+        return res
+
+
+class Forger:
+    """Forges, signs and injects operations through a `RpcSession`.
+
+    All RPCs go through the connections kept alive by the session. The
+    head (branch of the operations, protocol and counters) is read once
+    and cached until `refresh` is called.
+    """
+
+    def __init__(
+        self,
+        session: RpcSession,
+        chain: str = 'main',
+        protocol: str = constants.ALPHA,
+        check: bool = False,
+    ):
+        """
+        Args:
+            session (RpcSession): session to the node
+            chain (str): the chain of the operations
+            protocol (str): the protocol of the operations
+            check (bool): check every forged operation against RPC
+                          `forge/operations`
+        """
+        self.session = session
+        self.chain = chain
+        self.protocol = protocol
+        self.check = check
+        self._branch = None  # type: Optional[str]
+        self._counters = {}  # type: Dict[str, int]
+
+    def _rpc(self, verb: str, path: str, data: Any = None) -> Any:
+        response = self.session.call(verb, path, data)
+        response.raise_for_status()
+        return response.json()
+
+    def refresh(self, counters: bool = True) -> None:
+        """Forget the cached branch and, if `counters`, the counters."""
+        self._branch = None
+        if counters:
+            self._counters = {}
+
+    def forget_counter(self, source: str) -> None:
+        """Read the counter of `source` from the node again, e.g. after an
+        operation of `source` was refused."""
+        self._counters.pop(source, None)
+
+    def branch(self) -> str:
+        if self._branch is None:
+            self._branch = self._rpc(
+                'get', f'/chains/{self.chain}/blocks/head/hash'
+            )
+        return self._branch
+
+    def next_counter(self, source: str) -> int:
+        """Counter of the next operation of `source`."""
+        if source not in self._counters:
+            self._counters[source] = int(
+                self._rpc(
+                    'get',
+                    f'/chains/{self.chain}/blocks/head/context/contracts/'
+                    f'{source}/counter',
+                )
+            )
+        self._counters[source] += 1
+        return self._counters[source]
+
+    def forge(self, operation: Dict[str, Any]) -> str:
+        """Hex encoding of `operation`, see `forge_operation`."""
+        forged = forge_operation(operation)
+        if self.check:
+            expected = self._rpc(
+                'post',
+                f'/chains/{self.chain}/blocks/head/helpers/forge/operations',
+                operation,
+            )
+            if forged != expected:
+                raise ForgeError(
+                    f'forged {forged}, node forged {expected}: {operation}'
+                )
+        return forged
+
+    def sign(
+        self, contents: List[Dict[str, Any]], secret_key: str
+    ) -> SignedOperation:
+        """Forge and sign an operation of the current branch.
+
+        Args:
+            contents (list): the manager operations, of a single source
+            secret_key (str): the secret key of the source
+        """
+        operation = {'branch': self.branch(), 'contents': contents}
+        forged = self.forge(operation)
+        return SignedOperation(operation, forged, sign(forged, secret_key))
+
+    def content(
+        self,
+        kind: str,
+        source: str,
+        fee: int = DEFAULT_FEE,
+        gas_limit: int = DEFAULT_GAS_LIMIT,
+        storage_limit: int = DEFAULT_STORAGE_LIMIT,
+        **fields: Any,
+    ) -> Dict[str, Any]:
+        """A manager operation of `source`, with its next counter.
+
+        Args:
+            kind (str): e.g. `transaction`
+            source (str): the pkh of the source
+            fields: fields specific to `kind`, e.g. `destination`
+        """
+        return {
+            'kind': kind,
+            'source': source,
+            'fee': str(fee),
+            'counter': str(self.next_counter(source)),
+            'gas_limit': str(gas_limit),
+            'storage_limit': str(storage_limit),
+            **fields,
+        }
+
+    def transfers(
+        self,
+        source: str,
+        secret_key: str,
+        transfers: Sequence[Tuple[str, int]],
+        fee: int = DEFAULT_FEE,
+        gas_limit: int = DEFAULT_GAS_LIMIT,
+        storage_limit: int = DEFAULT_STORAGE_LIMIT,
+    ) -> List[SignedOperation]:
+        """One signed transaction per transfer, with successive counters.
+
+        Args:
+            source (str): the pkh of the sender, which must be revealed
+            secret_key (str): its secret key
+            transfers (list): pairs (destination, amount in mutez)
+        """
+        return [
+            self.sign(
+                [
+                    self.content(
+                        'transaction',
+                        source,
+                        fee,
+                        gas_limit,
+                        storage_limit,
+                        amount=str(amount),
+                        destination=destination,
+                    )
+                ],
+                secret_key,
+            )
+            for destination, amount in transfers
+        ]
+
+    def preapply(self, operations: List[SignedOperation]) -> List[dict]:
+        """Preapply `operations` in one call, in order.
+
+        Returns:
+            The results of RPC `preapply/operations`. Raises `ForgeError`
+            if any operation isn't applied.
+        """
+        results = self._rpc(
+            'post',
+            f'/chains/{self.chain}/blocks/head/helpers/preapply/operations',
+            [
+                operation.preapply_json(self.protocol)
+                for operation in operations
+            ],
+        )
+        for operation, result in zip(operations, results):
+            for content in result['contents']:
+                status = content['metadata']['operation_result']['status']
+                if status != 'applied':
+                    raise ForgeError(
+                        f'{operation.operation} not applied: {content}'
+                    )
+        return results
+
+    def inject(
+        self, operations: List[SignedOperation], is_async: bool = False
+    ) -> List[str]:
+        """Inject `operations`, in order, over the connections of the
+        session.
+
+        Args:
+            operations (list): signed operations
+            is_async (bool): don't wait for the node to validate each
+                             operation before injecting the next one
+        Returns:
+            The hashes of the operations.
+        """
+        path = f'/injection/operation?chain={self.chain}'
+        if is_async:
+            path += '&async'
+        return [
+            self._rpc('post', path, operation.signed)
+            for operation in operations
+        ]
@@ -0,0 +1,128 @@
+"""Generation of legacy stores, cached across test sessions.
+
+`legacy_store_maker` bakes `batch` blocks with `legacy_store_builder` and
+writes, in a data dir:
+
+    archive_store_to_upgrade/
+    full_store_to_upgrade/
+    rolling_store_to_upgrade/
+    snapshot_from_archive_storage.full   # and other snapshots, if
+    ...                                  # `export_snapshots`
+
+Generating them takes a while and gives the same stores for the same
+inputs, so `generate` keeps a copy of each generated data dir in
+`CACHE_DIR`, keyed by the content hashes of both binaries, `batch` and
+`export_snapshots`. Later sessions copy it instead of generating it.
+Whenever the binaries change (e.g. they are rebuilt), the entries of
+their previous versions are evicted.
+
+Data dirs are copied with `chain_templates.copy_data_dir`, which clones
+files where the file system allows it: tests upgrade the stores in place.
+"""
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+
+from daemons.node_cache import binary_hash, digest
+from launchers.chain_templates import copy_data_dir
+
+# Root dir of the cache, can be overridden by the environment
+CACHE_DIR = os.environ.get(
+    'TEZOS_LEGACY_STORE_CACHE',
+    os.path.join(tempfile.gettempdir(), f'tezos-legacy-stores-{os.getuid()}'),
+)
+
+BUILD_DIR = '_build/'
+BUILDER_PATH = 'src/lib_store/legacy_store/legacy_store_builder.exe'
+MAKER_PATH = 'src/lib_store/test/legacy_store_maker.exe'
+
+
+def _entry(builder_bin: str, maker_bin: str, batch: int, snapshots: bool):
+    """Cache entry of the stores generated by the binaries with `batch`
+    and `snapshots`, after eviction of the entries of their previous
+    versions."""
+    params_dir = os.path.join(
+        CACHE_DIR,
+        digest(
+            json.dumps(
+                [
+                    os.path.realpath(builder_bin),
+                    os.path.realpath(maker_bin),
+                    batch,
+                    snapshots,
+                ]
+            )
+        ),
+    )
+    version = digest(binary_hash(builder_bin) + binary_hash(maker_bin))
+    if os.path.isdir(params_dir):
+        for other in os.listdir(params_dir):
+            if other != version and not other.startswith('.'):
+                shutil.rmtree(
+                    os.path.join(params_dir, other), ignore_errors=True
+                )
+    os.makedirs(params_dir, exist_ok=True)
+    return os.path.join(params_dir, version)
+
+
+def build(home: str) -> None:
+    """Build the legacy store builder and maker, if needed."""
+    for path in [BUILDER_PATH, MAKER_PATH]:
+        subprocess.run(
+            ['dune', 'build', '--build-dir', f'{home}{BUILD_DIR}', path],
+            check=True,
+            cwd=home,
+        )
+
+
+def generate(
+    home: str,
+    data_dir: str,
+    batch: int,
+    export_snapshots: bool,
+    use_cache: bool = True,
+) -> None:
+    """Generate the legacy stores of `batch` blocks in existing dir
+    `data_dir`, and their snapshots if `export_snapshots`.
+
+    Args:
+        home (str): root of the Tezos sources, ending with `/`
+        data_dir (str): dir of the stores
+        batch (int): number of blocks to bake
+        export_snapshots (bool): export snapshots of the stores
+        use_cache (bool): copy the stores from the cache if possible,
+                          and cache them otherwise
+    """
+    build(home)
+    builder_bin = f'{home}{BUILD_DIR}default/{BUILDER_PATH}'
+    maker_bin = f'{home}{BUILD_DIR}default/{MAKER_PATH}'
+    entry = None
+    if use_cache:
+        entry = _entry(builder_bin, maker_bin, batch, export_snapshots)
+        if os.path.isdir(entry):
+            copy_data_dir(entry, data_dir)
+            print(f'# legacy stores of {data_dir} copied from {entry}')
+            return
+    subprocess.run(
+        [
+            maker_bin,
+            data_dir,
+            builder_bin,
+            str(batch),
+            str(export_snapshots).lower(),
+        ],
+        check=True,
+        cwd=home,
+    )
+    if entry is not None:
+        # concurrent sessions may share the cache, the entry appears
+        # atomically, complete
+        tmp_dir = tempfile.mkdtemp(prefix='.', dir=os.path.dirname(entry))
+        copy_data_dir(data_dir, tmp_dir)
+        try:
+            os.rename(tmp_dir, entry)
+        except OSError:
+            # another session cached the same stores first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
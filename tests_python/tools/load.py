@@ -0,0 +1,328 @@
+"""Load generation: transfers injected at a target rate by many accounts.
+
+A `LoadGenerator` funds fresh accounts from bootstrap accounts, then
+injects transfers from all of them concurrently, at a target rate, with
+operations forged and signed locally (see `forge.Forger`). Typical use,
+in a test with a node and a baker (or manual baking):
+
+    load = LoadGenerator(sandbox.client(0), num_accounts=50)
+    load.fund()
+    utils.bake(client)  # include the funding operations
+    report = load.run(rate=100, duration=30)
+    print(report.summary())
+
+Sources are split between the workers, so that each source is only used
+by one worker, which keeps track of its counter. The first operation of a
+source also reveals its public key.
+"""
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+from client.client import Client
+from client.rpc_session import RpcSession
+from . import constants, forge, wallet
+
+FUNDERS = [f'bootstrap{i}' for i in range(1, 6)]
+# Balance of the generated accounts (mutez)
+FUNDING = 100_000_000
+# Amount of the generated transfers (mutez)
+AMOUNT = 1
+# Fee, gas and storage limits of reveals and transfers, funded accounts
+# already exist so transfers don't burn storage
+FEE = 1500
+GAS_LIMIT = 2000
+STORAGE_LIMIT = 0
+# Interval (sec) between two samples of the mempool
+SAMPLE_INTERVAL = 0.5
+# Max age (sec) of the branch of the generated operations
+BRANCH_TTL = 10.0
+
+
+class Account:
+    """A generated account, and the state of its operations."""
+
+    def __init__(self, pkh: str, public_key: str, secret_key: str):
+        self.pkh = pkh
+        self.public_key = public_key
+        self.secret_key = secret_key
+        self.revealed = False
+
+
+class LoadReport:
+    """Measures of a run of a `LoadGenerator`."""
+
+    def __init__(self, start_level: int):
+        """
+        Args:
+            start_level (int): level of the head at the start of the run
+        """
+        self.start_level = start_level
+        self.duration = 0.0
+        self.injected = []  # type: List[str]
+        self.failed = 0
+        # (time since start (sec), applied ops, all pending ops)
+        self.mempool = []  # type: List[Tuple[float, int, int]]
+        # (level, manager ops in the block, injected ops in the block)
+        self.blocks = []  # type: List[Tuple[int, int, int]]
+
+    def injection_rate(self) -> float:
+        """Sustained injection rate (ops/sec)."""
+        return len(self.injected) / self.duration if self.duration else 0.0
+
+    def included(self) -> int:
+        return sum(injected for _level, _ops, injected in self.blocks)
+
+    def ops_per_block(self) -> float:
+        """Mean number of injected operations per block baked during and
+        after the run."""
+        return self.included() / len(self.blocks) if self.blocks else 0.0
+
+    def max_pending(self) -> int:
+        return max((pending for _t, _a, pending in self.mempool), default=0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'duration_s': self.duration,
+            'injected': len(self.injected),
+            'failed': self.failed,
+            'injection_ops_per_s': self.injection_rate(),
+            'max_pending': self.max_pending(),
+            'blocks': len(self.blocks),
+            'included': self.included(),
+            'ops_per_block': self.ops_per_block(),
+        }
+
+    def summary(self) -> str:
+        return (
+            f'{len(self.injected)} operations injected in '
+            f'{self.duration:.1f}s ({self.injection_rate():.1f} ops/s), '
+            f'{self.failed} failed, max {self.max_pending()} pending, '
+            f'{self.included()} included in {len(self.blocks)} blocks '
+            f'({self.ops_per_block():.1f} ops/block)'
+        )
+
+
+def _pending(pending_operations: dict) -> Tuple[int, int]:
+    applied = len(pending_operations.get('applied', []))
+    total = applied + sum(
+        len(ops)
+        for kind, ops in pending_operations.items()
+        if kind != 'applied' and isinstance(ops, list)
+    )
+    return applied, total
+
+
+class LoadGenerator:
+    """Transfers between generated accounts, at a target rate."""
+
+    def __init__(
+        self,
+        client: Client,
+        num_accounts: int,
+        workers: int = 8,
+        funders: List[str] = None,
+    ):
+        """
+        Args:
+            client (Client): client of the node the operations are
+                             injected to
+            num_accounts (int): number of generated accounts
+            workers (int): number of concurrent injections
+            funders (list): names of the bootstrap accounts funding the
+                            generated accounts, default `FUNDERS`
+        """
+        assert client.endpoint is not None, 'client has no endpoint'
+        assert num_accounts >= 2
+        self.endpoint = client.endpoint
+        self.workers = min(workers, num_accounts)
+        self.funders = FUNDERS if funders is None else funders
+        self.accounts = []  # type: List[Account]
+        for _ in range(num_accounts):
+            key = wallet.Key.generate()
+            self.accounts.append(
+                Account(key.pkh, key.public_key, key.secret_key)
+            )
+
+    def fund(self) -> List[str]:
+        """Inject the transfers funding the generated accounts.
+
+        Returns:
+            The hashes of the funding operations, which must be included
+            in a block before calling `run`.
+        """
+        session = RpcSession(self.endpoint)
+        forger = forge.Forger(session)
+        hashes = []
+        try:
+            for i, funder in enumerate(self.funders):
+                identity = constants.IDENTITIES[funder]
+                accounts = self.accounts[i :: len(self.funders)]
+                operations = forger.transfers(
+                    identity['identity'],
+                    identity['secret'],
+                    [(account.pkh, FUNDING) for account in accounts],
+                )
+                hashes += forger.inject(operations)
+        finally:
+            session.close()
+        return hashes
+
+    def run(self, rate: float, duration: float) -> LoadReport:
+        """Inject transfers at `rate` operations/sec for `duration` sec.
+
+        Each worker cycles through its sources, the destination of a
+        transfer is the next generated account. Refused operations are
+        counted as failed, and the counter of their source is read again.
+        Other errors of a worker stop the run, and are raised once all
+        workers are done.
+
+        Returns:
+            The report of the run. Its blocks are the blocks baked since
+            the start of the run.
+        """
+        assert rate > 0
+        session = RpcSession(self.endpoint)
+        head = session.call('get', '/chains/main/blocks/head/header').json()
+        report = LoadReport(int(head['level']))
+        lock = threading.Lock()
+        done = threading.Event()
+        slots = iter(range(int(rate * duration)))
+        # unexpected errors of the workers, raised by `run`
+        errors = []  # type: List[Exception]
+        start = time.monotonic()
+
+        def next_slot() -> Optional[float]:
+            # time of the next injection, None when the run is over
+            with lock:
+                slot = None if errors else next(slots, None)
+            return None if slot is None else start + slot / rate
+
+        def inject(worker: int) -> None:
+            worker_session = RpcSession(self.endpoint, pool_size=1)
+            forger = forge.Forger(worker_session)
+            sources = list(range(worker, len(self.accounts), self.workers))
+            branch_time = time.monotonic()
+            i = 0
+            try:
+                while True:
+                    slot = next_slot()
+                    if slot is None:
+                        return
+                    time.sleep(max(0.0, slot - time.monotonic()))
+                    if time.monotonic() - branch_time > BRANCH_TTL:
+                        forger.refresh(counters=False)
+                        branch_time = time.monotonic()
+                    source = sources[i % len(sources)]
+                    i += 1
+                    self._inject_transfer(
+                        forger,
+                        self.accounts[source],
+                        self.accounts[(source + 1) % len(self.accounts)],
+                        report,
+                        lock,
+                    )
+            except Exception as exc:  # pylint: disable=broad-except
+                with lock:
+                    errors.append(exc)
+            finally:
+                worker_session.close()
+
+        def sample() -> None:
+            while not done.wait(SAMPLE_INTERVAL):
+                try:
+                    pending = session.call(
+                        'get', '/chains/main/mempool/pending_operations'
+                    ).json()
+                except requests.RequestException:
+                    continue
+                report.mempool.append(
+                    (time.monotonic() - start,) + _pending(pending)
+                )
+
+        threads = [
+            threading.Thread(target=inject, args=(worker,), daemon=True)
+            for worker in range(self.workers)
+        ]
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        report.duration = time.monotonic() - start
+        done.set()
+        sampler.join()
+        session.close()
+        if errors:
+            raise errors[0]
+        self.count_blocks(report)
+        print(f'# {report.summary()}')
+        return report
+
+    @staticmethod
+    def _inject_transfer(
+        forger: forge.Forger,
+        source: Account,
+        destination: Account,
+        report: LoadReport,
+        lock: threading.Lock,
+    ) -> None:
+        try:
+            contents = []
+            if not source.revealed:
+                contents.append(
+                    forger.content(
+                        'reveal',
+                        source.pkh,
+                        FEE,
+                        GAS_LIMIT,
+                        STORAGE_LIMIT,
+                        public_key=source.public_key,
+                    )
+                )
+            contents.append(
+                forger.content(
+                    'transaction',
+                    source.pkh,
+                    FEE,
+                    GAS_LIMIT,
+                    STORAGE_LIMIT,
+                    amount=str(AMOUNT),
+                    destination=destination.pkh,
+                )
+            )
+            operation = forger.sign(contents, source.secret_key)
+            forger.inject([operation])
+        except requests.RequestException:
+            # refused by the node, or the node can't be reached
+            forger.forget_counter(source.pkh)
+            with lock:
+                report.failed += 1
+            return
+        source.revealed = True
+        with lock:
+            report.injected.append(operation.hash)
+
+    def count_blocks(self, report: LoadReport) -> None:
+        """Count the injected operations of the blocks baked since the
+        start of the run of `report`, e.g. again after baking the
+        operations still pending at the end of the run."""
+        session = RpcSession(self.endpoint)
+        injected = set(report.injected)
+        report.blocks = []
+        try:
+            head = session.call('get', '/chains/main/blocks/head/header')
+            for level in range(
+                report.start_level + 1, int(head.json()['level']) + 1
+            ):
+                hashes = session.call(
+                    'get', f'/chains/main/blocks/{level}/operation_hashes/3'
+                ).json()
+                report.blocks.append(
+                    (level, len(hashes), len(injected.intersection(hashes)))
+                )
+        finally:
+            session.close()
@@ -0,0 +1,144 @@
+"""Incremental search of patterns in growing log files.
+
+`utils.check_logs` is called repeatedly on the logs of long-lived nodes
+and daemons. A `LogIndex` remembers, for each file and pattern, the
+offset up to which the file was scanned and the matching lines found so
+far, so that each check only scans the bytes appended since the previous
+one.
+
+A line matches a pattern iff `re.search(pattern, line)` does, as when
+reading the file line by line. New bytes are memory-mapped, and searched
+in one go with the pattern compiled in multiline mode; each candidate
+match is then checked against its own line.
+"""
+import mmap
+import os
+import re
+import threading
+from typing import Dict, List, Pattern, Tuple
+
+
+class _Scan:
+    """Scan state of a file, for a pattern."""
+
+    def __init__(self, file_id: Tuple[int, int]):
+        self.file_id = file_id
+        # end of the last complete line scanned
+        self.offset = 0
+        self.matches = []  # type: List[str]
+
+
+def _file_id(stat: os.stat_result) -> Tuple[int, int]:
+    return (stat.st_dev, stat.st_ino)
+
+
+def _matching_lines(
+    text: str, pattern: Pattern, line_pattern: Pattern
+) -> List[str]:
+    res = []
+    pos = 0
+    while True:
+        match = pattern.search(text, pos)
+        if match is None:
+            return res
+        start = text.rfind('\n', 0, match.start()) + 1
+        end = text.find('\n', match.start())
+        end = len(text) if end == -1 else end + 1
+        line = text[start:end]
+        # the match may span several lines, or depend on its context
+        if line_pattern.search(line):
+            res.append(line)
+        pos = end
+        if pos >= len(text):
+            return res
+
+
+class LogIndex:
+    """Matching lines of log files, updated incrementally.
+
+    Typical use.
+
+    index = LogIndex()
+    index.search(['node.log'], r'Uncaught')  # scans the whole file
+    index.search(['node.log'], r'Uncaught')  # only scans new lines
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._patterns = {}  # type: Dict[str, Tuple[Pattern, Pattern]]
+        self._scans = {}  # type: Dict[Tuple[str, str], _Scan]
+
+    def _compile(self, pattern: str) -> Tuple[Pattern, Pattern]:
+        if pattern not in self._patterns:
+            self._patterns[pattern] = (
+                re.compile(pattern, re.MULTILINE),
+                re.compile(pattern),
+            )
+        return self._patterns[pattern]
+
+    def _update(self, path: str, pattern: str) -> List[str]:
+        """Matching lines of file `path`, including a last line not
+        terminated yet."""
+        multiline, line_pattern = self._compile(pattern)
+        try:
+            file = open(path, 'rb')
+        except FileNotFoundError:
+            return []
+        with file:
+            stat = os.fstat(file.fileno())
+            scan = self._scans.get((path, pattern))
+            if (
+                scan is None
+                or scan.file_id != _file_id(stat)
+                or stat.st_size < scan.offset
+            ):
+                # new, replaced or truncated file
+                scan = _Scan(_file_id(stat))
+                self._scans[(path, pattern)] = scan
+            if stat.st_size == scan.offset:
+                return scan.matches
+            with mmap.mmap(
+                file.fileno(), stat.st_size, access=mmap.ACCESS_READ
+            ) as data:
+                last_newline = data.rfind(b'\n', scan.offset)
+                if last_newline != -1:
+                    chunk = data[scan.offset : last_newline + 1]
+                    scan.matches.extend(
+                        _matching_lines(
+                            chunk.decode(errors='replace'),
+                            multiline,
+                            line_pattern,
+                        )
+                    )
+                    scan.offset = last_newline + 1
+                tail = data[scan.offset :].decode(errors='replace')
+        # the last line may still be written, don't index it
+        if tail and line_pattern.search(tail):
+            return scan.matches + [tail]
+        return scan.matches
+
+    def search(self, paths: List[str], pattern: str) -> Dict[str, List[str]]:
+        """Lines of files `paths` matching regexp `pattern`.
+
+        Args:
+            paths (list): paths of the files
+            pattern (str): a regexp, as accepted by `re.search`
+        Returns:
+            The matching lines of each file, in order, if any.
+        """
+        res = {}
+        with self._lock:
+            for path in paths:
+                matches = self._update(path, pattern)
+                if matches:
+                    res[path] = list(matches)
+        return res
+
+    def clear(self) -> None:
+        """Forget all files."""
+        with self._lock:
+            self._scans.clear()
+
+
+# Shared by `utils.check_logs` and `utils.check_logs_counts`
+LOG_INDEX = LogIndex()
@@ -0,0 +1,242 @@
+"""Performance metrics extracted from the logs of nodes and bakers.
+
+Logs are the files of `Sandbox.logs`, written when the sandbox has a log
+dir. Lines have the form `<date> - <section>: <message>`; the metrics are:
+
+- block validation times (ms), from the status of the requests of the
+  block validator (`validator.block: ... completed in 3.2ms`),
+- prevalidator request times (ms), e.g. applying an injected operation,
+  from the status of the requests of the prevalidator,
+- numbers of operations of the blocks injected by bakers
+  (`injected block ... operations [...]`).
+
+Typical use, in a test.
+
+    metrics = log_metrics.collect(sandbox.logs)
+    validation = metrics['node0'].block_validation
+    assert validation.percentile(99) < 1000
+"""
+import math
+import os
+import re
+from typing import Dict, List, Optional
+
+# Matches a log line, as formatted by the default Lwt_log template
+LINE = re.compile(r'^(?P<date>.*?) - (?P<section>[\w.\-]+): (?P<message>.*)$')
+COMPLETED = re.compile(r'completed in (?P<duration>\S+)')
+# Ptime span components: 1min3s, 2.5ms, 12us...
+DURATION_PART = re.compile(r'(\d+(?:\.\d*)?)(ns|us|μs|µs|ms|s|min|h|d)')
+VALIDATED = re.compile(r'block (?P<block>\w+) successfully validated')
+VALIDATION_FAILED = re.compile(r'validation of block (?P<block>\w+) failed')
+INJECTED = re.compile(
+    r'injected block (?P<block>\w+) for .*\(level (?P<level>\d+),'
+)
+# Operations are printed as JSON objects, all having a `branch` field
+BRANCH = re.compile(r'"branch"')
+# File name of the log of a daemon, e.g. node0_3.txt, baker-alpha_0_#4.txt
+LOG_FILE = re.compile(r'^(?P<daemon>.*?)_#?\d+\.txt$')
+
+UNITS_MS = {
+    'ns': 1e-6,
+    'us': 1e-3,
+    'μs': 1e-3,
+    'µs': 1e-3,
+    'ms': 1.0,
+    's': 1e3,
+    'min': 60e3,
+    'h': 3600e3,
+    'd': 86400e3,
+}
+
+
+def parse_duration(duration: str) -> float:
+    """Duration in ms of a time span, as printed by the node.
+
+    Args:
+        duration (str): e.g. `3.2ms`, `1.05s` or `1min2s`
+    Returns:
+        The duration in ms.
+    """
+    parts = DURATION_PART.findall(duration)
+    assert parts, f'invalid duration {duration}'
+    return sum(float(value) * UNITS_MS[unit] for value, unit in parts)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentile `pct` of `values`, by linear interpolation between the
+    closest ranks (as numpy's default)."""
+    assert values, 'no value'
+    assert 0 <= pct <= 100, f'invalid percentile {pct}'
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+class Sample:
+    """A value logged at some date."""
+
+    def __init__(
+        self,
+        date: str,
+        value: float,
+        block: Optional[str] = None,
+        level: Optional[int] = None,
+    ):
+        self.date = date
+        self.value = value
+        self.block = block
+        self.level = level
+
+    def __repr__(self) -> str:
+        return f'Sample({self.date!r}, {self.value!r}, {self.block!r})'
+
+
+class Series:
+    """A time series of samples, in the order of the logs."""
+
+    def __init__(self, name: str, unit: str):
+        self.name = name
+        self.unit = unit
+        self.samples = []  # type: List[Sample]
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    def values(self) -> List[float]:
+        return [sample.value for sample in self.samples]
+
+    def percentile(self, pct: float) -> float:
+        return percentile(self.values(), pct)
+
+    def p50(self) -> float:
+        return self.percentile(50)
+
+    def p99(self) -> float:
+        return self.percentile(99)
+
+    def max(self) -> float:
+        return max(self.values())
+
+    def summary(self) -> str:
+        if not self.samples:
+            return f'{self.name}: no sample'
+        return (
+            f'{self.name}: {len(self)} samples, p50 {self.p50():.2f}'
+            f'{self.unit}, p99 {self.p99():.2f}{self.unit}, '
+            f'max {self.max():.2f}{self.unit}'
+        )
+
+
+class LogMetrics:
+    """Metrics of the logs of a daemon."""
+
+    def __init__(self):
+        self.block_validation = Series('block validation', 'ms')
+        self.prevalidator = Series('prevalidator request', 'ms')
+        self.operations_per_block = Series('operations per block', '')
+        # block of the last block validator event
+        self._validated = None  # type: Optional[str]
+        self._validation_failed = False
+        # last block injected, and its operations counted so far
+        self._injected = None  # type: Optional[Sample]
+        self._injected_section = None  # type: Optional[str]
+
+    def _end_injected(self) -> None:
+        if self._injected is not None:
+            self.operations_per_block.samples.append(self._injected)
+            self._injected = None
+
+    def add_line(self, line: str) -> None:
+        match = LINE.match(line.rstrip('\n'))
+        if match is None:
+            return
+        date, section, message = match.group('date', 'section', 'message')
+        if self._injected is not None:
+            # operations are printed on the following lines of the event
+            if section == self._injected_section and not message[:1].isalpha():
+                self._injected.value += len(BRANCH.findall(message))
+                return
+            self._end_injected()
+        injected = INJECTED.search(message)
+        if injected is not None:
+            self._injected = Sample(
+                date,
+                len(BRANCH.findall(message)),
+                injected.group('block'),
+                int(injected.group('level')),
+            )
+            self._injected_section = section
+            return
+        if section == 'validator.block':
+            self._add_validator_line(date, message)
+        elif section.startswith('prevalidator'):
+            completed = COMPLETED.search(message)
+            if completed is not None:
+                self.prevalidator.samples.append(
+                    Sample(date, parse_duration(completed.group('duration')))
+                )
+
+    def _add_validator_line(self, date: str, message: str) -> None:
+        validated = VALIDATED.search(message)
+        if validated is not None:
+            self._validated = validated.group('block')
+            self._validation_failed = False
+        elif VALIDATION_FAILED.search(message) is not None:
+            self._validated = None
+            self._validation_failed = True
+        completed = COMPLETED.search(message)
+        if completed is None:
+            return
+        if not self._validation_failed:
+            self.block_validation.samples.append(
+                Sample(
+                    date,
+                    parse_duration(completed.group('duration')),
+                    self._validated,
+                )
+            )
+        self._validated = None
+        self._validation_failed = False
+
+    def add_file(self, path: str) -> None:
+        with open(path, 'r', errors='replace') as stream:
+            for line in stream:
+                self.add_line(line)
+        self._end_injected()
+
+    def summary(self) -> str:
+        return '\n'.join(
+            series.summary()
+            for series in [
+                self.block_validation,
+                self.prevalidator,
+                self.operations_per_block,
+            ]
+        )
+
+
+def daemon_name(path: str) -> str:
+    """Name of the daemon writing log file `path`, e.g. `node0`."""
+    base = os.path.basename(path)
+    match = LOG_FILE.match(base)
+    return base if match is None else match.group('daemon')
+
+
+def collect(logs: List[str]) -> Dict[str, LogMetrics]:
+    """Metrics of log files, by daemon.
+
+    Args:
+        logs (list): paths of log files, e.g. `sandbox.logs`. Files of
+                     successive runs of a daemon are aggregated, in order.
+    Returns:
+        A dict mapping daemon names (`node0`, `baker-<proto>_0`...) to
+        their metrics.
+    """
+    res = {}  # type: Dict[str, LogMetrics]
+    for path in logs:
+        if not os.path.isfile(path):
+            continue
+        res.setdefault(daemon_name(path), LogMetrics()).add_file(path)
+    return res
@@ -0,0 +1,101 @@
+"""Reservation of port ranges, so that sandboxes of concurrent test
+sessions can run on the same host.
+
+A sandbox derives the ports of its nodes from a base RPC port and a base
+P2P port. With fixed bases, two test sessions on one host compete for the
+same ports. `reserve` hands out disjoint ranges instead:
+
+    with ports.reserve(10) as port_range:
+        rpc_port = port_range.rpc + node_id
+        p2p_port = port_range.p2p + node_id
+
+Range `i` starts at `BASE_PORT + 2 * RANGE_SIZE * i` (RPC), followed by
+its P2P ports. A range is held by an exclusive lock on file `<i>.lock` of
+`LOCK_DIR`, shared by all sessions of the host. The lock is released by
+`PortRange.release`, or by the system when the process exits, so that
+ranges of crashed sessions aren't lost. Ranges whose ports are in use by
+other programs are skipped.
+"""
+import fcntl
+import os
+import socket
+import tempfile
+from typing import IO, Optional
+
+# Directory of the lock files, can be overridden by the environment
+LOCK_DIR = os.environ.get(
+    'TEZOS_PORTS_LOCK_DIR', os.path.join(tempfile.gettempdir(), 'tezos-ports')
+)
+
+BASE_PORT = 18730
+
+# Number of RPC (resp. P2P) ports of a range
+RANGE_SIZE = 100
+
+# Ranges end below 32768, the first ephemeral port on Linux
+MAX_RANGES = 70
+
+
+class PortRange:
+    """Ports `rpc + i` and `p2p + i`, for `0 <= i < size`, reserved until
+    `release`."""
+
+    def __init__(self, index: int, size: int, lock_file: IO):
+        self.index = index
+        self.size = size
+        self.rpc = BASE_PORT + 2 * RANGE_SIZE * index
+        self.p2p = self.rpc + RANGE_SIZE
+        self._lock_file = lock_file  # type: Optional[IO]
+
+    def release(self) -> None:
+        if self._lock_file is not None:
+            # closing the file releases the lock
+            self._lock_file.close()
+            self._lock_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def is_free(port: int) -> bool:
+    """Whether a server could listen on `port` of localhost."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.bind(('127.0.0.1', port))
+        except OSError:
+            return False
+        return True
+
+
+def reserve(size: int = RANGE_SIZE) -> PortRange:
+    """Reserve the first range that isn't reserved by another sandbox, of
+    this process or another one, and whose first `size` RPC and P2P ports
+    are free.
+
+    Args:
+        size (int): number of ports of each kind needed, at most
+                    `RANGE_SIZE`
+    """
+    assert 1 <= size <= RANGE_SIZE
+    os.makedirs(LOCK_DIR, exist_ok=True)
+    for index in range(MAX_RANGES):
+        lock_file = open(os.path.join(LOCK_DIR, f'{index}.lock'), 'a')
+        try:
+            # locks of distinct open files exclude each other, even in
+            # the same process
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            continue
+        port_range = PortRange(index, size, lock_file)
+        if all(
+            is_free(port_range.rpc + i) and is_free(port_range.p2p + i)
+            for i in range(size)
+        ):
+            return port_range
+        port_range.release()
+    assert False, f'no free range of {size} ports, see {LOCK_DIR}'
@@ -0,0 +1,214 @@
+"""Resource usage of processes, sampled from `/proc` (Linux only).
+
+A `Sampler` thread reads the statistics of a changing set of processes
+every `interval` seconds: CPU usage, resident memory, open file
+descriptors and disk I/O. Samples are kept in memory and optionally
+written as CSV, one line per process and sample:
+
+    time,process,pid,cpu,rss,fds,read,write
+    1.00,node 0,4242,12.0,85312,31,0,4096
+
+`time` is in seconds since the start of the sampler, `cpu` in percent of
+a core since the previous sample, `rss` in KiB, `read` and `write` in
+KiB read from and written to disk since the start of the process.
+
+    sampler = resources.Sampler(processes, 0.5, 'resources.csv')
+    sampler.start()
+    ...
+    sampler.stop()
+    print(sampler.summary()['node 0'].peak['rss'])
+
+where `processes()` returns the processes to sample by name, see also
+`Sandbox.start_sampler`.
+"""
+import os
+import subprocess
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+METRICS = ['cpu', 'rss', 'fds', 'read', 'write']
+
+# Default delay between two samples, in seconds
+INTERVAL = 1.0
+
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+
+class Sample:
+    """Statistics of process `pid` at `time`, see module doc for units."""
+
+    def __init__(self, time_: float, pid: int):
+        self.time = time_
+        self.pid = pid
+        # cumulated CPU time, in seconds
+        self.cpu_time = 0.0
+        self.cpu = 0.0
+        self.rss = 0
+        self.fds = 0
+        self.read = 0
+        self.write = 0
+
+
+def read_sample(pid: int, time_: float) -> Optional[Sample]:
+    """Statistics of process `pid`, None if it has exited.
+
+    `cpu` is left to 0, it depends on the previous sample."""
+    sample = Sample(time_, pid)
+    try:
+        with open(f'/proc/{pid}/stat') as file:
+            # the command name, in parentheses, can contain spaces
+            fields = file.read().rsplit(')', 1)[1].split()
+        # fields 14 (utime), 15 (stime) and 24 (rss) of proc(5)
+        sample.cpu_time = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+        sample.rss = int(fields[21]) * PAGE_SIZE // 1024
+        sample.fds = len(os.listdir(f'/proc/{pid}/fd'))
+    except (FileNotFoundError, ProcessLookupError):
+        return None
+    try:
+        with open(f'/proc/{pid}/io') as file:
+            io_stats = dict(line.split(': ') for line in file)
+        sample.read = int(io_stats['read_bytes']) // 1024
+        sample.write = int(io_stats['write_bytes']) // 1024
+    except (FileNotFoundError, ProcessLookupError, PermissionError):
+        # I/O accounting may be disabled in the kernel
+        pass
+    return sample
+
+
+class Summary:
+    """Peak and mean of each metric of a process, by metric name."""
+
+    def __init__(self, samples: List[Sample]):
+        assert samples
+        self.samples = len(samples)
+        self.peak = {
+            metric: max(getattr(sample, metric) for sample in samples)
+            for metric in METRICS
+        }  # type: Dict[str, float]
+        self.mean = {
+            metric: sum(getattr(sample, metric) for sample in samples)
+            / len(samples)
+            for metric in METRICS
+        }  # type: Dict[str, float]
+
+    def __repr__(self) -> str:
+        return (
+            f'Summary(peak rss {self.peak["rss"]} KiB, '
+            f'mean cpu {self.mean["cpu"]:.1f}%, peak fds {self.peak["fds"]})'
+        )
+
+
+def peak_growth(samples: List[Sample], metric: str = 'rss') -> float:
+    """Ratio of the peak of `metric` over the second half of `samples` to
+    its peak over the first half, e.g. well above 1 for the resident
+    memory of a leaking process."""
+    assert len(samples) >= 2, 'not enough samples'
+    half = len(samples) // 2
+    early = max(getattr(sample, metric) for sample in samples[:half])
+    late = max(getattr(sample, metric) for sample in samples[half:])
+    return late / max(early, 1)
+
+
+class Sampler:
+    """Background thread sampling processes every `interval` seconds.
+
+    Args:
+        processes (callable): current processes to sample, by name,
+                              called for each sample
+        interval (float): delay between two samples, in seconds
+        path (str): CSV file of the samples (optional)
+    """
+
+    def __init__(
+        self,
+        processes: Callable[[], Dict[str, subprocess.Popen]],
+        interval: float = INTERVAL,
+        path: str = None,
+    ):
+        assert os.path.isdir('/proc'), 'sampling requires /proc'
+        self.processes = processes
+        self.interval = interval
+        self.path = path
+        # samples of each process
+        self.samples = {}  # type: Dict[str, List[Sample]]
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None  # type: Optional[threading.Thread]
+        self._start = 0.0
+
+    def start(self) -> None:
+        assert self._thread is None, 'sampler already started'
+        self._start = time.monotonic()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling, once the current sample is written."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def sample(self) -> List[Tuple[str, Sample]]:
+        """Take a sample of all processes."""
+        try:
+            processes = self.processes()
+        except RuntimeError:
+            # the processes changed while being listed, by another thread
+            return []
+        now = time.monotonic() - self._start
+        result = []
+        for name, process in processes.items():
+            if process.poll() is not None:
+                # once reaped, the pid of an exited process can be reused
+                # by another process
+                continue
+            sample = read_sample(process.pid, now)
+            if sample is None:
+                continue
+            with self._lock:
+                previous = self.samples.setdefault(name, [])
+            if previous and previous[-1].pid == sample.pid:
+                elapsed = sample.time - previous[-1].time
+                if elapsed > 0:
+                    sample.cpu = (
+                        100
+                        * (sample.cpu_time - previous[-1].cpu_time)
+                        / elapsed
+                    )
+            with self._lock:
+                previous.append(sample)
+            result.append((name, sample))
+        return result
+
+    def _run(self) -> None:
+        output = None
+        if self.path is not None:
+            output = open(self.path, 'w')
+            output.write('time,process,pid,' + ','.join(METRICS) + '\n')
+        try:
+            while True:
+                for name, sample in self.sample():
+                    if output is not None:
+                        output.write(
+                            f'{sample.time:.2f},{name},{sample.pid},'
+                            f'{sample.cpu:.1f},{sample.rss},{sample.fds},'
+                            f'{sample.read},{sample.write}\n'
+                        )
+                if output is not None:
+                    output.flush()
+                if self._stop.wait(self.interval):
+                    return
+        finally:
+            if output is not None:
+                output.close()
+
+    def summary(self) -> Dict[str, Summary]:
+        """Peak and mean of the metrics of each sampled process."""
+        with self._lock:
+            samples = {
+                name: list(samples) for name, samples in self.samples.items()
+            }
+        return {name: Summary(samples) for name, samples in samples.items()}
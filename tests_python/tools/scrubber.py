@@ -0,0 +1,72 @@
+"""Successive regexp replacements, as applied to regression outputs.
+
+Regression outputs are scrubbed from hashes, timestamps, counters... by
+a list of rules `(pattern, replacement)` applied one after the other with
+`re.sub`. A `Scrubber` applies its rules the same way, so its result is
+the one of `utils.suball`, byte for byte:
+
+    scrubber = Scrubber([(r'\\w{51}', '[BLOCK_HASH]'), (r'tz\\w{34}', '[PKH]')])
+    scrubbed = scrubber.scrub(output)
+
+Rules are compiled once, and most of the time is spent in rules that
+start with a class, such as `\\w{53}` or timestamps, as `re` tries them
+at every position of the output. These classes are cheaper to match in
+ASCII mode, in which `\\w` and `\\d` match the same characters as in
+Unicode mode when the text is ASCII. A `Scrubber` therefore also
+compiles its rules with `re.ASCII`, and uses them on ASCII texts (most
+client outputs). Rules for which the two modes may differ on ASCII texts
+(`\\s` also matches `\\x1c`-`\\x1f` in Unicode mode, case-insensitive
+rules...) are always applied in Unicode mode.
+"""
+import re
+from typing import List, Pattern, Sequence, Tuple, Union
+
+Rule = Tuple[Union[str, Pattern], str]
+
+
+def _ascii_pattern(pattern: Pattern) -> Pattern:
+    """`pattern` in ASCII mode, if it matches the same ASCII texts, else
+    `pattern` itself."""
+    if (
+        pattern.flags & re.IGNORECASE
+        or not pattern.pattern.isascii()
+        or re.search(r'\\[sS]', pattern.pattern)
+    ):
+        return pattern
+    try:
+        return re.compile(
+            pattern.pattern, pattern.flags & ~re.UNICODE | re.ASCII
+        )
+    except re.error:
+        # e.g. an inline `(?u)` flag
+        return pattern
+
+
+class Scrubber:
+    """Rules `(pattern, replacement)` applied in order (see the module
+    documentation)."""
+
+    def __init__(self, rules: Sequence[Rule]):
+        """
+        Args:
+            rules (list): pairs `(pattern, replacement)` as given to
+                          `re.sub`, in the order in which they are
+                          applied.
+        """
+        self.rules = [
+            (re.compile(pattern), replacement) for pattern, replacement in rules
+        ]  # type: List[Tuple[Pattern, str]]
+        self._ascii_rules = [
+            (_ascii_pattern(pattern), replacement)
+            for pattern, replacement in self.rules
+        ]  # type: List[Tuple[Pattern, str]]
+
+    def scrub(self, text: str) -> str:
+        """`text`, with the matches of the rules replaced, one rule after
+        the other."""
+        rules = self._ascii_rules if text.isascii() else self.rules
+        for pattern, replacement in rules:
+            text = pattern.sub(replacement, text)
+        return text
+
+    __call__ = scrub
@@ -2,7 +2,7 @@
 Assertions are retried to avoid using arbitrary time constants in test.
 """
 import datetime
-from typing import Any, List, Tuple, Pattern
+from typing import Any, Callable, List, Tuple, Pattern
 import hashlib
 import contextlib
 import json
@@ -15,6 +15,8 @@ import base58check
 import ed25519
 import pyblake2
 import requests
+from client import head_monitor
+from client.block_fetcher import BlockFetcher
 from client.client import Client
 from client.client_output import (
     BakeForResult,
@@ -22,7 +24,9 @@ from client.client_output import (
     InvalidClientOutput,
 )
 
-from . import constants
+from . import baking, constants
+from .log_index import LOG_INDEX
+from .scrubber import Scrubber
 
 
 def retry(timeout: float, attempts: float):  # pylint: disable=unused-argument
@@ -53,7 +57,50 @@ def retry(timeout: float, attempts: float):  # pylint: disable=unused-argument
     return decorator_retry
 
 
-@retry(timeout=1.0, attempts=10)
+def retry_on_head(timeout: float, attempts: float):
+    """Retries execution of a decorated function until it returns True.
+
+    Same as `retry`, but rather than sleeping between attempts, waits for
+    the node of one of the clients to switch to a new head. The function is
+    retried at least every `timeout` seconds, for up to `timeout * attempts`
+    seconds overall.
+
+    The first argument of the decorated function must be a client or a
+    list of clients.
+
+    Args:
+        attempts (int): max number of attempts.
+        timeout (float): max time to wait between attempts.
+
+    Returns:
+        True iff an attempt was successful.
+    """
+
+    def decorator_retry(func):
+        def wrapper(*args, **kwargs):
+            clients = args[0] if isinstance(args[0], list) else [args[0]]
+            for client in clients:
+                client.head_monitor()
+            deadline = time.monotonic() + timeout * attempts
+            while True:
+                seen = head_monitor.heads_seen()
+                if func(*args, **kwargs):
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    print("*** Failed after too many retries")
+                    return False
+                if not head_monitor.wait_new_head(
+                    seen, min(timeout, remaining)
+                ):
+                    print(f'*** No new head after {timeout} seconds...')
+
+        return wrapper
+
+    return decorator_retry
+
+
+@retry_on_head(timeout=1.0, attempts=10)
 def check_block_contains_operations(
     client: Client, operation_hashes: List[str]
 ) -> bool:
@@ -75,7 +122,7 @@ def check_mempool_contains_operations(
     return set(operation_hashes).issubset(res)
 
 
-@retry(timeout=2.0, attempts=120)
+@retry_on_head(timeout=2.0, attempts=120)
 def check_protocol(
     client: Client, proto: str, params: List[str] = None
 ) -> bool:
@@ -93,19 +140,19 @@ def check_two_chains(client: Client) -> bool:
         return False
 
 
-@retry(timeout=2.0, attempts=10)
+@retry_on_head(timeout=2.0, attempts=10)
 def check_level(client: Client, level, chain: str = 'main') -> bool:
     return client.get_level(chain=chain) == level
 
 
-@retry(timeout=2.0, attempts=10)
+@retry_on_head(timeout=2.0, attempts=10)
 def check_level_greater_than(
     client: Client, level, chain: str = 'main'
 ) -> bool:
     return client.get_level(chain=chain) >= level
 
 
-@retry(timeout=2.0, attempts=20)
+@retry_on_head(timeout=2.0, attempts=20)
 def check_operation_in_receipt(
     client: Client, operation_hash: str, check_previous=None
 ) -> bool:
@@ -117,7 +164,7 @@ def check_operation_in_receipt(
     return receipt.block_hash is not None
 
 
-@retry(timeout=5, attempts=20)
+@retry_on_head(timeout=5, attempts=20)
 def synchronize(clients: List[Client], max_diff: int = 2) -> bool:
     """Return when nodes head levels are within max_diff units"""
     levels = [client.get_level() for client in clients]
@@ -162,16 +209,40 @@ def get_block_hash(client: Client, level: int) -> str:
 
 
 def all_blocks(client: Client) -> List[dict]:
-    """Return list of all blocks"""
-    cur = 'head'
-    blocks = []
-    while True:
-        block = client.rpc('get', f'/chains/main/blocks/{cur}')
-        blocks.append(block)
-        cur = block['header']['predecessor']
-        if block['header']['level'] == 0:
-            break
-    return list(reversed(blocks))
+    """Return list of all blocks, fetched concurrently, see
+    `block_fetcher.BlockFetcher`"""
+    fetcher = BlockFetcher(client.rpc_session)
+    head_level = fetcher.get('head', '/header')['level']
+    return list(fetcher.levels(0, head_level))
+
+
+def check_blocks(
+    client: Client,
+    first: int,
+    last: int,
+    path: str = '',
+    status: int = 200,
+    error: str = None,
+) -> None:
+    """Check the answers of the node of `client` to RPC `path` of the
+    blocks of levels `first` to `last` (included), fetched concurrently.
+
+    Args:
+        client (Client): the client of the node
+        first (int): the first level
+        last (int): the last level, included
+        path (str): the RPC of the blocks, e.g. `/header`
+        status (int): the expected HTTP status of the answers
+        error (str): a string of the answers, e.g. an error id
+    """
+    fetcher = BlockFetcher(client.rpc_session)
+    levels = (str(level) for level in range(first, last + 1))
+    for level, response in fetcher.responses(levels, path):
+        assert response.status_code == status, (
+            f'block {level}{path}: HTTP {response.status_code} '
+            f'(expected {status}) {response.text}'
+        )
+        assert error is None or error in response.text, response.text
 
 
 def operations_hash_from_block(block):
@@ -184,25 +255,25 @@ def operations_hash_from_block(block):
 
 
 def check_logs(logs: List[str], pattern: str) -> bool:
-    for file in logs:
-        with open(file, "r") as stream:
-            for line in stream:
-                if re.search(pattern, line):
-                    print('#', stream.name)
-                    print(line)
-                    return False
+    """False iff some line of files `logs` matches regexp `pattern`.
+
+    Only the lines appended since the previous check of `pattern` are
+    scanned, see `log_index.LogIndex`."""
+    for file, lines in LOG_INDEX.search(logs, pattern).items():
+        print('#', file)
+        print(lines[0])
+        return False
     return True
 
 
 def check_logs_counts(logs: List[str], pattern: str) -> int:
+    """Number of lines of files `logs` matching regexp `pattern`."""
     count = 0
-    for file in logs:
-        with open(file, "r") as stream:
-            for line in stream:
-                if re.search(pattern, line):
-                    print('#', stream.name)
-                    print(line)
-                    count += 1
+    for file, lines in LOG_INDEX.search(logs, pattern).items():
+        for line in lines:
+            print('#', file)
+            print(line)
+        count += len(lines)
     return count
 
 
@@ -437,6 +508,31 @@ def bake(
     return client.bake(bake_for, bake_args)
 
 
+def bake_n(
+    client: Client, n_blocks: int, bake_for: str = 'bootstrap1'
+) -> 'baking.BakeReport':
+    """Bake `n_blocks` blocks back to back with minimal timestamps, as
+    `bake` but over RPCs rather than a client process per block, see
+    `baking.BlockBaker`."""
+    report = baking.BlockBaker(client.rpc_session, bake_for).bake_n(n_blocks)
+    print(f'# {report.summary()}')
+    return report
+
+
+def bake_until(
+    client: Client,
+    predicate: Callable[['baking.BakedBlock'], bool],
+    max_blocks: int,
+    bake_for: str = 'bootstrap1',
+) -> 'baking.BakeReport':
+    """Bake blocks as `bake_n` until `predicate` holds for the last baked
+    block, e.g. `lambda block: block.level == 42`."""
+    baker = baking.BlockBaker(client.rpc_session, bake_for)
+    report = baker.bake_until(predicate, max_blocks)
+    print(f'# {report.summary()}')
+    return report
+
+
 def init_with_transfer(
     client: Client,
     contract: str,
@@ -504,6 +600,44 @@ def suball(replacements: List[Tuple[Pattern, str]], string: str) -> str:
     return string
 
 
+# Rules of `client_output_converter`, in order
+CLIENT_OUTPUT_SCRUBBER = Scrubber(
+    [
+        # Scrub constants
+        (
+            r'"proof_of_work_nonce": "\w{16}"',
+            '"proof_of_work_nonce": "[NONCE]"',
+        ),
+        (r'"context": "\w{52}"', '"context": "[CONTEXT]"'),
+        (r'"level": \d+', '"level": [LEVEL]'),
+        (r'"priority": \d+', '"priority": "[PRIORITY]"'),
+        (r'"fitness": \[.*\]', '"fitness": "[FITNESS]"'),
+        # Scrub hashes
+        (r'sig\w{93}', '[SIGNATURE]'),
+        (r'\w{53}', '[OPERATION_HASH]'),
+        (r'\w{51}', '[BLOCK_HASH]'),
+        (r'tz\w{34}', '[CONTRACT_HASH]'),
+        (
+            r'fees\(\[CONTRACT_HASH\],\d+\)',
+            'fees([CONTRACT_HASH],[CTR])',
+        ),
+        # Scrub receipt
+        (
+            r"Operation hash is '\w+'",
+            "Operation hash is '[OPERATION_HASH]'",
+        ),
+        (r'wait for \w+', 'wait for [OPERATION_HASH]'),
+        (r'--branch \w+', '--branch [BRANCH_HASH]'),
+        (r'KT\w{34}', '[CONTRACT_HASH]'),
+        (r'To: KT\w{34} \.\.\.', 'To: [CONTRACT_HASH] ...'),
+        (r'Injected block \w{12}', 'Injected block [BLOCK_HASH]'),
+        (r'Expected counter: \w+', 'Expected counter: [EXPECTED_COUNTER]'),
+        # Scrub timestamps
+        (r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}Z', '[TIMESTAMP]'),
+    ]
+)
+
+
 def client_output_converter(pre):
     """Remove variable substrings from client output for regression testing.
 
@@ -514,45 +648,11 @@ def client_output_converter(pre):
 
     For example, a timestamp such as 2019-09-23T10:59:00Z is
     replaced by [TIMESTAMP].
-    """
 
-    # Scrub constants
-    pre = re.sub(
-        r'"proof_of_work_nonce": "\w{16}"',
-        '"proof_of_work_nonce": "[NONCE]"',
-        pre,
-    )
-    pre = re.sub(r'"context": "\w{52}"', '"context": "[CONTEXT]"', pre)
-    pre = re.sub(r'"level": \d+', '"level": [LEVEL]', pre)
-    pre = re.sub(r'"priority": \d+', '"priority": "[PRIORITY]"', pre)
-    pre = re.sub(r'"fitness": \[.*\]', '"fitness": "[FITNESS]"', pre)
-
-    # Scrub hashes
-    pre = re.sub(r'sig\w{93}', '[SIGNATURE]', pre)
-    pre = re.sub(r'\w{53}', '[OPERATION_HASH]', pre)
-    pre = re.sub(r'\w{51}', '[BLOCK_HASH]', pre)
-    pre = re.sub(r'tz\w{34}', '[CONTRACT_HASH]', pre)
-    pre = re.sub(
-        r'fees\(\[CONTRACT_HASH\],\d+\)', 'fees([CONTRACT_HASH],[CTR])', pre
-    )
-
-    # Scrub receipt
-    pre = re.sub(
-        r"Operation hash is '\w+'", "Operation hash is '[OPERATION_HASH]'", pre
-    )
-    pre = re.sub(r'wait for \w+', 'wait for [OPERATION_HASH]', pre)
-    pre = re.sub(r'--branch \w+', '--branch [BRANCH_HASH]', pre)
-    pre = re.sub(r'KT\w{34}', '[CONTRACT_HASH]', pre)
-    pre = re.sub(r'To: KT\w{34} \.\.\.', 'To: [CONTRACT_HASH] ...', pre)
-    pre = re.sub(r'Injected block \w{12}', 'Injected block [BLOCK_HASH]', pre)
-    pre = re.sub(
-        r'Expected counter: \w+', 'Expected counter: [EXPECTED_COUNTER]', pre
-    )
-
-    # Scrub timestamps
-    pre = re.sub(r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}Z', '[TIMESTAMP]', pre)
-
-    return pre
+    The rules `CLIENT_OUTPUT_SCRUBBER` are applied one after the other,
+    see `scrubber.Scrubber`.
+    """
+    return CLIENT_OUTPUT_SCRUBBER.scrub(pre)
 
 
 def client_always_output_converter(pre):
@@ -604,18 +704,18 @@ def node_consistency_after_import(
 # - blocks before the savepoint (excluded) have pruned metadata,
 # - blocks from the savepoint (included) have metadata.
 def full_node_blocks_availability(node_id, sandbox, savepoint, head):
-    # Error that must be raised when a block is not available
-    expected_command_error = 'Command failed: Unable to find block'
+    client = sandbox.client(node_id)
     # Genesis is available with metadata
-    assert get_block_at_level(sandbox.client(node_id), 0)
-    # [1;…;savepoint[ headers are available but metadata are not
-    for i in range(1, savepoint):
-        get_block_header_at_level(sandbox.client(node_id), i)
-        with assert_run_failure(expected_command_error):
-            get_block_metadata_at_level(sandbox.client(node_id), i)
+    assert get_block_at_level(client, 0)
+    # [1;…;savepoint[ headers are available but metadata are not: the node
+    # fails with error `store.metadata_not_found` (client error 'Unable to
+    # find block')
+    check_blocks(client, 1, savepoint - 1, '/header')
+    check_blocks(
+        client, 1, savepoint - 1, '/metadata', 500, 'metadata_not_found'
+    )
     # [savepoint;…;head] are available with metadata
-    for i in range(savepoint, head + 1):
-        get_block_metadata_at_level(sandbox.client(node_id), i)
+    check_blocks(client, savepoint, head, '/metadata')
 
 
 # Checks the availability of blocks and its metadata for a rolling node.
@@ -628,20 +728,17 @@ def full_node_blocks_availability(node_id, sandbox, savepoint, head):
 def rolling_node_blocks_availability(
     node_id, sandbox, savepoint, caboose, head
 ):
-    # Error that must be raised when a block is unknown
-    expected_service_error = 'Did not find service'
+    client = sandbox.client(node_id)
     # Genesis is available with metadata
-    assert get_block_at_level(sandbox.client(node_id), 0)
+    assert get_block_at_level(client, 0)
     if caboose == 0:
         pass
     else:
-        # [1;…;caboose[ blocks are unknown
-        for i in range(1, caboose):
-            with assert_run_failure(expected_service_error):
-                get_block_at_level(sandbox.client(node_id), i)
+        # [1;…;caboose[ blocks are unknown: the node answers 404 (client
+        # error 'Did not find service')
+        check_blocks(client, 1, caboose - 1, status=404)
     # [savepoint;…;head] are available with metadata
-    for i in range(savepoint + 1, head):
-        get_block_header_at_level(sandbox.client(node_id), i)
+    check_blocks(client, savepoint + 1, head - 1, '/header')
 
 
 def file_basename(path):
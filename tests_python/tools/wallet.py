@@ -0,0 +1,146 @@
+"""In-process ed25519 keys, and bulk writes of client wallets.
+
+Setting up many accounts with the client forks a process per key
+(`gen keys`, `show address`, `import secret key`). This module generates
+keys and derives their hashes in Python, and writes the alias files of a
+client base dir (`secret_keys`, `public_keys`, `public_key_hashs`) in one
+go, in the format of tezos-client.
+
+    keys = wallet.generate_keys([f'account{i}' for i in range(256)])
+    wallet.write_wallet(client.base_dir, keys)
+    parameters['bootstrap_accounts'] = wallet.bootstrap_accounts(
+        keys.values(), 4000000000000
+    )
+"""
+import fcntl
+import json
+import os
+import tempfile
+from typing import Dict, Iterable, List
+
+import ed25519
+import pyblake2
+
+from . import forge
+
+ED25519_SECRET_KEY_PREFIX = bytes([43, 246, 78, 7])
+
+# Alias files of the client wallet, see `unix_wallet` in
+# lib_client_base_unix
+SECRET_KEYS = 'secret_keys'
+PUBLIC_KEYS = 'public_keys'
+PUBLIC_KEY_HASHES = 'public_key_hashs'
+
+
+class Key:
+    """An unencrypted ed25519 key pair."""
+
+    def __init__(self, signing_key: ed25519.SigningKey):
+        public = signing_key.get_verifying_key().to_bytes()
+        pkh = pyblake2.blake2b(public, digest_size=20).digest()
+        self.pkh = forge.b58encode(
+            pkh, forge.PUBLIC_KEY_HASH_PREFIXES['tz1'][0]
+        )
+        self.public_key = forge.b58encode(
+            public, forge.PUBLIC_KEY_PREFIXES['edpk'][0]
+        )
+        self.secret_key = 'unencrypted:' + forge.b58encode(
+            signing_key.to_seed(), forge.ED25519_SEED_PREFIX
+        )
+
+    @classmethod
+    def generate(cls) -> 'Key':
+        signing_key, _ = ed25519.create_keypair()
+        return cls(signing_key)
+
+    @classmethod
+    def from_secret(cls, secret_key: str) -> 'Key':
+        """Key of an unencrypted ed25519 secret key, e.g. `edsk...` or
+        `unencrypted:edsk...`, in its short (seed) or long form."""
+        if secret_key.startswith('unencrypted:'):
+            secret_key = secret_key[len('unencrypted:') :]
+        if len(secret_key) == 54:
+            seed = forge.b58decode(secret_key, forge.ED25519_SEED_PREFIX)
+        else:
+            seed = forge.b58decode(secret_key, ED25519_SECRET_KEY_PREFIX)[:32]
+        return cls(ed25519.SigningKey(seed))
+
+    def identity(self) -> Dict[str, str]:
+        """The key, in the format of `constants.IDENTITIES`."""
+        return {
+            'identity': self.pkh,
+            'public': self.public_key,
+            'secret': self.secret_key,
+        }
+
+
+def generate_keys(names: Iterable[str]) -> Dict[str, Key]:
+    """New keys, by name."""
+    return {name: Key.generate() for name in names}
+
+
+def keys_of_identities(identities: Dict[str, dict]) -> Dict[str, Key]:
+    """Keys of identities, e.g. `constants.IDENTITIES`."""
+    return {
+        name: Key.from_secret(identity['secret'])
+        for name, identity in identities.items()
+    }
+
+
+def bootstrap_accounts(keys: Iterable[Key], balance: int) -> List[List[str]]:
+    """Parameter `bootstrap_accounts` of a protocol, with the public keys
+    of `keys` and `balance` mutez each."""
+    return [[key.public_key, str(balance)] for key in keys]
+
+
+def _write_json(path: str, value: list) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, 'w') as file:
+        json.dump(value, file, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: str) -> list:
+    if not os.path.isfile(path):
+        return []
+    with open(path) as file:
+        return json.load(file)
+
+
+def write_wallet(base_dir: str, keys: Dict[str, Key]) -> None:
+    """Add `keys` to the wallet of client base dir `base_dir`.
+
+    Aliases of the wallet with the same name are replaced, as with
+    `import secret key --force`. The wallet is locked as by the client,
+    so that clients can run concurrently.
+
+    Args:
+        base_dir (str): the base dir of the client
+        keys (dict): the keys, by alias
+    """
+    os.makedirs(base_dir, exist_ok=True)
+    values = {
+        SECRET_KEYS: lambda key: key.secret_key,
+        PUBLIC_KEYS: lambda key: {
+            'locator': f'unencrypted:{key.public_key}',
+            'key': key.public_key,
+        },
+        PUBLIC_KEY_HASHES: lambda key: key.pkh,
+    }
+    with open(os.path.join(base_dir, 'wallet_lock'), 'w') as lock:
+        fcntl.lockf(lock, fcntl.LOCK_EX)
+        try:
+            for alias_file, value in values.items():
+                path = os.path.join(base_dir, alias_file)
+                aliases = [
+                    alias
+                    for alias in _read_json(path)
+                    if alias['name'] not in keys
+                ]
+                aliases += [
+                    {'name': name, 'value': value(key)}
+                    for name, key in keys.items()
+                ]
+                _write_json(path, aliases)
+        finally:
+            fcntl.lockf(lock, fcntl.LOCK_UN)